@@ -0,0 +1,419 @@
+"""
+Local stand-ins for the external services the pipeline talks to, so the
+benchmarks run fully offline with reproducible latency and failure rates.
+
+- FakeGeminiModel      -> genai.GenerativeModel
+- FakeCacheBackend     -> src.prompt_cache.GeminiCacheBackend (Gemini context caching)
+- FakeInstagrapiClient -> instagrapi.Client (as used by the discoverer)
+- FakeInstaloader      -> the `instaloader` module (the downloader's fallback path)
+- FakeSessionPool      -> src.fetchers.session_pool.SessionPool
+- LocalCDN             -> Instagram's media CDN, served from a local directory
+- FakeAudioProcessor   -> src.processors.audio.AudioProcessor (skips Whisper)
+"""
+import json
+import random
+import shutil
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class FaultInjector:
+    """Sleeps for a jittered latency and raises injected errors at a configurable rate."""
+
+    def __init__(self, latency_sec: float = 0.0, jitter: float = 0.2, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency_sec = latency_sec
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.calls = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, what: str):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency_sec * (1 + self._rng.uniform(-self.jitter, self.jitter))
+            roll = self._rng.random()
+        if delay > 0:
+            time.sleep(delay)
+        if roll < self.rate_limit_rate:
+            with self._lock:
+                self.errors += 1
+            raise RuntimeError(f"429 Resource has been exhausted (injected, {what})")
+        if roll < self.rate_limit_rate + self.error_rate:
+            with self._lock:
+                self.errors += 1
+            raise RuntimeError(f"500 Internal error (injected, {what})")
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "errors": self.errors}
+
+
+# --- Gemini ---
+
+FAKE_REPORT = """### Core Summary
+A synthetic post about a developer tool, generated by the benchmark's fake Gemini model.
+
+### Technical Insights
+* The tool ships a Python SDK.
+* It runs locally without a GPU.
+
+### Developer Perspective
+* Try the quick-start notebook.
+* Compare it with the existing baseline.
+
+### Broader Impact
+Local-first tooling keeps lowering the barrier to experimentation.
+"""
+
+# FAKE_REPORT in the final summarizer's structured-output (JSON) shape.
+FAKE_REPORT_JSON = {
+    "core_summary": "A synthetic post about a developer tool, generated by the benchmark's fake Gemini model.",
+    "technical_insights": ["The tool ships a Python SDK.", "It runs locally without a GPU."],
+    "developer_perspective": ["Try the quick-start notebook.", "Compare it with the existing baseline."],
+    "broader_impact": "Local-first tooling keeps lowering the barrier to experimentation.",
+}
+
+# Gemini bills each image (or keyframe) as a fixed number of input tokens.
+TOKENS_PER_IMAGE = 258
+
+
+class FakeGeminiModel:
+    """
+    Mimics genai.GenerativeModel.generate_content: returns a response with
+    `.text` and `.usage_metadata`. Prompts containing the report template get
+    a report in the final summarizer's format (JSON when requested; one per
+    `=== ITEM <id> ===` block for batched prompts); others get a short summary.
+    """
+
+    def __init__(self, model_name: str = "fake-gemini", faults: Optional[FaultInjector] = None,
+                 output_tokens: int = 300, system_instruction: Optional[str] = None):
+        self.model_name = model_name
+        self.faults = faults or FaultInjector()
+        self.output_tokens = output_tokens
+        # Set for models built from a cached content: the prompt is billed as cached tokens.
+        self.system_instruction = system_instruction
+
+    def generate_content(self, contents: Any, **kwargs) -> SimpleNamespace:
+        parts = contents if isinstance(contents, list) else [contents]
+        if self.system_instruction:
+            parts = [self.system_instruction] + parts
+        text_chars, images = 0, 0
+        for part in parts:
+            if isinstance(part, str):
+                text_chars += len(part)
+            else:
+                images += 1
+
+        self.faults(self.model_name)
+        is_report = any(isinstance(p, str) and "### Core Summary" in p for p in parts)
+        items = [p.split(" ===", 1)[0][len("=== ITEM "):] for p in parts
+                 if isinstance(p, str) and p.startswith("=== ITEM ")]
+        as_json = (kwargs.get("generation_config") or {}).get("response_mime_type") == "application/json"
+        if is_report and as_json:
+            text = json.dumps([{"id": item, **FAKE_REPORT_JSON} for item in items] if items else FAKE_REPORT_JSON)
+        elif is_report and items:
+            text = "\n".join(f"=== REPORT {item} ===\n{FAKE_REPORT}" for item in items)
+        else:
+            text = FAKE_REPORT if is_report else f"Synthetic visual summary of {images} frame(s)."
+        usage = SimpleNamespace(
+            prompt_token_count=text_chars // 4 + images * TOKENS_PER_IMAGE,
+            candidates_token_count=self.output_tokens * max(len(items), 1),
+            cached_content_token_count=len(self.system_instruction or "") // 4,
+        )
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+class CachedContentNotFound(Exception):
+    """Stands in for the NotFound Gemini raises on an evicted or expired cached content."""
+
+
+class FakeCacheBackend:
+    """
+    In-memory context caching for CachedPromptModel: entries expire after
+    their TTL unless refreshed, and `evict()` drops them all, the way the
+    server may at any time. Prompts below Gemini's minimum cache size are
+    refused, as GeminiCacheBackend does.
+    """
+
+    evicted_errors = (CachedContentNotFound,)
+
+    def __init__(self, faults: Optional[FaultInjector] = None):
+        self.faults = faults or FaultInjector()
+        self.entries: Dict[int, float] = {}
+        self.stats = {"created": 0, "refreshed": 0}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def supports(self, system_prompt: str) -> bool:
+        # Same size threshold as Gemini, so benchmarks only see savings production can get.
+        from src.prompt_cache import GeminiCacheBackend
+        from src.summarizers.input_budget import estimate_tokens
+        return estimate_tokens(system_prompt) >= GeminiCacheBackend.MIN_CACHE_TOKENS
+
+    def plain_model(self, model_name: str) -> FakeGeminiModel:
+        return FakeGeminiModel(model_name, faults=self.faults)
+
+    def create(self, model_name: str, system_prompt: str, ttl_sec: int) -> SimpleNamespace:
+        with self._lock:
+            self._next_id += 1
+            handle = SimpleNamespace(id=self._next_id, model_name=model_name, system_prompt=system_prompt)
+            self.entries[handle.id] = time.time() + ttl_sec
+            self.stats["created"] += 1
+        return handle
+
+    def refresh(self, handle: SimpleNamespace, ttl_sec: int):
+        with self._lock:
+            if handle.id not in self.entries:
+                raise CachedContentNotFound(f"cached content {handle.id} not found")
+            self.entries[handle.id] = time.time() + ttl_sec
+            self.stats["refreshed"] += 1
+
+    def cached_model(self, handle: SimpleNamespace) -> FakeGeminiModel:
+        backend = self
+
+        class _CachedFake(FakeGeminiModel):
+            def generate_content(self, contents: Any, **kwargs) -> SimpleNamespace:
+                if backend.entries.get(handle.id, 0) < time.time():
+                    raise CachedContentNotFound(f"cached content {handle.id} not found or expired")
+                return super().generate_content(contents, **kwargs)
+
+        return _CachedFake(handle.model_name, faults=self.faults, system_instruction=handle.system_prompt)
+
+    def evict(self):
+        with self._lock:
+            self.entries.clear()
+
+
+# --- Instagram (instagrapi) ---
+
+class FakeInstagrapiClient:
+    """
+    Serves synthetic users and feeds in the shape the discoverer reads:
+    user_info_by_username / user_info / search_users and the raw
+    `feed/user/{id}/` endpoint through private_request.
+    """
+
+    rank_token = "fake-rank-token"
+
+    def __init__(self, cdn_base_url: str, posts_per_user: int = 60, faults: Optional[FaultInjector] = None,
+                 media_files: Optional[Dict[str, str]] = None):
+        self.cdn_base_url = cdn_base_url.rstrip("/")
+        self.posts_per_user = posts_per_user
+        self.faults = faults or FaultInjector()
+        # Which synthetic file each media type points at, e.g. {"video": "reel.mp4", "image": "slide_1.jpg"}
+        self.media_files = media_files or {"video": "reel.mp4", "image": "slide_1.jpg"}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _call(self, what: str):
+        with self._lock:
+            self.requests += 1
+        self.faults(what)
+
+    @staticmethod
+    def user_pk(username: str) -> str:
+        return str(zlib.crc32(username.encode()) % 10**10)
+
+    def _user(self, username: str) -> SimpleNamespace:
+        return SimpleNamespace(
+            pk=self.user_pk(username),
+            username=username,
+            biography="Daily python tutorials and tech news for developers",
+            follower_count=120_000,
+            media_count=self.posts_per_user,
+            is_private=False,
+            is_verified=False,
+        )
+
+    def user_info_by_username(self, username: str) -> SimpleNamespace:
+        self._call("user_info_by_username")
+        return self._user(username)
+
+    def user_info(self, user_id: str) -> SimpleNamespace:
+        self._call("user_info")
+        return self._user(f"user_{user_id}")
+
+    def search_users(self, query: str) -> List[SimpleNamespace]:
+        self._call("search_users")
+        return [self._user(query)]
+
+    def _raw_item(self, user_id: str, index: int) -> Dict[str, Any]:
+        """One v1 feed item; index 0 is the newest post, one post per hour."""
+        taken_at = datetime.now(timezone.utc) - timedelta(hours=index)
+        code = f"B{user_id[-6:]}{index:05d}"
+        kind = ("reel", "album", "post")[index % 3]
+        image = {
+            "image_versions2": {"candidates": [
+                {"url": f"{self.cdn_base_url}/{self.media_files['image']}", "width": 1080, "height": 1080},
+            ]},
+            "original_width": 1080,
+            "original_height": 1080,
+        }
+        video = {
+            "video_versions": [
+                {"url": f"{self.cdn_base_url}/{self.media_files['video']}", "width": 720, "height": 1280, "type": 101},
+            ],
+            "video_duration": 15.0,
+            **image,
+        }
+        item = {
+            "pk": f"{user_id}{index:05d}",
+            "id": f"{user_id}{index:05d}_{user_id}",
+            "code": code,
+            "taken_at": int(taken_at.timestamp()),
+            "user": {"pk": user_id, "username": f"user_{user_id}", "full_name": "", "profile_pic_url": f"{self.cdn_base_url}/{self.media_files['image']}"},
+            "caption": {"text": f"New tutorial #{index}: a deep dive into a python library #python #ai"},
+            "like_count": 1000 + index,
+            "comment_count": 10,
+            "usertags": {"in": []},
+        }
+        if kind == "reel":
+            item.update(media_type=2, product_type="clips", **video)
+        elif kind == "album":
+            item.update(media_type=8, product_type="carousel_container", carousel_media=[
+                {"pk": f"{item['pk']}{n}", "id": f"{item['pk']}{n}_{user_id}", "media_type": 1, **image}
+                for n in range(3)
+            ])
+        else:
+            item.update(media_type=1, product_type="feed", **image)
+        return item
+
+    def private_request(self, endpoint: str, params: Optional[Dict] = None, **kwargs) -> Dict[str, Any]:
+        self._call(endpoint)
+        if not endpoint.startswith("feed/user/"):
+            raise NotImplementedError(f"FakeInstagrapiClient does not serve {endpoint}")
+        user_id = endpoint.split("/")[2]
+        params = params or {}
+        start = int(params.get("max_id") or 0)
+        count = int(params.get("count") or 12)
+        end = min(start + count, self.posts_per_user)
+        return {
+            "items": [self._raw_item(user_id, i) for i in range(start, end)],
+            "more_available": end < self.posts_per_user,
+            "next_max_id": str(end) if end < self.posts_per_user else None,
+        }
+
+
+class FakeSessionPool:
+    """Hands out the same fake client for every session; mirrors SessionPool's interface."""
+
+    def __init__(self, client: FakeInstagrapiClient):
+        self.client = client
+
+    @contextmanager
+    def session(self) -> Iterator[FakeInstagrapiClient]:
+        yield self.client
+
+    def has_sessions(self) -> bool:
+        return True
+
+    def healthy_count(self) -> int:
+        return 1
+
+    def reset_stats(self) -> Dict[str, float]:
+        requests, self.client.requests = self.client.requests, 0
+        return {"requests": requests, "throttled_sec": 0.0}
+
+
+# --- Instagram (instaloader fallback) ---
+
+class FakeInstaloader:
+    """
+    Replaces the `instaloader` module inside src.fetchers.instagram. download_post
+    copies a post's synthetic files into the target directory, as the real
+    instaloader would after fetching them.
+    """
+
+    class exceptions:
+        class LoginRequiredException(Exception):
+            pass
+
+    def __init__(self, files_for: Dict[str, List[Path]], faults: Optional[FaultInjector] = None):
+        # shortcode -> synthetic files to "download" for it
+        self.files_for = files_for
+        self.faults = faults or FaultInjector()
+        outer = self
+
+        class Post:
+            def __init__(self, shortcode: str):
+                self.shortcode = shortcode
+
+            @classmethod
+            def from_shortcode(cls, context, shortcode: str):
+                outer.faults("Post.from_shortcode")
+                return cls(shortcode)
+
+        class Instaloader:
+            def __init__(self, **kwargs):
+                self.context = None
+                self.dirname_pattern = "{target}"
+                self.filename_pattern = "{date_utc}_UTC"
+
+            def download_post(self, post, target):
+                outer.faults("download_post")
+                dest = Path(self.dirname_pattern)
+                dest.mkdir(parents=True, exist_ok=True)
+                files = outer.files_for[post.shortcode]
+                for index, src in enumerate(files, start=1):
+                    name = f"{post.shortcode}_{index}{src.suffix}" if len(files) > 1 else f"{post.shortcode}{src.suffix}"
+                    shutil.copyfile(src, dest / name)
+                (dest / f"{post.shortcode}.txt").write_text("synthetic caption", encoding="utf-8")
+                return True
+
+        self.Post = Post
+        self.Instaloader = Instaloader
+
+
+# --- Media CDN ---
+
+class _CDNHandler(SimpleHTTPRequestHandler):
+    latency_sec = 0.0
+
+    def do_GET(self):
+        if self.latency_sec:
+            time.sleep(self.latency_sec)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalCDN:
+    """Serves a directory of synthetic media over HTTP on a daemon thread."""
+
+    def __init__(self, directory: Path, latency_sec: float = 0.0):
+        handler = type("CDNHandler", (_CDNHandler,), {"latency_sec": latency_sec})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), partial(handler, directory=str(directory)))
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, name="fake-cdn", daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+# --- Whisper ---
+
+class FakeAudioProcessor:
+    """Stands in for AudioProcessor when Whisper models are not cached locally."""
+
+    def __init__(self, faults: Optional[FaultInjector] = None, speech_ratio: float = 0.8):
+        self.faults = faults or FaultInjector()
+        self.speech_ratio = speech_ratio
+
+    def warmup(self, *args, **kwargs):
+        pass
+
+    def process(self, audio_path: str) -> Dict[str, Any]:
+        self.faults("whisper")
+        return {"transcript": "This is a synthetic transcript about a python library.", "speech_ratio": self.speech_ratio}
@@ -0,0 +1,86 @@
+"""
+Measures how long it takes to import each entry-point module in a fresh interpreter.
+
+Usage:
+    python benchmarks/import_time.py [--repeat 3] [--json results.json]
+
+Each module is imported in its own subprocess so caches from one import don't
+hide the cost of the next. Run it before and after a change to catch startup
+regressions (e.g. a heavy library creeping back into a module-level import).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "src.config",
+    "src.database.db",
+    "src.fetchers.discoverer",
+    "src.pipeline",
+    "src.worker",
+]
+
+# Heavy libraries that should only be imported when a job actually needs them.
+HEAVY_MODULES = ["torch", "whisper", "moviepy", "cv2", "google.generativeai"]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy_loaded": heavy}}))
+"""
+
+
+def measure(module: str, repeat: int) -> dict:
+    runs, heavy_loaded, error = [], [], None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed"
+            break
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        runs.append(result["seconds"])
+        heavy_loaded = result["heavy_loaded"]
+
+    return {
+        "module": module,
+        "median_sec": round(statistics.median(runs), 4) if runs else None,
+        "runs_sec": [round(r, 4) for r in runs],
+        "heavy_loaded": heavy_loaded,
+        "error": error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark for entry-point modules.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file.")
+    args = parser.parse_args()
+
+    results = [measure(module, args.repeat) for module in MODULES]
+
+    print(f"{'module':<28} {'median (s)':>10}  heavy imports")
+    for r in results:
+        if r["error"]:
+            print(f"{r['module']:<28} {'ERROR':>10}  {r['error']}")
+        else:
+            print(f"{r['module']:<28} {r['median_sec']:>10.3f}  {', '.join(r['heavy_loaded']) or '-'}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"benchmark": "import_time", "results": results}, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Offline throughput benchmark for discovery and the processing pipeline.
+
+Usage:
+    python benchmarks/pipeline_throughput.py [--jobs 12] [--channels 20]
+        [--gemini-latency 1.5] [--gemini-error-rate 0.0] [--gemini-429-rate 0.0]
+        [--insta-latency 0.3] [--cdn-latency 0.05] [--fallback-ratio 0.0]
+        [--real-whisper] --mongo-uri mongodb://localhost:27017
+        [--json results.json] [--compare baseline.json]
+
+Everything external is replaced by the fakes in benchmarks/fakes.py:
+Instagram (instagrapi and the instaloader fallback), the media CDN, Gemini and,
+unless --real-whisper is given, Whisper. MongoDB is real: --mongo-uri must
+point at a mongod (writes go to a separate "content_pipeline_benchmark"
+database), since the discoverer and the queue rely on update-pipeline
+operators ($dateAdd, $round, $pow) that in-memory mocks don't implement.
+Local work — media downloads over
+loopback, audio extraction, OCR, keyframe extraction, Mongo writes — is real,
+so the numbers show where the pipeline's own time goes.
+
+Run it before and after a change and pass the earlier JSON to --compare to
+see per-stage and end-to-end regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from benchmarks.fakes import (
+    FakeAudioProcessor, FakeCacheBackend, FakeInstagrapiClient, FakeInstaloader,
+    FakeSessionPool, FaultInjector, LocalCDN,
+)
+from benchmarks.synthetic import generate_media
+
+BENCH_DB = "content_pipeline_benchmark"
+JOB_KINDS = ("reel", "album", "post", "video")
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 3)
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "count": len(values),
+        "mean_sec": round(statistics.mean(values), 3) if values else None,
+        "p50_sec": percentile(values, 0.5),
+        "p95_sec": percentile(values, 0.95),
+    }
+
+
+def setup_database():
+    """Returns the Database singleton (MONGO_URI), pointed at a fresh benchmark database."""
+    from src.database.db import Database
+
+    database = Database()
+    try:
+        database.client.admin.command("ping")
+    except Exception as e:
+        sys.exit(f"Cannot reach the mongod at --mongo-uri: {e}")
+    database.client.drop_database(BENCH_DB)
+    database.db = database.client[BENCH_DB]
+    database.channels = database.db["channels"]
+    database.content_items = database.db["content_items"]
+    database.budgets = database.db["budgets"]
+    database._create_indexes()
+    return database
+
+
+def bench_discovery(database, cdn: LocalCDN, media: Dict[str, str], args) -> Dict:
+    """Bootstraps --channels fake channels, then runs one scheduled check over all of them."""
+    from src.config import Config
+    from src.database.schemas import ChannelSchema
+    from src.fetchers.discoverer import DiscovererService
+
+    faults = FaultInjector(args.insta_latency, error_rate=args.insta_error_rate, seed=args.seed)
+    client = FakeInstagrapiClient(cdn.base_url, posts_per_user=args.posts_per_channel, faults=faults, media_files=media)
+    for i in range(args.channels):
+        database.add_channel(ChannelSchema(id=f"bench_channel_{i}"))
+
+    Config.FORCE_CHECK_ALL = True
+    service = DiscovererService()
+    service.pool = FakeSessionPool(client)
+
+    runs = {}
+    for phase in ("bootstrap", "scheduled_check"):
+        requests_before = faults.calls
+        start = time.perf_counter()
+        service.run_once()
+        elapsed = time.perf_counter() - start
+        runs[phase] = {
+            "duration_sec": round(elapsed, 3),
+            "channels_per_hour": round(args.channels / elapsed * 3600, 1) if elapsed else None,
+            "instagram_requests": faults.calls - requests_before,
+        }
+    runs["items_queued"] = database.content_items.count_documents({})
+    runs["injected_errors"] = faults.errors
+    return runs
+
+
+def seed_jobs(database, cdn: LocalCDN, media: Dict[str, str], args) -> Dict[str, List[Path]]:
+    """Queues --jobs content items cycling through reels, albums, single images and silent videos."""
+    from src.database.schemas import ContentItemSchema
+
+    media_root = Path(args.workdir) / "media"
+    video = {"type": "video", "url": f"{cdn.base_url}/{media['video']}"}
+    silent = {"type": "video", "url": f"{cdn.base_url}/{media['silent_video']}"}
+    slides = [{"type": "image", "url": f"{cdn.base_url}/slide_{i}.jpg"} for i in range(1, 4)]
+    layouts = {
+        "reel": [video],
+        "album": slides,
+        "post": slides[:1],
+        "video": [silent],
+    }
+
+    database.content_items.delete_many({})
+    files_for, items = {}, []
+    fallback_every = round(1 / args.fallback_ratio) if args.fallback_ratio else 0
+    for i in range(args.jobs):
+        kind = JOB_KINDS[i % len(JOB_KINDS)]
+        shortcode = f"BENCH{i:05d}"
+        media_urls = layouts[kind]
+        # Some jobs have no CDN URLs, which sends them down the instaloader fallback.
+        use_fallback = fallback_every and i % fallback_every == 0
+        files_for[shortcode] = [media_root / Path(m["url"]).name for m in media_urls]
+        items.append(ContentItemSchema(
+            id=shortcode,
+            source_url=f"https://www.instagram.com/p/{shortcode}/",
+            channel_username="bench_channel_0",
+            priority=5,
+            caption="A deep dive into a python library #python #ai",
+            post_type=kind,
+            media_urls=[] if use_fallback else media_urls,
+        ))
+    database.add_content_items(items)
+    return files_for
+
+
+def install_fakes(files_for: Dict[str, List[Path]], args) -> Dict[str, FaultInjector]:
+    """Builds the pipeline components with fake Gemini models, Whisper and instaloader."""
+    from src import pipeline
+    from src.config import Config
+    from src.fetchers import instagram
+
+    gemini = FaultInjector(args.gemini_latency, error_rate=args.gemini_error_rate,
+                           rate_limit_rate=args.gemini_429_rate, seed=args.seed)
+    faults = {"gemini": gemini, "instaloader": FaultInjector(args.insta_latency, seed=args.seed)}
+
+    instagram.instaloader = FakeInstaloader(files_for, faults=faults["instaloader"])
+    from src.processors.image import IMAGE_PROMPT
+    from src.processors.video import VIDEO_PROMPT
+    from src.prompt_cache import CachedPromptModel
+    from src.summarizers.final_summarizer import SYSTEM_PROMPT
+
+    # The real system prompts, cached in memory, so prompt tokens are billed like the real calls.
+    cache = FakeCacheBackend(faults=gemini)
+    for getter, prompt in ((pipeline.get_video_processor, VIDEO_PROMPT),
+                           (pipeline.get_image_processor, IMAGE_PROMPT),
+                           (pipeline.get_summarizer, SYSTEM_PROMPT)):
+        getter().model = CachedPromptModel("fake-gemini", prompt, backend=cache)
+    pipeline.get_summarizer().lite_model = CachedPromptModel("fake-gemini-lite", SYSTEM_PROMPT, backend=cache)
+
+    Config.WHISPER_WARMUP = args.real_whisper
+    if not args.real_whisper:
+        faults["whisper"] = FaultInjector(args.whisper_latency, seed=args.seed)
+        pipeline._components["audio_processor"] = FakeAudioProcessor(faults=faults["whisper"])
+    return faults
+
+
+def bench_pipeline(database, cdn: LocalCDN, media: Dict[str, str], args) -> Dict:
+    from src.worker import WorkerService
+
+    files_for = seed_jobs(database, cdn, media, args)
+    faults = install_fakes(files_for, args)
+    worker = WorkerService()
+
+    start = time.perf_counter()
+    for _ in range(args.jobs):
+        worker.run_once()
+    elapsed = time.perf_counter() - start
+
+    done = list(database.content_items.find({"status": "completed"}, {"processing_metadata": 1}))
+    failed = database.content_items.count_documents({"status": "failed"})
+
+    per_job, stage_totals = [], defaultdict(list)
+    for item in done:
+        metadata = item.get("processing_metadata") or {}
+        if "processing_time_sec" in metadata:
+            per_job.append(metadata["processing_time_sec"])
+        job_stages = defaultdict(float)
+        for stage in metadata.get("stages", []):
+            job_stages[stage["name"] if stage["parent"] is None else f"{stage['parent']}/{stage['name']}"] += stage["wall_sec"]
+        for name, seconds in job_stages.items():
+            stage_totals[name].append(seconds)
+
+    stages = {}
+    for name, values in sorted(stage_totals.items()):
+        stages[name] = summarize(values)
+        # Throughput if this stage were the only cost, averaged over all completed jobs.
+        per_job_cost = sum(values) / len(done) if done else 0
+        stages[name]["jobs_per_hour_if_bottleneck"] = round(3600 / per_job_cost, 1) if per_job_cost else None
+
+    return {
+        "jobs": args.jobs,
+        "completed": len(done),
+        "failed": failed,
+        "duration_sec": round(elapsed, 3),
+        "jobs_per_hour": round(len(done) / elapsed * 3600, 1) if elapsed else None,
+        "end_to_end": summarize(per_job),
+        "stages": stages,
+        "fake_calls": {name: f.stats() for name, f in faults.items()},
+    }
+
+
+def compare(results: Dict, baseline_path: str, tolerance: float) -> bool:
+    """Prints per-metric changes against a previous run. Returns False on a regression."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+
+    rows = []
+    old, new = baseline.get("pipeline", {}), results.get("pipeline", {})
+    rows.append(("pipeline jobs/hour", old.get("jobs_per_hour"), new.get("jobs_per_hour"), True))
+    for name in sorted(set(old.get("stages", {})) | set(new.get("stages", {}))):
+        rows.append((
+            f"stage {name} mean (s)",
+            old.get("stages", {}).get(name, {}).get("mean_sec"),
+            new.get("stages", {}).get(name, {}).get("mean_sec"),
+            False,
+        ))
+    for phase in ("bootstrap", "scheduled_check"):
+        rows.append((
+            f"discovery {phase} channels/hour",
+            baseline.get("discovery", {}).get(phase, {}).get("channels_per_hour"),
+            results.get("discovery", {}).get(phase, {}).get("channels_per_hour"),
+            True,
+        ))
+
+    ok = True
+    print(f"\n{'metric':<48} {'baseline':>10} {'current':>10} {'change':>8}")
+    for label, before, after, higher_is_better in rows:
+        if not before or after is None:
+            print(f"{label:<48} {before if before is not None else '-':>10} {after if after is not None else '-':>10}")
+            continue
+        change = (after - before) / before
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        ok = ok and not regressed
+        print(f"{label:<48} {before:>10} {after:>10} {change:>+7.1%}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline discovery and pipeline throughput benchmark.")
+    parser.add_argument("--jobs", type=int, default=12, help="Content items to push through the pipeline.")
+    parser.add_argument("--channels", type=int, default=20, help="Channels for the discovery phase (0 to skip).")
+    parser.add_argument("--posts-per-channel", type=int, default=60)
+    parser.add_argument("--gemini-latency", type=float, default=1.5, help="Seconds per fake Gemini call.")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-429-rate", type=float, default=0.0)
+    parser.add_argument("--insta-latency", type=float, default=0.3, help="Seconds per fake Instagram request.")
+    parser.add_argument("--insta-error-rate", type=float, default=0.0)
+    parser.add_argument("--cdn-latency", type=float, default=0.05, help="Seconds before each CDN response.")
+    parser.add_argument("--whisper-latency", type=float, default=4.0, help="Seconds per fake transcription.")
+    parser.add_argument("--fallback-ratio", type=float, default=0.0, help="Share of jobs without CDN URLs (instaloader path).")
+    parser.add_argument("--real-whisper", action="store_true", help="Use the real Whisper models (must be cached locally).")
+    parser.add_argument("--mongo-uri", required=True, help="A mongod to benchmark against, e.g. mongodb://localhost:27017.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", help="Working directory (defaults to a temporary one, removed afterwards).")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file.")
+    parser.add_argument("--compare", help="A previous --json output to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown before --compare fails.")
+    args = parser.parse_args()
+
+    keep_workdir = bool(args.workdir)
+    args.workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="insta_bench_"))
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+
+    # Run from the workdir so temp_files/ lands there, and never against real services.
+    os.makedirs(args.workdir, exist_ok=True)
+    os.chdir(args.workdir)
+    os.environ["MONGO_URI"] = args.mongo_uri
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+    from src.config import Config, setup_logging
+    Config.LOG_LEVEL = os.getenv("BENCH_LOG_LEVEL", "WARNING")
+    setup_logging()
+    Config.ensure_dirs()
+
+    media = generate_media(Path(args.workdir) / "media")
+    cdn = LocalCDN(Path(args.workdir) / "media", latency_sec=args.cdn_latency)
+    try:
+        database = setup_database()
+        results = {}
+        if args.channels:
+            results["discovery"] = bench_discovery(database, cdn, media, args)
+        if args.jobs:
+            results["pipeline"] = bench_pipeline(database, cdn, media, args)
+    finally:
+        cdn.close()
+        os.chdir(ROOT)
+        if not keep_workdir:
+            shutil.rmtree(args.workdir, ignore_errors=True)
+
+    config = {k: v for k, v in vars(args).items() if k not in ("json_path", "compare", "workdir")}
+    output = {
+        "benchmark": "pipeline_throughput",
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": config,
+        "results": results,
+    }
+    print(json.dumps(results, indent=2))
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"Results written to {json_path}")
+
+    if compare_path and not compare(results, compare_path, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Generates the synthetic media the offline benchmarks feed through the pipeline:
+a short reel with a speech-like audio track, a silent slideshow video and
+carousel images with on-screen text.
+"""
+import math
+import os
+import random
+import shutil
+import struct
+import subprocess
+import wave
+from pathlib import Path
+from typing import Dict
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+def write_tone(path: Path, seconds: float, sample_rate: int = 16000, seed: int = 0):
+    """A 16-bit mono WAV alternating voiced bursts and pauses, loosely shaped like speech."""
+    rng = random.Random(seed)
+    frames = bytearray()
+    for n in range(int(seconds * sample_rate)):
+        t = n / sample_rate
+        voiced = (t % 1.0) < 0.7
+        pitch = 140 + 40 * math.sin(2 * math.pi * 0.5 * t)
+        sample = 0.5 * math.sin(2 * math.pi * pitch * t) if voiced else 0.0
+        sample += rng.uniform(-0.02, 0.02)
+        frames += struct.pack("<h", int(max(-1.0, min(1.0, sample)) * 32767))
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(bytes(frames))
+
+
+def write_video(path: Path, seconds: float, fps: int = 24, size=(720, 1280), scenes: int = 4, text: bool = True):
+    """An MP4 cycling through solid-colour scenes, optionally with a text overlay."""
+    width, height = size
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    total = int(seconds * fps)
+    for i in range(total):
+        scene = i * scenes // total
+        frame = np.full((height, width, 3), ((scene * 70) % 256, (scene * 130) % 256, (scene * 40 + 90) % 256), np.uint8)
+        if text:
+            cv2.putText(frame, f"Step {scene + 1}: pip install example", (40, height // 2),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.4, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+
+
+def mux_audio(video_path: Path, audio_path: Path, out_path: Path):
+    """Adds an audio track with the ffmpeg binary bundled by imageio-ffmpeg."""
+    import imageio_ffmpeg
+
+    subprocess.run(
+        [imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error", "-i", str(video_path), "-i", str(audio_path),
+         "-c:v", "copy", "-c:a", "aac", "-shortest", str(out_path)],
+        check=True,
+    )
+
+
+def write_slide(path: Path, index: int, size=(1080, 1080)):
+    """A carousel slide with a heading and a few lines of text."""
+    image = Image.new("RGB", size, ((index * 60) % 256, 40, 120))
+    draw = ImageDraw.Draw(image)
+    draw.text((80, 120), f"Slide {index}: Python tips", fill=(255, 255, 255))
+    for line in range(6):
+        draw.text((80, 260 + line * 60), f"{line + 1}. Use list comprehensions wisely", fill=(230, 230, 230))
+    image.save(path, "JPEG", quality=85)
+
+
+def generate_media(root: Path, reel_seconds: float = 15.0) -> Dict[str, str]:
+    """
+    Writes the synthetic media set into `root` (skipping files that already exist)
+    and returns a map of media kind to file name, relative to `root`.
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    files = {
+        "video": "reel.mp4",
+        "silent_video": "slideshow.mp4",
+        "image": "slide_1.jpg",
+    }
+
+    if not (root / files["video"]).exists():
+        silent, audio = root / "reel_silent.mp4", root / "reel.wav"
+        write_video(silent, reel_seconds)
+        write_tone(audio, reel_seconds)
+        try:
+            mux_audio(silent, audio, root / files["video"])
+        except Exception:
+            # No ffmpeg: fall back to a silent reel (the audio stages will be skipped).
+            shutil.copyfile(silent, root / files["video"])
+        finally:
+            for tmp in (silent, audio):
+                if tmp.exists():
+                    os.remove(tmp)
+
+    if not (root / files["silent_video"]).exists():
+        write_video(root / files["silent_video"], reel_seconds / 2, scenes=8)
+
+    for index in range(1, 4):
+        slide = root / f"slide_{index}.jpg"
+        if not slide.exists():
+            write_slide(slide, index)
+
+    return files
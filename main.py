@@ -1,14 +1,22 @@
-from src.config import Config, logger
+from src.config import Config, logger, setup_logging
 from apscheduler.schedulers.blocking import BlockingScheduler
 from src.fetchers.discoverer import DiscovererService
 from src.worker import WorkerService
 
 if __name__ == "__main__":
+    setup_logging()
+    Config.ensure_dirs()
+
     # 1. Validate config first
     logger.info("Validating configuration...")
     Config.validate()
     logger.info("Configuration valid.")
 
+    # Optional Prometheus endpoint (METRICS_PORT) for queue depth, throughput and stage latencies
+    if Config.METRICS_PORT:
+        from src.metrics import start_metrics_server
+        start_metrics_server()
+
     # 2. Instantiate services
     logger.info("Initializing services...")
     discoverer = DiscovererService()
@@ -36,16 +44,64 @@ if __name__ == "__main__":
         id="worker_job"
     )
 
+    # Job 3: The Janitor
+    # Sweeps orphaned temp files and enforces the temp disk quota
+    scheduler.add_job(
+        worker.janitor.run_once,
+        "interval",
+        minutes=Config.JANITOR_INTERVAL_MINUTES,
+        id="janitor_job"
+    )
+
+    # Job 4: Priority aging
+    # Raises the effective priority of items the longer they wait, so low-priority channels aren't starved
+    scheduler.add_job(
+        worker.db.refresh_effective_priorities,
+        "interval",
+        minutes=Config.PRIORITY_AGING_INTERVAL_MINUTES,
+        id="priority_aging_job"
+    )
+
+    # Job 5: Claim reaper
+    # Re-queues items whose worker crashed or was killed before finishing them
+    scheduler.add_job(
+        worker.db.reclaim_expired_claims,
+        "interval",
+        minutes=Config.PRIORITY_AGING_INTERVAL_MINUTES,
+        id="claim_reaper_job"
+    )
+
+    # Job 6: The Prefetcher (optional)
+    # Downloads media for the next pending items so workers don't wait on the network
+    if Config.PREFETCH_ENABLED:
+        from src.fetchers.prefetcher import MediaPrefetcher
+        prefetcher = MediaPrefetcher()
+        scheduler.add_job(
+            prefetcher.run_once,
+            "interval",
+            minutes=Config.PREFETCH_INTERVAL_MINUTES,
+            id="prefetcher_job"
+        )
+
     print("=" * 50)
     print("Scheduler is now running.")
     print("  - Discoverer (Scout) runs every 30 minutes.")
     print("  - Worker (Factory) runs every 5 minutes.")
+    print(f"  - Janitor runs every {Config.JANITOR_INTERVAL_MINUTES} minutes.")
+    print(f"  - Priority aging runs every {Config.PRIORITY_AGING_INTERVAL_MINUTES} minutes.")
+    print(f"  - Claims older than {Config.CLAIM_LEASE_MINUTES} minutes are re-queued every {Config.PRIORITY_AGING_INTERVAL_MINUTES} minutes.")
+    if Config.PREFETCH_ENABLED:
+        print(f"  - Prefetcher runs every {Config.PREFETCH_INTERVAL_MINUTES} minutes.")
+    if Config.METRICS_PORT:
+        print(f"  - Metrics served at http://127.0.0.1:{Config.METRICS_PORT}/metrics")
     print("Press Ctrl+C to exit.")
     print("=" * 50)
 
     # 4. Run the scheduler
     try:
         # Run jobs once on startup for immediate feedback
+        # Items queued before effective_priority existed get one on the first aging pass.
+        scheduler.get_job('priority_aging_job').func()
         logger.info("--- Running initial discoverer job on startup... ---")
         scheduler.get_job('discoverer_job').func()
         logger.info("--- Running initial worker job on startup... ---")
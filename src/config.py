@@ -14,14 +14,125 @@ class Config:
     TEMP_DIR = "temp_files"  # For videos, audio, frames
     LOG_LEVEL = logging.INFO
 
+    # --- Discovery ---
+    DISCOVERY_CONCURRENCY = int(os.getenv("DISCOVERY_CONCURRENCY", 4))  # Channels checked in parallel (at most one per session)
+    INSTA_REQUESTS_PER_MINUTE = float(os.getenv("INSTA_REQUESTS_PER_MINUTE", 30))  # Per Instagram session
+    INSTA_REQUEST_BURST = int(os.getenv("INSTA_REQUEST_BURST", 5))
+    DISCOVERY_PAGE_SIZE = int(os.getenv("DISCOVERY_PAGE_SIZE", 12))  # Feed items per request in scheduled checks
+    BOOTSTRAP_PAGE_SIZE = int(os.getenv("BOOTSTRAP_PAGE_SIZE", 33))  # Feed items per request in bootstraps
+    DISCOVERY_FLUSH_EVERY = int(os.getenv("DISCOVERY_FLUSH_EVERY", 25))  # Channels per bulk write flush
+    SHORTCODE_INDEX_ENABLED = os.getenv("SHORTCODE_INDEX_ENABLED", "true").lower() == "true"
+    SHORTCODE_INDEX_CAPACITY = int(os.getenv("SHORTCODE_INDEX_CAPACITY", 1_000_000))
+    SHORTCODE_INDEX_ERROR_RATE = float(os.getenv("SHORTCODE_INDEX_ERROR_RATE", 0.01))
+    PROFILE_REFRESH_HOURS = int(os.getenv("PROFILE_REFRESH_HOURS", 7 * 24))  # Follower counts, bio, etc.
+
+    # --- Media downloads ---
+    DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", 4))  # Parallel files per post
+    DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", 3))
+    DOWNLOAD_TIMEOUT_SEC = int(os.getenv("DOWNLOAD_TIMEOUT_SEC", 30))
+    # Smallest variant whose short side is at least this many pixels (frames are analysed at 512x512).
+    ANALYSIS_MIN_RESOLUTION = int(os.getenv("ANALYSIS_MIN_RESOLUTION", 480))
+    MAX_MEDIA_BYTES_PER_POST = int(os.getenv("MAX_MEDIA_BYTES_PER_POST", 0))  # 0 = no cap
+    OVERSIZE_VIDEO_POLICY = os.getenv("OVERSIZE_VIDEO_POLICY", "skip")  # "skip", or "truncate" (kept only if the cut file still decodes)
+
+    # --- Media prefetching ---
+    PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+    PREFETCH_DIR = os.path.join(TEMP_DIR, "prefetch")
+    PREFETCH_COUNT = int(os.getenv("PREFETCH_COUNT", 5))  # Next K pending items to keep on disk
+    PREFETCH_DISK_BUDGET_MB = int(os.getenv("PREFETCH_DISK_BUDGET_MB", 1024))
+    PREFETCH_TTL_HOURS = int(os.getenv("PREFETCH_TTL_HOURS", 12))
+    PREFETCH_INTERVAL_MINUTES = int(os.getenv("PREFETCH_INTERVAL_MINUTES", 2))
+
+    # --- Temp directory janitor ---
+    FAST_TEMP_DIR = os.getenv("FAST_TEMP_DIR")  # Optional tmpfs/RAM-disk path for small files (extracted audio)
+    TEMP_QUOTA_MB = int(os.getenv("TEMP_QUOTA_MB", 10 * 1024))
+    JANITOR_GRACE_MINUTES = int(os.getenv("JANITOR_GRACE_MINUTES", 60))  # Don't touch anything newer
+    JANITOR_INTERVAL_MINUTES = int(os.getenv("JANITOR_INTERVAL_MINUTES", 30))
+
+    # --- Queue scheduling ---
+    PRIORITY_AGING_PER_HOUR = float(os.getenv("PRIORITY_AGING_PER_HOUR", 0.5))  # Effective priority gained per hour in queue
+    PRIORITY_AGING_MAX_BOOST = float(os.getenv("PRIORITY_AGING_MAX_BOOST", 9))  # Cap on the aging bonus
+    PRIORITY_AGING_INTERVAL_MINUTES = int(os.getenv("PRIORITY_AGING_INTERVAL_MINUTES", 5))
+    CHANNEL_MAX_IN_FLIGHT = int(os.getenv("CHANNEL_MAX_IN_FLIGHT", 0))  # Max items of one channel processing at once (0 = no limit)
+    CLAIM_LEASE_MINUTES = int(os.getenv("CLAIM_LEASE_MINUTES", 120))  # Claims older than this are treated as abandoned and re-queued
+
+    # --- Job cost model and admission control ---
+    COST_WEIGHT = float(os.getenv("COST_WEIGHT", 0.5))  # Claim by priority / cost_units ** weight (0 = ignore cost)
+    COST_CALIBRATION_HOURS = int(os.getenv("COST_CALIBRATION_HOURS", 6))  # How often to re-fit the estimates
+    COST_CALIBRATION_SAMPLES = int(os.getenv("COST_CALIBRATION_SAMPLES", 200))  # Recent completed jobs to fit on
+    DAILY_CPU_BUDGET_SEC = int(os.getenv("DAILY_CPU_BUDGET_SEC", 0))  # Worker CPU seconds per UTC day (0 = unlimited)
+    DAILY_TOKEN_BUDGET = int(os.getenv("DAILY_TOKEN_BUDGET", 0))  # Gemini tokens per UTC day (0 = unlimited)
+    BUDGET_PROTECTED_PRIORITY = int(os.getenv("BUDGET_PROTECTED_PRIORITY", 7))  # Items at this priority ignore the budgets
+
+    # --- Instagram session pool ---
+    SESSION_FILE = os.path.join(TEMP_DIR, "session.json")  # Session for INSTA_USERNAME
+    SESSION_DIR = os.path.join(TEMP_DIR, "sessions")  # Sessions for INSTA_ACCOUNTS
+    INSTA_ACCOUNTS = [a.strip() for a in os.getenv("INSTA_ACCOUNTS", "").split(",") if a.strip()]  # user:pass,...
+    INSTA_SESSION_FILES = [f.strip() for f in os.getenv("INSTA_SESSION_FILES", "").split(",") if f.strip()]
+    INSTA_SESSION_COOLDOWN_SEC = int(os.getenv("INSTA_SESSION_COOLDOWN_SEC", 900))
+    INSTA_SESSION_MAX_COOLDOWN_SEC = int(os.getenv("INSTA_SESSION_MAX_COOLDOWN_SEC", 6 * 3600))
+
+    # --- Final summarizer ---
+    SUMMARY_INPUT_TOKEN_BUDGET = int(os.getenv("SUMMARY_INPUT_TOKEN_BUDGET", 6000))  # Estimated input tokens per post (0 = unlimited)
+    SUMMARY_CAPTION_SHARE = float(os.getenv("SUMMARY_CAPTION_SHARE", 0.25))  # Most of the budget the caption may use
+    SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", 1))  # Jobs a worker claims and summarizes in one request (1 = off)
+    SUMMARY_BATCH_MAX_WAIT_SEC = int(os.getenv("SUMMARY_BATCH_MAX_WAIT_SEC", 120))  # Longest an analyzed job waits for more batch members
+    SUMMARY_STRUCTURED_OUTPUT = os.getenv("SUMMARY_STRUCTURED_OUTPUT", "true").lower() == "true"  # Request JSON instead of Markdown
+
+    # Model routing: short/simple inputs go to the lite model, escalating to the full one on a malformed report
+    SUMMARY_FULL_MODEL = os.getenv("SUMMARY_FULL_MODEL", "gemini-2.5-flash")
+    SUMMARY_LITE_MODEL = os.getenv("SUMMARY_LITE_MODEL", "gemini-2.5-flash-lite")
+    SUMMARY_ROUTING_ENABLED = os.getenv("SUMMARY_ROUTING_ENABLED", "true").lower() == "true"
+    SUMMARY_LITE_MAX_TOKENS = int(os.getenv("SUMMARY_LITE_MAX_TOKENS", 1500))  # Estimated input tokens
+    SUMMARY_LITE_QUEUE_DEPTH = int(os.getenv("SUMMARY_LITE_QUEUE_DEPTH", 200))  # Pending items that switch everything to lite (0 = off)
+    SUMMARY_RATE_LIMIT_COOLDOWN_SEC = int(os.getenv("SUMMARY_RATE_LIMIT_COOLDOWN_SEC", 120))  # Use lite this long after a 429
+
+    # Single-call fast path: one image or one video goes straight to the final model
+    FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+    FAST_PATH_MAX_INPUT_TOKENS = int(os.getenv("FAST_PATH_MAX_INPUT_TOKENS", 8000))  # Estimated, media included
+    FAST_PATH_MAX_FRAMES = int(os.getenv("FAST_PATH_MAX_FRAMES", 10))
+
+    # --- Gemini context caching of the fixed system prompts ---
+    PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() == "true"
+    PROMPT_CACHE_TTL_SEC = int(os.getenv("PROMPT_CACHE_TTL_SEC", 3600))
+    PROMPT_CACHE_REFRESH_SEC = int(os.getenv("PROMPT_CACHE_REFRESH_SEC", 300))  # Extend the TTL when less than this is left
+    PROMPT_CACHE_RETRY_SEC = int(os.getenv("PROMPT_CACHE_RETRY_SEC", 600))  # Wait after a failed cache creation
+
+    # --- Metrics ---
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Serve Prometheus metrics on this local port (0 = off)
+
+    # --- Profiling ---
+    PROFILE_JOBS = os.getenv("PROFILE_JOBS", "false").lower() == "true"  # Profile every job
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0.0))  # Fraction of jobs to profile at random
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_SAMPLE_INTERVAL_MS = int(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 10))  # Stack sampler interval
+    PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", 5))
+    PROFILE_TORCH = os.getenv("PROFILE_TORCH", "false").lower() == "true"  # Also trace Whisper with torch.profiler
+
+    # --- Record/replay ---
+    RECORD_JOBS = os.getenv("RECORD_JOBS", "false").lower() == "true"  # Archive every job's Instagram/Gemini calls
+    RECORD_DIR = os.getenv("RECORD_DIR", "recordings")
+
+    # --- Startup ---
+    WHISPER_WARMUP = os.getenv("WHISPER_WARMUP", "true").lower() == "true"  # Preload Whisper while the first job downloads
+
     @staticmethod
     def validate():
-        if not all([Config.INSTA_USERNAME, Config.INSTA_PASSWORD, Config.GOOGLE_API_KEY, Config.MONGO_URI]):
+        if not all([Config.GOOGLE_API_KEY, Config.MONGO_URI]):
             raise ValueError("Missing required env vars in .env")
+        has_primary = Config.INSTA_USERNAME and Config.INSTA_PASSWORD
+        if not (has_primary or Config.INSTA_ACCOUNTS or Config.INSTA_SESSION_FILES):
+            raise ValueError("No Instagram credentials or session files configured in .env")
+
+    @staticmethod
+    def ensure_dirs():
+        """Creates the temp dir. Called by entry points rather than on import."""
+        os.makedirs(Config.TEMP_DIR, exist_ok=True)
+
 
-# Setup logging
-logging.basicConfig(level=Config.LOG_LEVEL, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-# Create temp dir
-os.makedirs(Config.TEMP_DIR, exist_ok=True)
\ No newline at end of file
+
+def setup_logging():
+    """Configures root logging. Called by entry points so importing src.config has no side effects."""
+    logging.basicConfig(level=Config.LOG_LEVEL, format="%(asctime)s - %(levelname)s - %(message)s")
\ No newline at end of file
@@ -0,0 +1,110 @@
+import statistics
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.config import Config, logger
+
+# Priors for one job, before calibration against completed items.
+BASE_CPU_SEC = 4.0  # Download, keyframe/image decoding, bookkeeping
+CPU_SEC_PER_IMAGE = 0.5
+CPU_SEC_PER_VIDEO_SEC = 1.5  # Whisper on CPU dominates
+BASE_TOKENS = 2500  # Final summary prompt and report
+TOKENS_PER_IMAGE = 258 + 100  # Input image plus its share of the analysis output
+TOKENS_PER_VIDEO = 10 * 258 + 400  # Keyframes and the visual summary
+TOKENS_PER_VIDEO_SEC = 4  # Transcript text passed to the final summary
+DEFAULT_VIDEO_SEC = 30  # When Instagram gives no duration (carousel videos)
+
+# Calibration factors are clamped so a few odd jobs can't swing the estimates wildly.
+MIN_FACTOR, MAX_FACTOR = 0.2, 5.0
+MIN_SAMPLES = 5
+
+_calibration: Dict[str, Any] = {"at": 0.0, "cpu": {}, "tokens": {}}
+_calibration_lock = threading.Lock()
+
+
+def _media_counts(post_type: Optional[str], video_duration: Optional[float], media_urls: Optional[List[Dict]]):
+    """Returns (images, videos, video seconds) for a post."""
+    media = media_urls or []
+    images = sum(1 for m in media if m.get("type") == "image")
+    videos = sum(1 for m in media if m.get("type") == "video")
+    if not media:
+        # Items discovered before media_urls were captured.
+        images, videos = (0, 1) if post_type in ("reel", "video") else (1, 0)
+    seconds = (video_duration or DEFAULT_VIDEO_SEC * videos) if videos else 0
+    return images, videos, seconds
+
+
+def prior(post_type: Optional[str], video_duration: Optional[float], media_urls: Optional[List[Dict]]) -> Dict[str, float]:
+    images, videos, seconds = _media_counts(post_type, video_duration, media_urls)
+    return {
+        "cpu_sec": BASE_CPU_SEC + CPU_SEC_PER_IMAGE * images + CPU_SEC_PER_VIDEO_SEC * seconds,
+        "tokens": BASE_TOKENS + TOKENS_PER_IMAGE * images + TOKENS_PER_VIDEO * videos + TOKENS_PER_VIDEO_SEC * seconds,
+    }
+
+
+# A single-image post: the unit that cost_units are measured in.
+REFERENCE = prior("post", None, [{"type": "image"}])
+
+
+def estimate(post_type: Optional[str], video_duration: Optional[float], media_urls: Optional[List[Dict]]) -> Dict[str, float]:
+    """
+    Predicts a job's CPU seconds and Gemini tokens from its post type, video
+    duration and carousel size, scaled by how completed jobs of the same type
+    compared with the prior. `units` is the cost relative to a single-image post.
+    """
+    base = prior(post_type, video_duration, media_urls)
+    cpu = base["cpu_sec"] * _calibration["cpu"].get(post_type, 1.0)
+    tokens = base["tokens"] * _calibration["tokens"].get(post_type, 1.0)
+    units = 0.5 * cpu / REFERENCE["cpu_sec"] + 0.5 * tokens / REFERENCE["tokens"]
+    return {"cpu_sec": round(cpu, 1), "tokens": int(tokens), "units": round(units, 3)}
+
+
+def claim_score(priority: float, cost: Optional[Dict[str, float]]) -> float:
+    """Value per cost: priority divided by cost units raised to COST_WEIGHT (0 = ignore cost)."""
+    units = (cost or {}).get("units") or 1.0
+    return round(priority / units ** Config.COST_WEIGHT, 3)
+
+
+def calibrate(db, force: bool = False):
+    """
+    Re-fits the per-post-type factors from recently completed jobs' recorded
+    CPU time and tokens, at most every COST_CALIBRATION_HOURS.
+    """
+    with _calibration_lock:
+        if not force and time.time() - _calibration["at"] < Config.COST_CALIBRATION_HOURS * 3600:
+            return
+        _calibration["at"] = time.time()
+
+    try:
+        samples = db.recent_cost_samples(Config.COST_CALIBRATION_SAMPLES)
+    except Exception as e:
+        logger.warning(f"Cost model calibration skipped: {e}")
+        return
+
+    ratios: Dict[str, Dict[str, List[float]]] = {"cpu": {}, "tokens": {}}
+    for item in samples:
+        metadata = item.get("processing_metadata") or {}
+        stages = [s for s in metadata.get("stages") or [] if s.get("parent") is None]
+        if not stages:
+            continue
+        base = prior(item.get("post_type"), item.get("video_duration"), item.get("media_urls"))
+        cpu = sum(s.get("cpu_sec", 0) for s in stages)
+        tokens = (metadata.get("input_tokens") or 0) + (metadata.get("output_tokens") or 0)
+        post_type = item.get("post_type")
+        if cpu:
+            ratios["cpu"].setdefault(post_type, []).append(cpu / base["cpu_sec"])
+        if tokens:
+            ratios["tokens"].setdefault(post_type, []).append(tokens / base["tokens"])
+
+    factors = {
+        kind: {
+            post_type: min(max(statistics.median(values), MIN_FACTOR), MAX_FACTOR)
+            for post_type, values in by_type.items()
+            if len(values) >= MIN_SAMPLES
+        }
+        for kind, by_type in ratios.items()
+    }
+    with _calibration_lock:
+        _calibration.update(factors)
+    logger.info(f"📐 Cost model calibrated from {len(samples)} jobs: cpu {factors['cpu']}, tokens {factors['tokens']}")
@@ -1,8 +1,9 @@
 from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument, UpdateOne
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict
 from src.config import logger, Config
 from src.database.schemas import ContentItemSchema, ChannelSchema
+from src.cost_model import claim_score
 
 
 class Database:
@@ -26,12 +27,20 @@ class Database:
             cls._instance.db = cls._instance.client["content_pipeline"]
             cls._instance.channels = cls._instance.db["channels"]
             cls._instance.content_items = cls._instance.db["content_items"]
+            cls._instance.budgets = cls._instance.db["budgets"]
             cls._instance._create_indexes()
             logger.info("✅ Database initialized and indexes ensured.")
         return cls._instance
 
     def _create_indexes(self):
         self.channels.create_index([("is_active", ASCENDING)])
+        self.channels.create_index(
+            [
+                ("is_active", ASCENDING),
+                ("next_check_at", ASCENDING),
+                ("priority", DESCENDING),
+            ]
+        )
         self.content_items.create_index(
             [
                 ("status", ASCENDING),
@@ -39,7 +48,16 @@ class Database:
                 ("added_at", ASCENDING),
             ]
         )
+        self.content_items.create_index(
+            [
+                ("status", ASCENDING),
+                ("claim_score", DESCENDING),
+                ("added_at", ASCENDING),
+            ]
+        )
         self.content_items.create_index([("channel_username", ASCENDING)])
+        # Recently completed items, for cost model calibration.
+        self.content_items.create_index([("status", ASCENDING), ("processed_at", DESCENDING)])
         # Do not attempt to create a unique _id index — MongoDB provides that by default.
         logger.debug("Indexes ensured on channels and content_items collections.")
 
@@ -67,71 +85,88 @@ class Database:
         logger.info(f"💾 Channel '{channel_id}' saved/updated.")
 
     def get_due_channels(self) -> List[Dict]:
-        """Gets all active channels due for a check."""
+        """Gets all active channels due for a check (an index range scan on next_check_at)."""
         now = datetime.now(timezone.utc)
-        query = {
-            "is_active": True,
-            "$or": [
-                {"last_checked_at": None},
-                {
-                    "$expr": {
-                        "$lte": [
-                            {
-                                "$dateAdd": {
-                                    "startDate": "$last_checked_at",
-                                    "unit": "hour",
-                                    "amount": {
-                                        "$ifNull": ["$fetch_frequency_hours", 6]
-                                    },
-                                }
-                            },
-                            now,
-                        ]
-                    }
-                },
-            ],
-        }
+        query = {"is_active": True, "next_check_at": {"$lte": now}}
         channels = list(self.channels.find(query).sort("priority", DESCENDING))
         logger.info(f"get_due_channels: found {len(channels)} due channels.")
-        # Debug fallback: if none found, return all active channels for inspection
-        if not channels:
-            logger.warning(
-                "No due channels found. Returning all active channels for debugging."
-            )
-            channels = list(
-                self.channels.find({"is_active": True}).sort("priority", DESCENDING)
-            )
         return channels
 
+    def channel_checked_update(self, fields: Optional[Dict] = None) -> List[Dict]:
+        """
+        Builds an update pipeline that sets `fields`, stamps last_checked_at and
+        precomputes next_check_at from the channel's fetch_frequency_hours.
+        The stages run in order, so a new fetch_frequency_hours in `fields` is used.
+        """
+        now = datetime.now(timezone.utc)
+        stages = []
+        if fields:
+            stages.append({"$set": {key: {"$literal": value} for key, value in fields.items()}})
+        stages.append(
+            {
+                "$set": {
+                    "last_checked_at": now,
+                    "next_check_at": {
+                        "$dateAdd": {
+                            "startDate": now,
+                            "unit": "hour",
+                            "amount": {"$ifNull": ["$fetch_frequency_hours", 6]},
+                        }
+                    },
+                }
+            }
+        )
+        return stages
+
     def update_channel_after_fetch(
-        self, channel_id: str, last_shortcode: Optional[str]
+        self, channel_id: str, last_shortcode: Optional[str], last_taken_at: Optional[datetime] = None
     ):
         """Update channel with last fetch info."""
         if last_shortcode is None:
             self.mark_channel_checked(channel_id)
             return
 
-        self.channels.update_one(
-            {"_id": channel_id},
-            {
-                "$set": {
-                    "last_checked_at": datetime.now(timezone.utc),
-                    "last_fetched_shortcode": last_shortcode,
-                }
-            },
-        )
+        fields = {"last_fetched_shortcode": last_shortcode}
+        if last_taken_at:
+            fields["last_fetched_taken_at"] = last_taken_at
+        self.channels.update_one({"_id": channel_id}, self.channel_checked_update(fields))
 
     def mark_channel_checked(self, channel_id: str):
-        self.channels.update_one(
-            {"_id": channel_id},
-            {"$set": {"last_checked_at": datetime.now(timezone.utc)}},
-        )
+        self.channels.update_one({"_id": channel_id}, self.channel_checked_update())
 
-    def add_content_items(self, items: List[ContentItemSchema]) -> int:
-        """Bulk insert content items if not already existing."""
-        if not items:
-            return 0
+    def backfill_next_check_at(self) -> int:
+        """
+        Migration: sets next_check_at on channels created before it existed.
+        Never-checked channels become due immediately.
+        """
+        now = datetime.now(timezone.utc)
+        result = self.channels.update_many(
+            {"next_check_at": None},
+            [
+                {
+                    "$set": {
+                        "next_check_at": {
+                            "$cond": [
+                                {"$eq": [{"$ifNull": ["$last_checked_at", None]}, None]},
+                                now,
+                                {
+                                    "$dateAdd": {
+                                        "startDate": "$last_checked_at",
+                                        "unit": "hour",
+                                        "amount": {"$ifNull": ["$fetch_frequency_hours", 6]},
+                                    }
+                                },
+                            ]
+                        }
+                    }
+                }
+            ],
+        )
+        logger.info(f"Backfilled next_check_at on {result.modified_count} channels.")
+        return result.modified_count
 
+    def content_item_ops(self, items: List[ContentItemSchema]) -> List[UpdateOne]:
+        """Builds insert-if-missing upserts for content items."""
         operations = []
         for item in items:
             item_dict = self._dump_model(item)
@@ -139,10 +174,21 @@ class Database:
             if item_id is None:
                 logger.debug("Skipping content item without _id.")
                 continue
+            if item_dict.get("effective_priority") is None:
+                item_dict["effective_priority"] = item_dict.get("priority", 1)
+            if item_dict.get("claim_score") is None:
+                item_dict["claim_score"] = claim_score(item_dict["effective_priority"], item_dict.get("cost_estimate"))
             operations.append(
                 UpdateOne({"_id": item_id}, {"$setOnInsert": item_dict}, upsert=True)
             )
+        return operations
+
+    def add_content_items(self, items: List[ContentItemSchema]) -> int:
+        """Bulk insert content items if not already existing."""
+        if not items:
+            return 0
 
+        operations = self.content_item_ops(items)
         if not operations:
             return 0
 
@@ -157,31 +203,150 @@ class Database:
         logger.info(f"Updated @{channel_id} with new channel info.")
 
     def mark_channel_bootstrapped(
-        self, channel_id: str, latest_shortcode: Optional[str]
+        self, channel_id: str, latest_shortcode: Optional[str], latest_taken_at: Optional[datetime] = None
     ):
         """Marks a channel as bootstrapped and sets its initial state."""
-        update_data = {
-            "is_bootstrapped": True,
-            "last_checked_at": datetime.now(timezone.utc),
-        }
+        update_data = {"is_bootstrapped": True}
         if latest_shortcode:
             update_data["last_fetched_shortcode"] = latest_shortcode
+        if latest_taken_at:
+            update_data["last_fetched_taken_at"] = latest_taken_at
 
-        self.channels.update_one({"_id": channel_id}, {"$set": update_data})
+        self.channels.update_one({"_id": channel_id}, self.channel_checked_update(update_data))
 
     def claim_pending_item(self) -> Optional[Dict]:
+        """
+        Claims the pending item with the highest claim_score: its effective
+        (aged) priority per unit of estimated cost. With CHANNEL_MAX_IN_FLIGHT
+        set, channels that already have that many items processing are
+        skipped; with daily budgets set, low-priority items that no longer fit
+        in today's remaining budget are deferred. Both limits are best-effort:
+        workers claiming at the same moment can all pass them.
+        """
         return self.content_items.find_one_and_update(
-            {"status": "pending"},
+            self._claimable_query(),
             {
                 "$set": {
                     "status": "processing",
                     "processed_at": datetime.now(timezone.utc),
+                    "claimed_at": datetime.now(timezone.utc),
                 }
             },
-            sort=[("priority", DESCENDING), ("added_at", ASCENDING)],
+            sort=[("claim_score", DESCENDING), ("added_at", ASCENDING)],
             return_document=ReturnDocument.AFTER,
         )
 
+    def _claimable_query(self) -> Dict:
+        """Pending items a worker may claim now: outside busy channels and within today's budget."""
+        query = {"status": "pending"}
+        if Config.CHANNEL_MAX_IN_FLIGHT > 0:
+            busy = self.channels_at_quota(Config.CHANNEL_MAX_IN_FLIGHT)
+            if busy:
+                query["channel_username"] = {"$nin": busy}
+        within_budget = self.budget_filter()
+        if within_budget:
+            query.update(within_budget)
+        return query
+
+    def _lease_cutoff(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(minutes=Config.CLAIM_LEASE_MINUTES)
+
+    def channels_at_quota(self, max_in_flight: int) -> List[str]:
+        """
+        Channels with at least `max_in_flight` items processing under a live
+        claim (claimed within CLAIM_LEASE_MINUTES), so an abandoned claim
+        can't block its channel.
+        """
+        pipeline = [
+            {"$match": {"status": "processing", "claimed_at": {"$gte": self._lease_cutoff()}}},
+            {"$group": {"_id": "$channel_username", "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gte": max_in_flight}}},
+        ]
+        return [row["_id"] for row in self.content_items.aggregate(pipeline)]
+
+    def reclaim_expired_claims(self) -> int:
+        """
+        Puts items back in the queue whose claim is older than CLAIM_LEASE_MINUTES,
+        e.g. after a worker crashed or was killed mid-batch.
+        """
+        result = self.content_items.update_many(
+            {"status": "processing", "claimed_at": {"$lt": self._lease_cutoff()}},
+            {"$set": {"status": "pending"}, "$unset": {"claimed_at": ""}},
+        )
+        if result.modified_count:
+            logger.warning(f"♻️ Re-queued {result.modified_count} items whose claim expired.")
+        return result.modified_count
+
+    def refresh_effective_priorities(self) -> int:
+        """
+        Ages the pending queue: effective_priority = priority + PRIORITY_AGING_PER_HOUR
+        for every hour since added_at, capped at PRIORITY_AGING_MAX_BOOST, and
+        claim_score is recomputed from it. Runs server-side in one update, so
+        claims stay a plain indexed sort.
+        """
+        hours_waiting = {"$divide": [{"$subtract": [datetime.now(timezone.utc), "$added_at"]}, 3600 * 1000]}
+        boost = {"$min": [{"$multiply": [hours_waiting, Config.PRIORITY_AGING_PER_HOUR]}, Config.PRIORITY_AGING_MAX_BOOST]}
+        cost_divisor = {"$pow": [{"$ifNull": ["$cost_estimate.units", 1]}, Config.COST_WEIGHT]}
+        result = self.content_items.update_many(
+            {"status": "pending"},
+            [
+                {"$set": {"effective_priority": {"$round": [{"$add": [{"$ifNull": ["$priority", 1]}, {"$max": [boost, 0]}]}, 2]}}},
+                {"$set": {"claim_score": {"$round": [{"$divide": ["$effective_priority", cost_divisor]}, 3]}}},
+            ],
+        )
+        logger.info(f"⏳ Refreshed effective priority on {result.modified_count} pending items.")
+        return result.modified_count
+
+    def budget_filter(self) -> Optional[Dict]:
+        """
+        Query clause that defers items below BUDGET_PROTECTED_PRIORITY whose cost
+        estimate exceeds what is left of today's CPU or token budget.
+        """
+        if not (Config.DAILY_CPU_BUDGET_SEC or Config.DAILY_TOKEN_BUDGET):
+            return None
+        used = self.get_budget_usage()
+        fits = {}
+        if Config.DAILY_CPU_BUDGET_SEC:
+            fits["cost_estimate.cpu_sec"] = {"$lte": Config.DAILY_CPU_BUDGET_SEC - used.get("cpu_sec", 0)}
+        if Config.DAILY_TOKEN_BUDGET:
+            fits["cost_estimate.tokens"] = {"$lte": Config.DAILY_TOKEN_BUDGET - used.get("tokens", 0)}
+        return {
+            "$or": [
+                {"priority": {"$gte": Config.BUDGET_PROTECTED_PRIORITY}},
+                {"cost_estimate": None},
+                fits,
+            ]
+        }
+
+    def get_budget_usage(self) -> Dict:
+        """CPU seconds and tokens spent by workers today (UTC)."""
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        return self.budgets.find_one({"_id": today}) or {}
+
+    def record_budget_usage(self, cpu_sec: float, tokens: int):
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        self.budgets.update_one(
+            {"_id": today}, {"$inc": {"cpu_sec": round(cpu_sec, 2), "tokens": int(tokens), "jobs": 1}}, upsert=True
+        )
+
+    def recent_cost_samples(self, limit: int) -> List[Dict]:
+        """Recently completed items with their recorded stage timings, for the cost model."""
+        return list(
+            self.content_items.find(
+                {"status": "completed", "processing_metadata.stages": {"$exists": True}},
+                {
+                    "post_type": 1,
+                    "video_duration": 1,
+                    "media_urls.type": 1,
+                    "processing_metadata.stages": 1,
+                    "processing_metadata.input_tokens": 1,
+                    "processing_metadata.output_tokens": 1,
+                },
+            )
+            .sort("processed_at", DESCENDING)
+            .limit(limit)
+        )
+
     def update_item_with_metadata(self, post_id: str, metadata: Dict):
         """
         Updates a content item with metadata fields after it has been downloaded.
@@ -190,6 +355,86 @@ class Database:
         self.content_items.update_one({"_id": post_id}, {"$set": metadata})
         logger.info(f"📝 Updated item '{post_id}' with metadata.")
 
+    def update_item_media_path(self, post_id: str, media_path: str):
+        """Records where a worker downloaded an item's media."""
+        self.content_items.update_one(
+            {"_id": post_id}, {"$set": {"local_media_path": media_path}}
+        )
+
+    def set_item_profile_flag(self, post_id: str, enabled: bool = True) -> bool:
+        """Flags an item so the worker that processes it records a profile."""
+        result = self.content_items.update_one({"_id": post_id}, {"$set": {"profile": enabled}})
+        return result.matched_count > 0
+
+    def get_prefetch_candidates(self, limit: int) -> List[Dict]:
+        """
+        The next items a worker would claim that have no media on disk yet.
+        Uses the claim query, so items deferred by channel quotas or the
+        daily budgets are not downloaded ahead of time.
+        """
+        query = self._claimable_query()
+        query["local_media_path"] = None
+        return list(
+            self.content_items.find(query)
+            .sort([("claim_score", DESCENDING), ("added_at", ASCENDING)])
+            .limit(limit)
+        )
+
+    def record_prefetched_media(self, post_id: str, media_path: str) -> bool:
+        """Saves a prefetched media path, but only if the item is still waiting in the queue."""
+        result = self.content_items.update_one(
+            {"_id": post_id, "status": "pending"},
+            {"$set": {"local_media_path": media_path}},
+        )
+        return result.modified_count == 1
+
+    def clear_item_media_path(self, post_id: str, media_path: str):
+        """Forgets an evicted media path, unless the item has since been given another one."""
+        self.content_items.update_one(
+            {"_id": post_id, "local_media_path": media_path},
+            {"$unset": {"local_media_path": ""}},
+        )
+
+    def get_item(self, post_id: str) -> Optional[Dict]:
+        """The full content item document, as a worker would claim it."""
+        return self.content_items.find_one({"_id": post_id})
+
+    def get_items_by_ids(self, post_ids: List[str]) -> List[Dict]:
+        return list(
+            self.content_items.find(
+                {"_id": {"$in": post_ids}}, {"status": 1, "local_media_path": 1}
+            )
+        )
+
+    def get_active_media_refs(self) -> List[Dict]:
+        """Items whose media may still be needed on disk: leased jobs and prefetched pending items."""
+        return list(
+            self.content_items.find(
+                {
+                    "$or": [
+                        {"status": "processing"},
+                        {"status": "pending", "local_media_path": {"$ne": None}},
+                    ]
+                },
+                {"status": 1, "post_type": 1, "local_media_path": 1},
+            )
+        )
+
+    def queue_counts(self) -> List[Dict]:
+        """
+        Number of open (pending, processing, failed) content items per
+        (status, priority), for the metrics endpoint. Completed items grow
+        without bound and are counted in-process instead.
+        """
+        pipeline = [
+            {"$match": {"status": {"$in": ["pending", "processing", "failed"]}}},
+            {"$group": {"_id": {"status": "$status", "priority": "$priority"}, "count": {"$sum": 1}}},
+        ]
+        return [
+            {"status": row["_id"].get("status"), "priority": row["_id"].get("priority"), "count": row["count"]}
+            for row in self.content_items.aggregate(pipeline)
+        ]
+
     def complete_item(
         self, post_id: str, final_report: str, structured_data: Dict, metadata: Dict
     ):
@@ -206,11 +451,11 @@ class Database:
             },
         )
 
-    def fail_item(self, post_id: str, error_message: str):
-        self.content_items.update_one(
-            {"_id": post_id},
-            {"$set": {"status": "failed", "error_message": error_message}},
-        )
+    def fail_item(self, post_id: str, error_message: str, metadata: Optional[Dict] = None):
+        fields = {"status": "failed", "error_message": error_message}
+        if metadata:
+            fields["processing_metadata"] = metadata
+        self.content_items.update_one({"_id": post_id}, {"$set": fields})
 
     def get_all_channels(self) -> List[Dict]:
         """
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional, Dict, Any, List
-from datetime import datetime
+from datetime import datetime, timezone
 
 # --- Channel Schema (Expanded) ---
 class ChannelSchema(BaseModel):
@@ -18,20 +18,48 @@ class ChannelSchema(BaseModel):
 
     is_bootstrapped: bool = Field(default=False, description="True if the initial deep scrape is complete.")
 
+    # --- Cached Profile Fields ---
+    user_id: Optional[str] = Field(default=None, description="Instagram pk, resolved once and reused.")
     follower_count: Optional[int] = None
     media_count: Optional[int] = None
     biography: Optional[str] = None
+    profile_refreshed_at: Optional[datetime] = None
     
     # --- State Tracking Fields ---
     last_checked_at: Optional[datetime] = None
     last_fetched_shortcode: Optional[str] = None
+    last_fetched_taken_at: Optional[datetime] = Field(
+        default=None, description="Publish time of the newest queued post; older posts stop the feed scan."
+    )
+    next_check_at: Optional[datetime] = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        description="Precomputed last_checked_at + fetch_frequency_hours. New channels are due immediately.",
+    )
 
 
 # --- Content Item and Metadata Schemas ---
+class StageTiming(BaseModel):
+    name: str
+    parent: Optional[str] = None
+    wall_sec: float
+    cpu_sec: float
+    rss_delta_mb: float = 0.0  # Change in current RSS over the stage
+    bytes_downloaded: Optional[int] = None
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+
 class ProcessingMetadata(BaseModel):
     worker_id: Optional[str] = None
     processing_time_sec: Optional[float] = None
-    model_used: Optional[str] = "gemini-1.5-flash"
+    model_used: Optional[str] = Field(default=None, description="Model that wrote the final summary")
+    stages: Optional[List[StageTiming]] = None
+    bytes_downloaded: Optional[int] = None
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    profile: Optional[Dict[str, str]] = Field(
+        default=None, description="Paths of the profiling artifacts, if the job was profiled"
+    )
 
 
 class ContentItemSchema(BaseModel):
@@ -44,6 +72,15 @@ class ContentItemSchema(BaseModel):
     added_at: datetime = Field(default_factory=datetime.utcnow)
     processed_at: Optional[datetime] = None
     priority: int = Field(default=1, description="Copied from the channel for worker prioritization")
+    effective_priority: Optional[float] = Field(
+        default=None, description="priority plus an aging bonus for time in queue"
+    )
+    cost_estimate: Optional[Dict[str, float]] = Field(
+        default=None, description="Predicted {'cpu_sec', 'tokens', 'units'}, set at discovery"
+    )
+    claim_score: Optional[float] = Field(
+        default=None, description="effective_priority per unit of estimated cost; workers claim by this"
+    )
 
     upload_date: Optional[datetime] = None
     caption: Optional[str] = None
@@ -51,6 +88,11 @@ class ContentItemSchema(BaseModel):
     video_duration: Optional[float] = None
     hashtags: Optional[List[str]] = None
     post_type: Optional[str] = None # 'reel' or 'post'
+    media_urls: Optional[List[Dict[str, Any]]] = Field(
+        default=None, description="CDN URLs captured at discovery: [{'type': 'video'|'image', 'url': ...}]"
+    )
+    local_media_path: Optional[str] = None
+    profile: bool = Field(default=False, description="Profile this item when a worker processes it")
 
     final_summary_report: Optional[str] = None
     structured_summary: Optional[Dict[str, Any]] = None
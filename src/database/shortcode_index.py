@@ -0,0 +1,94 @@
+import hashlib
+import math
+import threading
+import time
+from typing import Iterable, List
+
+from pymongo.collection import Collection
+
+from src.config import logger, Config
+from src.database.schemas import ContentItemSchema
+
+
+class BloomFilter:
+    """A fixed-size Bloom filter over strings, backed by a bytearray."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # Double hashing: two 64-bit halves of one digest give all k positions.
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class KnownShortcodeIndex:
+    """
+    In-memory index of shortcodes already stored in content_items, used to drop
+    known posts before building upserts. A Bloom filter answers "definitely new"
+    for most items; probable hits are confirmed with one exact `$in` query, so a
+    false positive never drops a genuinely new post.
+    """
+
+    def __init__(self, collection: Collection, capacity: int = None, error_rate: float = None):
+        self.collection = collection
+        self.error_rate = error_rate or Config.SHORTCODE_INDEX_ERROR_RATE
+        self._filter = BloomFilter(capacity or Config.SHORTCODE_INDEX_CAPACITY, self.error_rate)
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """Loads every existing shortcode from the collection."""
+        start = time.time()
+        shortcodes = [doc["_id"] for doc in self.collection.find({}, {"_id": 1})]
+        capacity = max(self._filter.capacity, len(shortcodes) * 2)
+        bloom = BloomFilter(capacity, self.error_rate)
+        for shortcode in shortcodes:
+            bloom.add(shortcode)
+        with self._lock:
+            self._filter = bloom
+        logger.info(
+            f"🧠 Known-shortcode index warmed with {len(shortcodes)} items in {time.time() - start:.2f}s "
+            f"({len(bloom.bits) / 1024:.0f} KB)."
+        )
+
+    def add_many(self, shortcodes: Iterable[str]):
+        with self._lock:
+            for shortcode in shortcodes:
+                self._filter.add(shortcode)
+            overfull = self._filter.count > self._filter.capacity
+        if overfull:
+            # Past capacity the false-positive rate climbs; rebuild at a larger size.
+            self.warm()
+
+    def filter_new(self, items: List[ContentItemSchema]) -> List[ContentItemSchema]:
+        """Returns only the items whose shortcodes are not already stored."""
+        with self._lock:
+            probable_hits = [item.id for item in items if item.id in self._filter]
+        if not probable_hits:
+            return list(items)
+
+        existing = {
+            doc["_id"]
+            for doc in self.collection.find({"_id": {"$in": probable_hits}}, {"_id": 1})
+        }
+        new_items = [item for item in items if item.id not in existing]
+        logger.debug(
+            f"Known-shortcode index: {len(items) - len(new_items)} of {len(items)} items already stored "
+            f"({len(probable_hits) - len(existing)} false positives)."
+        )
+        return new_items
@@ -0,0 +1,146 @@
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from src.config import logger, Config
+from src.database.db import Database
+from src.database.schemas import ContentItemSchema
+from src.database.shortcode_index import KnownShortcodeIndex
+
+
+class DiscoveryWriteBuffer:
+    """
+    Collects channel state changes and new content items during a discovery run
+    and writes them with a few unordered bulk_writes instead of one round trip
+    per change. Mirrors the write methods of Database so the discoverer can use
+    it as a drop-in.
+
+    All changes to one channel are merged into a single update, so ordering
+    between them doesn't depend on the (unordered) bulk write. With a
+    KnownShortcodeIndex, already-stored items are dropped before the upserts
+    are built.
+    """
+    def __init__(
+        self,
+        db: Database,
+        flush_every: Optional[int] = None,
+        known_shortcodes: Optional[KnownShortcodeIndex] = None,
+    ):
+        self.db = db
+        self.known_shortcodes = known_shortcodes
+        self.flush_every = flush_every or Config.DISCOVERY_FLUSH_EVERY
+        self._lock = threading.Lock()
+        self._channel_fields: Dict[str, Dict] = {}
+        self._checked_channels = set()
+        self._items: Dict[str, ContentItemSchema] = {}
+        self._channels_since_flush = 0
+
+    # --- Database-compatible write methods ---
+
+    def update_channel_info(self, channel_id: str, info_dict: dict):
+        with self._lock:
+            self._channel_fields.setdefault(channel_id, {}).update(info_dict)
+
+    def mark_channel_checked(self, channel_id: str):
+        with self._lock:
+            self._channel_fields.setdefault(channel_id, {})
+            self._checked_channels.add(channel_id)
+
+    def update_channel_after_fetch(
+        self, channel_id: str, last_shortcode: Optional[str], last_taken_at: Optional[datetime] = None
+    ):
+        if last_shortcode is not None:
+            fields = {"last_fetched_shortcode": last_shortcode}
+            if last_taken_at:
+                fields["last_fetched_taken_at"] = last_taken_at
+            self.update_channel_info(channel_id, fields)
+        self.mark_channel_checked(channel_id)
+
+    def mark_channel_bootstrapped(
+        self, channel_id: str, latest_shortcode: Optional[str], latest_taken_at: Optional[datetime] = None
+    ):
+        update_data = {"is_bootstrapped": True}
+        if latest_shortcode:
+            update_data["last_fetched_shortcode"] = latest_shortcode
+        if latest_taken_at:
+            update_data["last_fetched_taken_at"] = latest_taken_at
+        self.update_channel_info(channel_id, update_data)
+        self.mark_channel_checked(channel_id)
+
+    def add_content_items(self, items: List[ContentItemSchema]) -> int:
+        """Queues items for insertion. Returns how many were queued, not inserted."""
+        with self._lock:
+            for item in items:
+                self._items.setdefault(item.id, item)
+        return len(items)
+
+    # --- Flushing ---
+
+    def channel_done(self):
+        """Called once per processed channel; flushes every `flush_every` channels."""
+        with self._lock:
+            self._channels_since_flush += 1
+            due = self._channels_since_flush >= self.flush_every
+        if due:
+            self.flush()
+
+    def flush(self) -> Dict[str, int]:
+        """Writes everything buffered so far. On failure the data stays buffered for the next flush."""
+        with self._lock:
+            channel_fields = self._channel_fields
+            checked = self._checked_channels
+            items = list(self._items.values())
+            self._channel_fields, self._checked_channels, self._items = {}, set(), {}
+            self._channels_since_flush = 0
+
+        stats = {"channels_updated": 0, "items_added": 0, "items_skipped": 0}
+        if not channel_fields and not items:
+            return stats
+
+        channel_ops = []
+        for channel_id, fields in channel_fields.items():
+            if channel_id in checked:
+                update = self.db.channel_checked_update(fields)
+            elif fields:
+                update = {"$set": fields}
+            else:
+                continue
+            channel_ops.append(UpdateOne({"_id": channel_id}, update))
+
+        try:
+            new_items = self.known_shortcodes.filter_new(items) if self.known_shortcodes else items
+            stats["items_skipped"] = len(items) - len(new_items)
+            item_ops = self.db.content_item_ops(new_items)
+            if item_ops:
+                result = self.db.content_items.bulk_write(item_ops, ordered=False)
+                stats["items_added"] = result.upserted_count
+            # Channel state goes last so a failed item write leaves the channels due for a re-check.
+            if channel_ops:
+                result = self.db.channels.bulk_write(channel_ops, ordered=False)
+                stats["channels_updated"] = result.matched_count
+        except Exception as e:
+            logger.error(f"❌ Discovery write flush failed, keeping changes buffered: {e}")
+            self._requeue(channel_fields, checked, items)
+            return stats
+
+        if self.known_shortcodes and new_items:
+            self.known_shortcodes.add_many(item.id for item in new_items)
+
+        logger.info(
+            f"💾 Flushed discovery writes: {stats['channels_updated']} channels updated, "
+            f"{stats['items_added']} new content items, {stats['items_skipped']} already known."
+        )
+        return stats
+
+    def _requeue(self, channel_fields: Dict[str, Dict], checked: set, items: List[ContentItemSchema]):
+        # All buffered ops are idempotent ($set / $setOnInsert), so replaying them is safe.
+        with self._lock:
+            for channel_id, fields in channel_fields.items():
+                merged = dict(fields)
+                merged.update(self._channel_fields.get(channel_id, {}))
+                self._channel_fields[channel_id] = merged
+            self._checked_channels |= checked
+            for item in items:
+                self._items.setdefault(item.id, item)
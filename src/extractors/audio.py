@@ -1,7 +1,19 @@
+import os
 import moviepy
-from src.config import logger
+from pathlib import Path
+from src.config import logger, Config
 from typing import Optional
 
+
+def _audio_path_for(video_path: str) -> str:
+    """Puts the WAV next to the video, or in FAST_TEMP_DIR (tmpfs) when one is configured."""
+    if Config.FAST_TEMP_DIR:
+        video = Path(video_path)
+        os.makedirs(Config.FAST_TEMP_DIR, exist_ok=True)
+        # "{folder}__{stem}" lets the janitor tie the file back to its job folder.
+        return os.path.join(Config.FAST_TEMP_DIR, f"{video.parent.name}__{video.stem}.wav")
+    return f"{video_path.split('.')[0]}.wav"
+
 def extract_audio(video_path: str) -> Optional[str]:
     """
     Extracts an audio track from a video file if one exists.
@@ -9,7 +21,7 @@ def extract_audio(video_path: str) -> Optional[str]:
     Returns:
         The path to the audio file, or None if no audio track is found.
     """
-    audio_path = f"{video_path.split('.')[0]}.wav"
+    audio_path = _audio_path_for(video_path)
     clip = None 
     
     try:
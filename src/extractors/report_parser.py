@@ -1,7 +1,79 @@
+import json
 import re
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+from pydantic import BaseModel, Field, ValidationError
 # from src.config import logger
 
+
+class StructuredReport(BaseModel):
+    """The final report as requested from Gemini in structured-output (JSON) mode."""
+    core_summary: str = Field(..., min_length=1)
+    technical_insights: List[str] = Field(..., min_length=1)
+    developer_perspective: List[str] = Field(..., min_length=1)
+    broader_impact: str = Field(..., min_length=1)
+
+
+# The same shape as an OpenAPI schema, for Gemini's `response_schema`.
+REPORT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "core_summary": {"type": "string"},
+        "technical_insights": {"type": "array", "items": {"type": "string"}},
+        "developer_perspective": {"type": "array", "items": {"type": "string"}},
+        "broader_impact": {"type": "string"},
+    },
+    "required": ["core_summary", "technical_insights", "developer_perspective", "broader_impact"],
+}
+
+_CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+class MalformedReport(ValueError):
+    """JSON report output that is truncated, or misses or empties a section."""
+
+
+def is_json_report(report_text: str) -> bool:
+    return bool(report_text) and report_text.lstrip().startswith(("{", "```"))
+
+
+def parse_structured_report(report_text: str) -> Optional[StructuredReport]:
+    """
+    Validates a JSON report. Returns None for non-JSON (Markdown) text and
+    raises MalformedReport for JSON that fails validation.
+    """
+    if not is_json_report(report_text):
+        return None
+    try:
+        return StructuredReport.model_validate(json.loads(_CODE_FENCE.sub("", report_text.strip())))
+    except (ValueError, ValidationError) as e:
+        raise MalformedReport(f"Structured report failed validation: {e}") from e
+
+
+def _bullets(items: List[str]) -> str:
+    return "\n".join(f"* {item.strip()}" for item in items)
+
+
+def render_report(report: StructuredReport) -> str:
+    """Renders a structured report as the Markdown stored in final_summary_report."""
+    return (
+        f"### Core Summary\n{report.core_summary.strip()}\n\n"
+        f"### Technical Insights\n{_bullets(report.technical_insights)}\n\n"
+        f"### Developer Perspective\n{_bullets(report.developer_perspective)}\n\n"
+        f"### Broader Impact\n{report.broader_impact.strip()}"
+    )
+
+
+def structure_report(report_text: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Turns the summarizer's output into (Markdown report, structured dictionary).
+    JSON output is validated and rendered, and raises MalformedReport if it
+    is invalid; only non-JSON text goes through the Markdown parser.
+    """
+    structured = parse_structured_report(report_text)
+    if structured is not None:
+        return render_report(structured), structured.model_dump()
+    return report_text, parse_report(report_text)
+
 def parse_report(report_text: str) -> Dict[str, Any]:
     """
     Parses a formatted Markdown report string into a structured dictionary.
@@ -1,48 +1,21 @@
 # src/services/discoverer_service.py
 
-import os
 import time
-import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 from instagrapi import Client
+from instagrapi.exceptions import ClientNotFoundError, UserNotFound
+from instagrapi.extractors import extract_media_v1
 from instagrapi.types import Media, User
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any, Tuple
 
 from src.database.db import Database
+from src.database.write_buffer import DiscoveryWriteBuffer
+from src.database.shortcode_index import KnownShortcodeIndex
 from src.database.schemas import ContentItemSchema, ChannelSchema
+from src.fetchers.session_pool import SessionPool
 from src.config import Config, logger
-
-# --- CONFIGURATION ---
-SESSION_FILE = "temp_files/session.json"
-USERNAME = Config.INSTA_USERNAME
-PASSWORD = Config.INSTA_PASSWORD
-
-# --- All your helper functions go here ---
-# (login_to_instagram, map_post_type, create_content_item_from_post, 
-#  fetch_user_id, analyze_channel_info)
-
-def login_to_instagram() -> Optional[Client]:
-    """Logs in to Instagram using a saved session or new credentials."""
-    cl = Client()
-    cl.delay_range = [1, 3]
-
-    if os.path.exists(SESSION_FILE):
-        try:
-            cl.load_settings(SESSION_FILE)
-            cl.get_timeline_feed()
-            logger.info("✅ Reused saved Instagram session!")
-            return cl
-        except Exception as e:
-            logger.warning(f"⚠️ Saved session invalid, logging in again. Error: {e}")
-
-    try:
-        os.makedirs(os.path.dirname(SESSION_FILE), exist_ok=True)
-        cl.login(USERNAME, PASSWORD)
-        cl.dump_settings(SESSION_FILE)
-        logger.info("✅ Logged in successfully and session saved!")
-        return cl
-    except Exception as e:
-        logger.error(f"❌ Failed to login to Instagram: {e}")
-        return None
+from src import cost_model, metrics
 
 
 def map_post_type(media: Media) -> str:
@@ -57,7 +30,44 @@ def map_post_type(media: Media) -> str:
     return "unknown"
 
 
-def create_content_item_from_post(post: Media, channel_id: str, channel_priority: int) -> ContentItemSchema:
+def _variant_candidates(raw_versions: Optional[List[Dict]]) -> List[Dict[str, Any]]:
+    """Keeps the url and dimensions of each resolution Instagram offers for one media slot."""
+    return [
+        {"url": v["url"], "width": v.get("width"), "height": v.get("height")}
+        for v in raw_versions or []
+        if v.get("url")
+    ]
+
+
+def extract_media_urls(post: Media, raw: Optional[Dict] = None) -> List[Dict[str, Any]]:
+    """
+    Lists the CDN URLs of a post's media in carousel order, so the worker can
+    download them directly without another metadata request. When the raw v1
+    feed item is available, every offered resolution is kept as `candidates`
+    so the downloader can pick the smallest one that suits analysis.
+    """
+    slots = post.resources if post.media_type == 8 and post.resources else [post]
+    raw_slots = (raw or {}).get("carousel_media") or [raw or {}]
+    media_urls = []
+    for index, slot in enumerate(slots):
+        raw_slot = raw_slots[index] if index < len(raw_slots) else {}
+        if slot.media_type == 2 and slot.video_url:
+            entry = {"type": "video", "url": str(slot.video_url)}
+            candidates = _variant_candidates(raw_slot.get("video_versions"))
+        elif slot.thumbnail_url:
+            entry = {"type": "image", "url": str(slot.thumbnail_url)}
+            candidates = _variant_candidates((raw_slot.get("image_versions2") or {}).get("candidates"))
+        else:
+            continue
+        if candidates:
+            entry["candidates"] = candidates
+        media_urls.append(entry)
+    return media_urls
+
+
+def create_content_item_from_post(
+    post: Media, channel_id: str, channel_priority: int, raw: Optional[Dict] = None
+) -> ContentItemSchema:
     hashtags = [ht.name for ht in post.caption_hashtags]
     prefix = (
         "p" if post.media_type in [1, 8]
@@ -65,7 +75,7 @@ def create_content_item_from_post(post: Media, channel_id: str, channel_priority
         if (post.media_type == 2 and getattr(post, "product_type", "") == "clips")
         else "p"
     )
-    return ContentItemSchema(
+    item = ContentItemSchema(
         id=post.code,
         source_url=f"https://www.instagram.com/{prefix}/{post.code}/",
         channel_username=channel_id,
@@ -77,7 +87,10 @@ def create_content_item_from_post(post: Media, channel_id: str, channel_priority
         video_duration=getattr(post, "video_duration", None),
         hashtags=hashtags,
         post_type=map_post_type(post),
+        media_urls=extract_media_urls(post, raw),
     )
+    item.cost_estimate = cost_model.estimate(item.post_type, item.video_duration, item.media_urls)
+    return item
 
 
 def fetch_user_id(cl: Client, username: str) -> Optional[str]:
@@ -96,18 +109,126 @@ def fetch_user_id(cl: Client, username: str) -> Optional[str]:
             logger.error(f"⚠ Failed to fetch user_id for '{username}': {e}")
             return None
 
-def analyze_channel_info(user_info: User) -> Dict[str, Any]:
+def iter_media_pages(client: Client, user_id: str, page_size: int) -> Iterator[List[Tuple[Media, Dict]]]:
     """
-    Analyzes a user_info object to create a dict of "smart" fields
-    to update in our database, focusing on tech, study, and job news.
+    Yields a user's feed one page at a time, newest first, as (Media, raw item) pairs.
+    Calls the v1 feed endpoint directly so the caller decides when to stop paging.
+    """
+    max_id = ""
+    while True:
+        result = client.private_request(
+            f"feed/user/{user_id}/",
+            params={
+                "max_id": max_id,
+                "count": page_size,
+                "rank_token": client.rank_token,
+                "ranked_content": "true",
+            },
+        )
+        items = result.get("items", [])
+        yield [(extract_media_v1(item), item) for item in items]
+
+        max_id = result.get("next_max_id")
+        if not items or not result.get("more_available") or not max_id:
+            return
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def fetch_recent_medias(client: Client, user_id: str, limit: int) -> List[Tuple[Media, Dict]]:
+    """Fetches up to `limit` of a user's most recent posts as (Media, raw item) pairs."""
+    medias: List[Tuple[Media, Dict]] = []
+    for page in iter_media_pages(client, user_id, Config.BOOTSTRAP_PAGE_SIZE):
+        medias.extend(page)
+        if len(medias) >= limit:
+            break
+    return medias[:limit]
+
+
+def is_pinned(raw: Dict) -> bool:
+    """Pinned posts sit at the top of the feed regardless of when they were published."""
+    return bool(raw.get("timeline_pinned_user_ids"))
+
+
+def feed_cursor(items: List[Tuple[ContentItemSchema, Dict]]) -> Tuple[Optional[str], Optional[datetime]]:
     """
-    smart_data = {
+    The (shortcode, publish time) the next scan stops at: the newest post of
+    the chronological feed. Pinned posts are left out so they never move it.
+    """
+    chronological = [item for item, raw in items if not is_pinned(raw)]
+    if not chronological:
+        return None, None
+    dates = [_as_utc(item.upload_date) for item in chronological if item.upload_date]
+    return chronological[0].id, max(dates) if dates else None
+
+
+def fetch_new_medias(client: Client, channel: ChannelSchema, user_id: str) -> List[Tuple[Media, Dict]]:
+    """
+    Pages through a channel's feed until it reaches the last known shortcode,
+    a post published before the newest already-queued post, or `posts_to_fetch`
+    new posts. Pinned posts are out of chronological order, so they never stop
+    the scan. The cutoff is the queued post's own publish time, not the time
+    of the last check, so a failed check can't hide posts published before it.
+    """
+    cutoff = _as_utc(channel.last_fetched_taken_at) if channel.last_fetched_taken_at else None
+    page_size = min(channel.posts_to_fetch, Config.DISCOVERY_PAGE_SIZE)
+    new_medias: List[Tuple[Media, Dict]] = []
+    pages = 0
+
+    for page in iter_media_pages(client, user_id, page_size):
+        pages += 1
+        for post, raw in page:
+            pinned = is_pinned(raw)
+            is_old = cutoff is not None and post.taken_at is not None and _as_utc(post.taken_at) < cutoff
+
+            if not pinned and post.code == channel.last_fetched_shortcode:
+                logger.info(f"Found last fetched post ({post.code}) on page {pages}. Stopping scrape.")
+                return new_medias
+            if is_old:
+                if pinned:
+                    continue
+                logger.info(f"Reached a post older than the last queued one on page {pages}. Stopping scrape.")
+                return new_medias
+
+            new_medias.append((post, raw))
+            if len(new_medias) >= channel.posts_to_fetch:
+                return new_medias
+
+    return new_medias
+
+
+def extract_profile_fields(user_info: User) -> Dict[str, Any]:
+    """Returns the cached profile fields for a channel from a user_info object."""
+    return {
+        "user_id": str(user_info.pk),
         "follower_count": user_info.follower_count,
         "media_count": user_info.media_count,
         "biography": user_info.biography,
         "is_active": not user_info.is_private,
+        "profile_refreshed_at": datetime.now(timezone.utc),
     }
 
+
+def profile_is_stale(channel: ChannelSchema) -> bool:
+    """True if the channel's cached profile fields are due for a refresh."""
+    if channel.profile_refreshed_at is None:
+        return True
+    refreshed_at = channel.profile_refreshed_at
+    if refreshed_at.tzinfo is None:
+        refreshed_at = refreshed_at.replace(tzinfo=timezone.utc)
+    age = datetime.now(timezone.utc) - refreshed_at
+    return age >= timedelta(hours=Config.PROFILE_REFRESH_HOURS)
+
+
+def analyze_channel_info(user_info: User) -> Dict[str, Any]:
+    """
+    Analyzes a user_info object to create a dict of "smart" fields
+    to update in our database, focusing on tech, study, and job news.
+    """
+    smart_data = extract_profile_fields(user_info)
+
     # --- 1. Topic & Category Analysis ---
     base_priority = 1  # Default priority for non-relevant accounts
     category = "General"
@@ -231,99 +352,134 @@ class DiscovererService:
     """
     def __init__(self):
         self.db = Database()
-        self.client = login_to_instagram()
-
-    def run_bootstrap_for_channel(self, channel: ChannelSchema):
+        self.known_shortcodes = None
+        if Config.SHORTCODE_INDEX_ENABLED:
+            self.known_shortcodes = KnownShortcodeIndex(self.db.content_items)
+            self.known_shortcodes.warm()
+        # Channel state and new items are buffered and flushed in bulk.
+        self.writer = DiscoveryWriteBuffer(self.db, known_shortcodes=self.known_shortcodes)
+        self.pool = SessionPool.from_config()
+
+    def run_bootstrap_for_channel(self, channel: ChannelSchema, client: Client):
         """
         Runs the one-time deep scrape for a new channel.
         Fetches rich data, sets smart defaults, and scrapes historical posts.
         """
-        # NOTE: Pass self.client and self.db
         logger.info(f"🚀 BOOTSTRAPPING new channel: @{channel.id}")
         try:
-            user_info = self.client.user_info_by_username(channel.id)
+            user_info = client.user_info_by_username(channel.id)
             smart_data = analyze_channel_info(user_info)
-            self.db.update_channel_info(channel.id, smart_data)
+            self.writer.update_channel_info(channel.id, smart_data)
             channel = channel.model_copy(update=smart_data)
             if not channel.is_active:
                 logger.warning(f"Channel @{channel.id} is private. Deactivating.")
-                self.db.mark_channel_bootstrapped(channel.id, None)
+                self.writer.mark_channel_bootstrapped(channel.id, None)
                 return
         except Exception as e:
             logger.error(f"Failed to fetch user info for @{channel.id}. Skipping. Error: {e}")
-            self.db.mark_channel_checked(channel.id)
+            self.writer.mark_channel_checked(channel.id)
             return
 
         try:
-            user_id = fetch_user_id(self.client, channel.id)
-            if not user_id:
-                logger.error(f"Failed to fetch user_id for @{channel.id}. Skipping.")
-                self.db.mark_channel_checked(channel.id)
-                return
-
+            # The user_id was cached on the channel by analyze_channel_info above.
+            user_id = channel.user_id
             logger.info(f"Fetching up to {channel.max_posts_to_fetch} posts for @{channel.id}...")
-            medias = self.client.user_medias(user_id, channel.max_posts_to_fetch)
+            medias = fetch_recent_medias(client, user_id, channel.max_posts_to_fetch)
             
             if not medias:
                 logger.info(f"No posts found for @{channel.id}.")
-                self.db.mark_channel_bootstrapped(channel.id, None)
+                self.writer.mark_channel_bootstrapped(channel.id, None)
                 return
             
-            items_to_add: List[ContentItemSchema] = []
-            for p in medias:
+            items_to_add: List[Tuple[ContentItemSchema, Dict]] = []
+            for p, raw in medias:
                 # 1. Create the item 
-                item = create_content_item_from_post(p, channel.id, channel.priority)
+                item = create_content_item_from_post(p, channel.id, channel.priority, raw)
 
                 # 2. Re-analyze and set the *post's* final priority
                 item.priority = analyze_post_priority(item) 
-                items_to_add.append(item)
+                items_to_add.append((item, raw))
 
-            added_count = self.db.add_content_items(items_to_add)
-            latest_shortcode = items_to_add[0].id if items_to_add else None
-            self.db.mark_channel_bootstrapped(channel.id, latest_shortcode)
-            logger.info(f"✅ Bootstrap complete for @{channel.id}. Added {added_count} posts.")
+            queued_count = self.writer.add_content_items([item for item, _ in items_to_add])
+            self.writer.mark_channel_bootstrapped(channel.id, *feed_cursor(items_to_add))
+            logger.info(f"✅ Bootstrap complete for @{channel.id}. Queued {queued_count} posts.")
         except Exception as e:
             logger.error(f"Failed during bootstrap post fetch for @{channel.id}. Error: {e}")
-            self.db.mark_channel_checked(channel.id)
+            self.writer.mark_channel_checked(channel.id)
 
-    def run_scheduled_check(self, channel: ChannelSchema):
+    def run_scheduled_check(self, channel: ChannelSchema, client: Client):
         """
-        Runs a regular check for new posts, stopping at the last known post.
+        Runs a regular check for new posts, paging only until the last known post.
         """
-        # NOTE: Pass self.client and self.db
         logger.info(f"📸 REGULAR CHECK for @{channel.id}")
         try:
-            user_id = fetch_user_id(self.client, channel.id)
+            user_id = self._resolve_user_id(channel, client)
             if not user_id:
                 logger.error(f"Failed to fetch user_id for @{channel.id}. Skipping.")
-                self.db.mark_channel_checked(channel.id)
+                self.writer.mark_channel_checked(channel.id)
                 return
 
-            medias = self.client.user_medias(user_id, channel.posts_to_fetch)
-            new_items_to_add: List[ContentItemSchema] = []
-    
-            for post in medias:
-                if post.code == channel.last_fetched_shortcode:
-                    logger.info(f"Found last fetched post ({post.code}). Stopping scrape.")
-                    break
-                
+            try:
+                medias = fetch_new_medias(client, channel, user_id)
+            except (UserNotFound, ClientNotFoundError):
+                # The cached ID no longer resolves (account deleted and re-created, etc.).
+                logger.warning(f"Cached user_id {user_id} for @{channel.id} not found. Resolving again.")
+                user_id = self._resolve_user_id(channel, client, force=True)
+                if not user_id:
+                    logger.error(f"Failed to re-resolve user_id for @{channel.id}. Skipping.")
+                    self.writer.mark_channel_checked(channel.id)
+                    return
+                medias = fetch_new_medias(client, channel, user_id)
+
+            if profile_is_stale(channel):
+                self._refresh_profile(channel, client, user_id)
+            new_items_to_add: List[Tuple[ContentItemSchema, Dict]] = []
+
+            # A pinned post newer than the cursor turns up on every check until
+            # the chronological feed passes it; skip it once it is stored.
+            pinned_codes = [post.code for post, raw in medias if is_pinned(raw)]
+            known_pinned = {doc["_id"] for doc in self.db.get_items_by_ids(pinned_codes)} if pinned_codes else set()
+
+            for post, raw in medias:
+                if post.code in known_pinned:
+                    continue
                 # 1. Create the item
-                item = create_content_item_from_post(post, channel.id, channel.priority)
+                item = create_content_item_from_post(post, channel.id, channel.priority, raw)
                 # 2. Re-analyze and set the *post's* final priority
                 item.priority = analyze_post_priority(item)
-                new_items_to_add.append(item)
+                new_items_to_add.append((item, raw))
             
             if new_items_to_add:
-                added_count = self.db.add_content_items(new_items_to_add)
-                latest_shortcode = new_items_to_add[0].id
-                self.db.update_channel_after_fetch(channel.id, latest_shortcode)
-                logger.info(f"Added {added_count} new posts for @{channel.id}.")
+                queued_count = self.writer.add_content_items([item for item, _ in new_items_to_add])
+                self.writer.update_channel_after_fetch(channel.id, *feed_cursor(new_items_to_add))
+                logger.info(f"Queued {queued_count} new posts for @{channel.id}.")
             else:
-                self.db.mark_channel_checked(channel.id)
+                self.writer.mark_channel_checked(channel.id)
                 logger.info(f"No new posts found for @{channel.id}.")
         except Exception as e:
             logger.error(f"❌ Error during scheduled fetch for @{channel.id}: {e}")
-            self.db.mark_channel_checked(channel.id)
+            self.writer.mark_channel_checked(channel.id)
+
+    def _resolve_user_id(self, channel: ChannelSchema, client: Client, force: bool = False) -> Optional[str]:
+        """Returns the channel's cached user_id, looking it up and caching it if missing or forced."""
+        if channel.user_id and not force:
+            return channel.user_id
+
+        user_id = fetch_user_id(client, channel.id)
+        if user_id:
+            user_id = str(user_id)
+            self.writer.update_channel_info(channel.id, {"user_id": user_id})
+            channel.user_id = user_id
+        return user_id
+
+    def _refresh_profile(self, channel: ChannelSchema, client: Client, user_id: str):
+        """Refreshes cached profile fields (followers, bio, ...) on their slower schedule."""
+        try:
+            user_info = client.user_info(user_id)
+            self.writer.update_channel_info(channel.id, extract_profile_fields(user_info))
+        except Exception as e:
+            # Not fatal: the post check already succeeded.
+            logger.warning(f"Failed to refresh profile info for @{channel.id}: {e}")
 
     def run_once(self):
         """
@@ -331,8 +487,11 @@ class DiscovererService:
         """
         logger.info("🚀 Starting discoverer service run...")
         
-        if not self.client:
-            logger.error("Stopping run: Instagram login failed.")
+        if not self.pool.has_sessions():
+            logger.error("Stopping run: no Instagram sessions are configured.")
+            return
+        if not self.pool.healthy_count():
+            logger.error("Stopping run: every Instagram session is cooling down.")
             return
 
         try:
@@ -350,20 +509,58 @@ class DiscovererService:
             return
 
         logger.info(f"📂 Found {len(channels_to_check)} channels to process...")
-        for channel_data in channels_to_check:
-            try:
-                channel = ChannelSchema(**channel_data)
-            except Exception as e:
-                logger.error(f"Invalid channel data for '{channel_data.get('_id')}'. Skipping. Error: {e}")
-                continue
+        # Re-fit the cost estimates from recent jobs before new items are estimated (throttled).
+        cost_model.calibrate(self.db)
+        start_time = time.time()
+        self.pool.reset_stats()
+        processed = 0
+
+        try:
+            # Sessions are leased to one thread at a time, so more workers than sessions would only wait.
+            workers = max(1, min(Config.DISCOVERY_CONCURRENCY, self.pool.healthy_count()))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(self._process_channel, channel_data): channel_data.get("_id")
+                    for channel_data in channels_to_check
+                }
+                for future in as_completed(futures):
+                    try:
+                        if future.result():
+                            processed += 1
+                    except Exception as e:
+                        logger.error(f"❌ Unexpected error while processing @{futures[future]}: {e}")
+        finally:
+            self.writer.flush()
+
+        stats = self.pool.reset_stats()
+        duration = time.time() - start_time
+        metrics.record_discovery_run(duration, stats["requests"])
+        logger.info(
+            f"🎉 Discoverer service run complete. Processed {processed}/{len(channels_to_check)} channels "
+            f"in {duration:.1f}s using {stats['requests']} Instagram requests "
+            f"({stats['throttled_sec']}s spent rate-limited)."
+        )
+
+    def _process_channel(self, channel_data: Dict) -> bool:
+        """Bootstraps or checks a single channel on a pooled session. Returns False if it was skipped."""
+        try:
+            channel = ChannelSchema(**channel_data)
+        except Exception as e:
+            logger.error(f"Invalid channel data for '{channel_data.get('_id')}'. Skipping. Error: {e}")
+            return False
+
+        with self.pool.session() as client:
+            if client is None:
+                # Leave the channel due so the next run picks it up.
+                logger.warning(f"No healthy Instagram session available for @{channel.id}. Skipping for now.")
+                return False
 
             # This is the "smart" logic!
             if not channel.is_bootstrapped:
-                self.run_bootstrap_for_channel(channel)
+                self.run_bootstrap_for_channel(channel, client)
             else:
-                self.run_scheduled_check(channel)
-
-            logger.info(f"--- Completed processing for @{channel.id} ---")
-            time.sleep(random.uniform(5, 15))
+                self.run_scheduled_check(channel, client)
 
-        logger.info("\n🎉 Discoverer service run complete.")
\ No newline at end of file
+        self.writer.channel_done()
+        logger.info(f"--- Completed processing for @{channel.id} ---")
+        return True
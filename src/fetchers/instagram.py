@@ -1,16 +1,90 @@
 # src/fetchers/instagram_downloader.py
 
+import cv2
 import instaloader
+import requests
+import threading
 import time
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 from src.config import Config, logger
 from src.fetchers.base import BaseDownloader
 from src.database.db import Database
+from src.instrumentation import record
+
+# Statuses that mean a signed CDN URL has expired or been revoked; retrying won't help.
+EXPIRED_STATUSES = {403, 404, 410}
+CHUNK_SIZE = 1024 * 1024
+
+
+class MediaUrlExpired(Exception):
+    """Raised when a stored CDN URL no longer serves the media."""
+
+
+class OversizedMedia(Exception):
+    """Raised when a video is dropped for exceeding the per-post byte cap."""
+
+
+class ByteBudget:
+    """Thread-safe running total of bytes downloaded for one post against an optional cap."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def remaining(self) -> Optional[int]:
+        if not self.limit:
+            return None
+        with self._lock:
+            return max(self.limit - self.used, 0)
+
+    def take(self, size: int) -> int:
+        """Claims up to `size` bytes and returns how many were granted."""
+        with self._lock:
+            granted = size if not self.limit else max(min(size, self.limit - self.used), 0)
+            self.used += granted
+            return granted
+
+    def refund(self, size: int):
+        """Returns bytes that were claimed but not kept (an aborted or smaller-than-expected file)."""
+        with self._lock:
+            self.used = max(self.used - size, 0)
+
+
+def is_decodable_video(path: Path) -> bool:
+    """True if OpenCV can read a frame from the file. A cut-off MP4 usually lacks a usable moov atom."""
+    cap = cv2.VideoCapture(str(path))
+    try:
+        return cap.isOpened() and cap.read()[0]
+    finally:
+        cap.release()
+
+
+def select_variant(media: Dict, min_side: int) -> str:
+    """
+    Picks the smallest offered resolution whose short side still meets `min_side`,
+    or the largest one if none do. Falls back to the entry's default URL.
+    """
+    candidates = [
+        c for c in media.get("candidates") or []
+        if c.get("url") and c.get("width") and c.get("height")
+    ]
+    if not candidates:
+        return media["url"]
+
+    area = lambda c: c["width"] * c["height"]
+    good_enough = [c for c in candidates if min(c["width"], c["height"]) >= min_side]
+    chosen = min(good_enough, key=area) if good_enough else max(candidates, key=area)
+    return chosen["url"]
+
 
 class InstagramDownloader(BaseDownloader):
-    
+
     def __init__(self):
         self.L = instaloader.Instaloader(
             download_videos=True,
@@ -22,69 +96,71 @@ class InstagramDownloader(BaseDownloader):
         )
         self.db = Database()
 
-    def download(self, job_data: Dict) -> Optional[Dict[str, str]]:
+        # Pooled HTTP session for direct CDN downloads.
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=Config.DOWNLOAD_CONCURRENCY, pool_maxsize=Config.DOWNLOAD_CONCURRENCY)
+        self.http.mount("https://", adapter)
+        self.http.headers.update({"User-Agent": "Mozilla/5.0 (compatible; insta-summarizer)"})
+
+    def download(self, job_data: Dict, dest_root: Optional[str] = None, record_path: bool = True) -> Optional[Dict[str, str]]:
         """
-        Downloads media for a job.
-        All metadata and checks are now handled by the discoverer and worker.
+        Downloads media for a job into `dest_root` (Config.TEMP_DIR by default).
+        Uses the CDN URLs captured by the discoverer when available and falls
+        back to instaloader when they are missing or have expired.
+        With record_path=False the caller is responsible for saving local_media_path.
         """
-        
+
         # Get data directly from the job object
         try:
             shortcode = job_data["_id"]
             content_type = job_data.get("post_type", "post") # Default to "post" if missing
         except KeyError:
             raise ValueError("Job data is missing required fields like '_id'.")
-        
+
         # Check if DB already has a path (from a previous failed run)
-        if job_data.get("local_media_path"):
+        local_media_path = job_data.get("local_media_path")
+        if local_media_path and Path(local_media_path).exists():
             logger.info(f"✅ Item {shortcode} already downloaded. Skipping.")
             return {
-                "folder_path": job_data["local_media_path"], 
+                "folder_path": local_media_path,
                 "content_type": content_type
             }
 
-        download_dir = Path(f"{Config.TEMP_DIR}/{content_type}_{shortcode}")
+        download_dir = Path(dest_root or Config.TEMP_DIR) / f"{content_type}_{shortcode}"
 
         if download_dir.exists():
             shutil.rmtree(download_dir)
         download_dir.mkdir(parents=True, exist_ok=True)
 
         try:
-            logger.info(f"Downloading content {shortcode} to {download_dir}")
-            post = instaloader.Post.from_shortcode(self.L.context, shortcode)
-
-            old_dirname_pattern = self.L.dirname_pattern
-            old_filename_pattern = self.L.filename_pattern
-            
-            self.L.dirname_pattern = str(download_dir)
-            self.L.filename_pattern = "{shortcode}"
-            
-            self.L.download_post(post, target=".")
-            
-            self.L.dirname_pattern = old_dirname_pattern
-            self.L.filename_pattern = old_filename_pattern
-            
-            time.sleep(1)
-
-            # Clean up non-media files
-            media_extensions = {".mp4", ".mov", ".jpg", ".jpeg", ".png", ".webp"}
-            media_files_found = False
-            for file in download_dir.iterdir():
-                if file.suffix.lower() not in media_extensions:
-                    file.unlink() # Delete .txt, .json, etc.
-                else:
-                    media_files_found = True
-
-            if not media_files_found:
-                raise FileNotFoundError(f"No media files downloaded in {download_dir}")
+            media_urls = job_data.get("media_urls") or []
+            downloaded = False
+            if media_urls:
+                try:
+                    self._download_direct(shortcode, media_urls, download_dir)
+                    downloaded = True
+                except OversizedMedia:
+                    # Instaloader would fetch the same oversized files at full resolution.
+                    raise
+                except Exception as e:
+                    logger.warning(f"Direct download failed for {shortcode} ({e}). Falling back to instaloader.")
+                    for file in download_dir.iterdir():
+                        file.unlink()
+
+            if not downloaded:
+                self._download_with_instaloader(shortcode, download_dir)
 
             logger.info(f"📁 Download complete! Files saved in '{download_dir}':")
+            total_bytes = 0
             for file in sorted(download_dir.iterdir()):
+                total_bytes += file.stat().st_size
                 size_kb = file.stat().st_size / 1024
                 logger.info(f"   - {file.name} ({size_kb:.1f} KB)")
-                
+            record(bytes_downloaded=total_bytes)
+
             # Save path to DB
-            self.db.update_item_media_path(shortcode, str(download_dir))
+            if record_path:
+                self.db.update_item_media_path(shortcode, str(download_dir))
 
             return {"folder_path": str(download_dir), "content_type": content_type}
 
@@ -96,4 +172,152 @@ class InstagramDownloader(BaseDownloader):
             logger.error(f"Download error: {e}")
             if download_dir.exists():
                 shutil.rmtree(download_dir)
-            raise RuntimeError(f"Instagram download failed: {str(e)}")
\ No newline at end of file
+            raise RuntimeError(f"Instagram download failed: {str(e)}")
+
+    def _download_direct(self, shortcode: str, media_urls: List[Dict], download_dir: Path):
+        """
+        Fetches all of a post's media files concurrently from their CDN URLs,
+        choosing analysis-sized variants and enforcing the per-post byte cap.
+        """
+        targets = []
+        for index, media in enumerate(media_urls, start=1):
+            url = select_variant(media, Config.ANALYSIS_MIN_RESOLUTION)
+            default_ext = ".mp4" if media.get("type") == "video" else ".jpg"
+            ext = Path(urlparse(url).path).suffix.lower() or default_ext
+            # Match instaloader's naming so downstream steps see the same layout.
+            name = f"{shortcode}_{index}{ext}" if len(media_urls) > 1 else f"{shortcode}{ext}"
+            targets.append((url, download_dir / name, media.get("type") == "video"))
+
+        budget = ByteBudget(Config.MAX_MEDIA_BYTES_PER_POST)
+
+        def fetch(target):
+            url, path, is_video = target
+            try:
+                return self._fetch_file(url, path, budget if is_video else None)
+            except OversizedMedia as e:
+                logger.warning(f"⚖️ Skipping {path.name}: {e}")
+                path.unlink(missing_ok=True)
+                return 0
+
+        logger.info(f"Downloading {len(targets)} file(s) for {shortcode} directly from CDN...")
+        # Images first: they are small and always needed, so videos absorb any cap.
+        images = [t for t in targets if not t[2]]
+        videos = [t for t in targets if t[2]]
+        with ThreadPoolExecutor(max_workers=Config.DOWNLOAD_CONCURRENCY) as executor:
+            # list() re-raises the first failure from any worker.
+            for size in executor.map(fetch, images):
+                budget.take(size)
+            list(executor.map(fetch, videos))
+
+        if not any(download_dir.iterdir()):
+            raise OversizedMedia(f"Every media file for {shortcode} exceeded the byte cap.")
+        if budget.limit:
+            logger.info(f"Downloaded {budget.used / 1024:.0f} KB of video for {shortcode} (cap {budget.limit / 1024:.0f} KB).")
+
+    def _fetch_file(self, url: str, path: Path, budget: Optional[ByteBudget] = None) -> int:
+        """
+        Streams one URL to disk. Retries resume from the bytes already written
+        using a Range request. With a budget, the file's full size (from
+        Content-Length) is reserved before streaming, so concurrent videos
+        don't cut each other short; a file that doesn't fit is skipped or
+        truncated per OVERSIZE_VIDEO_POLICY. A truncated file is kept only if
+        it still decodes, so the video analysis never gets a broken one.
+        Bytes of an aborted file are refunded. Returns the file size in bytes.
+        """
+        skip_oversized = Config.OVERSIZE_VIDEO_POLICY == "skip"
+        held = 0  # Budget bytes claimed for this file so far
+        last_error = None
+        try:
+            for attempt in range(1, Config.DOWNLOAD_RETRIES + 1):
+                offset = path.stat().st_size if path.exists() else 0
+                headers = {"Range": f"bytes={offset}-"} if offset else {}
+                try:
+                    with self.http.get(url, headers=headers, stream=True, timeout=Config.DOWNLOAD_TIMEOUT_SEC) as response:
+                        if response.status_code in EXPIRED_STATUSES:
+                            raise MediaUrlExpired(f"CDN returned {response.status_code} for {path.name}")
+                        if response.status_code == 416:
+                            # Range starts at the end of the file: it was already complete.
+                            if budget and held > offset:
+                                budget.refund(held - offset)
+                            return offset
+                        response.raise_for_status()
+
+                        # 206 means the server honoured the Range header; 200 restarts from scratch.
+                        if response.status_code != 206:
+                            offset = 0
+                        content_length = int(response.headers.get("Content-Length") or 0)
+                        if budget and content_length and offset + content_length > held:
+                            wanted = offset + content_length - held
+                            granted = budget.take(wanted)
+                            held += granted
+                            if granted < wanted and skip_oversized:
+                                raise OversizedMedia(
+                                    f"{offset + content_length} bytes exceeds the remaining cap of {held}"
+                                )
+
+                        written = offset
+                        truncated = False
+                        with open(path, "ab" if offset else "wb") as f:
+                            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                                allowed = len(chunk)
+                                if budget:
+                                    # Without (or beyond) a Content-Length, bytes are claimed as they arrive.
+                                    if written + allowed > held:
+                                        held += budget.take(written + allowed - held)
+                                    allowed = min(allowed, held - written)
+                                f.write(chunk[:allowed])
+                                written += allowed
+                                if allowed < len(chunk):
+                                    if skip_oversized:
+                                        raise OversizedMedia("byte cap reached while streaming")
+                                    logger.warning(f"✂️ Truncated {path.name} at the per-post byte cap.")
+                                    truncated = True
+                                    break
+                    if truncated and not is_decodable_video(path):
+                        raise OversizedMedia("truncated at the byte cap and no longer decodable")
+                    size = path.stat().st_size
+                    if budget and held > size:
+                        budget.refund(held - size)
+                    return size
+                except (MediaUrlExpired, OversizedMedia):
+                    raise
+                except requests.RequestException as e:
+                    last_error = e
+                    logger.warning(f"Download attempt {attempt} for {path.name} failed: {e}")
+                    time.sleep(min(2 ** attempt, 10))
+
+            raise RuntimeError(f"Giving up on {path.name} after {Config.DOWNLOAD_RETRIES} attempts: {last_error}")
+        except Exception:
+            if budget and held:
+                budget.refund(held)
+            raise
+
+    def _download_with_instaloader(self, shortcode: str, download_dir: Path):
+        """Fallback path: fetches post metadata and media through instaloader."""
+        logger.info(f"Downloading content {shortcode} to {download_dir} with instaloader")
+        post = instaloader.Post.from_shortcode(self.L.context, shortcode)
+
+        old_dirname_pattern = self.L.dirname_pattern
+        old_filename_pattern = self.L.filename_pattern
+
+        self.L.dirname_pattern = str(download_dir)
+        self.L.filename_pattern = "{shortcode}"
+
+        self.L.download_post(post, target=".")
+
+        self.L.dirname_pattern = old_dirname_pattern
+        self.L.filename_pattern = old_filename_pattern
+
+        time.sleep(1)
+
+        # Clean up non-media files
+        media_extensions = {".mp4", ".mov", ".jpg", ".jpeg", ".png", ".webp"}
+        media_files_found = False
+        for file in download_dir.iterdir():
+            if file.suffix.lower() not in media_extensions:
+                file.unlink() # Delete .txt, .json, etc.
+            else:
+                media_files_found = True
+
+        if not media_files_found:
+            raise FileNotFoundError(f"No media files downloaded in {download_dir}")
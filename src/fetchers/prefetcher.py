@@ -0,0 +1,105 @@
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from src.config import Config, logger
+from src.database.db import Database
+from src.fetchers.instagram import InstagramDownloader
+
+
+def folder_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class MediaPrefetcher:
+    """
+    Downloads media for the next few pending items ahead of time, so a worker
+    that claims one of them finds `local_media_path` already on disk.
+
+    Prefetched folders live under Config.PREFETCH_DIR and are bounded by a disk
+    budget. Folders are evicted once their item is claimed by a worker that
+    isn't using them (e.g. on another host) or once they are older than
+    PREFETCH_TTL_HOURS, since the CDN URLs behind them expire too.
+    """
+    def __init__(self, downloader: Optional[InstagramDownloader] = None):
+        self.db = Database()
+        self.downloader = downloader or InstagramDownloader()
+        self.root = Path(Config.PREFETCH_DIR)
+        self.budget_bytes = Config.PREFETCH_DISK_BUDGET_MB * 1024 * 1024
+
+    def run_once(self):
+        """This is the function the scheduler calls."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        evicted = self._evict()
+        used = sum(folder_size(p) for p in self.root.iterdir() if p.is_dir())
+
+        candidates = self.db.get_prefetch_candidates(Config.PREFETCH_COUNT)
+        fetched = 0
+        for item in candidates:
+            if used >= self.budget_bytes:
+                logger.info(f"📦 Prefetch disk budget reached ({used / 1e6:.0f} MB). Stopping.")
+                break
+
+            folder = self._prefetch(item)
+            if folder is None:
+                continue
+
+            size = folder_size(folder)
+            if used + size > self.budget_bytes:
+                logger.info(f"📦 Prefetched {item['_id']} would exceed the disk budget. Discarding it.")
+                self._discard(item["_id"], folder)
+                break
+            used += size
+            fetched += 1
+
+        logger.info(
+            f"📦 Prefetch run complete: {fetched} new, {evicted} evicted, "
+            f"{used / 1e6:.0f}/{self.budget_bytes / 1e6:.0f} MB in use."
+        )
+
+    def _prefetch(self, item: Dict) -> Optional[Path]:
+        post_id = item["_id"]
+        try:
+            result = self.downloader.download(item, dest_root=str(self.root), record_path=False)
+        except Exception as e:
+            logger.warning(f"Prefetch failed for {post_id}: {e}")
+            return None
+
+        folder = Path(result["folder_path"])
+        # The item may have been claimed while we were downloading; then nobody will use this copy.
+        if not self.db.record_prefetched_media(post_id, str(folder)):
+            logger.info(f"Item {post_id} was claimed during prefetch. Discarding the copy.")
+            shutil.rmtree(folder, ignore_errors=True)
+            return None
+        return folder
+
+    def _evict(self) -> int:
+        # Folder names are "{content_type}_{shortcode}"; shortcodes may contain underscores.
+        folders = {p.name.split("_", 1)[-1]: p for p in self.root.iterdir() if p.is_dir()}
+        if not folders:
+            return 0
+
+        items = {doc["_id"]: doc for doc in self.db.get_items_by_ids(list(folders))}
+        expiry = time.time() - Config.PREFETCH_TTL_HOURS * 3600
+        evicted = 0
+        for post_id, folder in folders.items():
+            item = items.get(post_id) or {}
+            status = item.get("status")
+            if item.get("local_media_path") != str(folder):
+                reason = "claimed elsewhere" if status == "processing" else "orphaned"
+            elif status in ("completed", "failed"):
+                reason = "finished"
+            elif status == "pending" and folder.stat().st_mtime < expiry:
+                reason = "expired"
+            else:
+                # Pending and fresh, or being processed from this folder right now.
+                continue
+            logger.info(f"🗑️ Evicting prefetched media for {post_id} ({reason}).")
+            self._discard(post_id, folder)
+            evicted += 1
+        return evicted
+
+    def _discard(self, post_id: str, folder: Path):
+        shutil.rmtree(folder, ignore_errors=True)
+        self.db.clear_item_media_path(post_id, str(folder))
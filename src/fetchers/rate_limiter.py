@@ -0,0 +1,126 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Client methods that only touch local state and must not consume tokens.
+LOCAL_METHODS = {"load_settings", "dump_settings", "get_settings", "set_settings"}
+
+# The requests.Session attributes an instagrapi Client sends its HTTP requests through.
+HTTP_SESSIONS = ("private", "public")
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. Tokens refill continuously at `rate` per second
+    up to `capacity`; `acquire` blocks until enough tokens are available.
+    """
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("TokenBucket rate and capacity must be positive.")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Takes `tokens` from the bucket, waiting if needed. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait_for = (tokens - self._tokens) / self.rate
+            time.sleep(wait_for)
+            waited += wait_for
+
+
+class RateLimitedClient:
+    """
+    Wraps an instagrapi Client so that every HTTP request it sends first takes
+    a token from the session's bucket. One API method (user_medias, login, ...)
+    can issue several requests, so throttling happens on the client's
+    requests sessions rather than per method call. Also counts requests and
+    time spent throttled so a discovery run can report its request volume.
+    Optional callbacks let the owner track session health from each method
+    call's outcome.
+    """
+    def __init__(
+        self,
+        client: Any,
+        bucket: TokenBucket,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        on_success: Optional[Callable[[], None]] = None,
+    ):
+        self._client = client
+        self._bucket = bucket
+        self._on_error = on_error
+        self._on_success = on_success
+        self._stats_lock = threading.Lock()
+        self.request_count = 0
+        self.throttled_sec = 0.0
+        self.throttle_http()
+
+    def throttle_http(self):
+        """Wraps `request` on the client's private and public requests sessions (once per session object)."""
+        for name in HTTP_SESSIONS:
+            http = getattr(self._client, name, None)
+            if http is None or getattr(http.request, "_rate_limited", False):
+                continue
+            http.request = self._limited_request(http.request)
+
+    def _limited_request(self, send: Callable) -> Callable:
+        def request(*args, **kwargs):
+            waited = self._bucket.acquire()
+            with self._stats_lock:
+                self.request_count += 1
+                self.throttled_sec += waited
+            return send(*args, **kwargs)
+
+        request._rate_limited = True
+        return request
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        if name in LOCAL_METHODS:
+            def local(*args, **kwargs):
+                try:
+                    return attr(*args, **kwargs)
+                finally:
+                    # Loading settings can swap in new requests sessions; throttle those too.
+                    self.throttle_http()
+            return local
+
+        def tracked(*args, **kwargs):
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as e:
+                if self._on_error:
+                    self._on_error(e)
+                raise
+            finally:
+                # A relogin inside the call can replace the requests sessions.
+                self.throttle_http()
+            if self._on_success:
+                self._on_success()
+            return result
+
+        return tracked
+
+    def reset_stats(self) -> Dict[str, float]:
+        """Returns the counters accumulated so far and zeroes them."""
+        with self._stats_lock:
+            stats = {"requests": self.request_count, "throttled_sec": round(self.throttled_sec, 2)}
+            self.request_count = 0
+            self.throttled_sec = 0.0
+        return stats
@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from instagrapi import Client
+from instagrapi.exceptions import (
+    ChallengeRequired,
+    ClientThrottledError,
+    FeedbackRequired,
+    LoginRequired,
+    PleaseWaitFewMinutes,
+    RateLimitError,
+)
+
+from src.fetchers.rate_limiter import TokenBucket, RateLimitedClient
+from src.config import Config, logger
+
+# Errors that mean Instagram wants this session to back off for a while.
+COOLDOWN_ERRORS = (
+    ChallengeRequired,
+    ClientThrottledError,
+    FeedbackRequired,
+    PleaseWaitFewMinutes,
+    RateLimitError,
+)
+
+
+def login_to_instagram(
+    username: Optional[str], password: Optional[str], session_file: str, client: Optional[Client] = None
+) -> Client:
+    """
+    Builds a Client from a saved session file, or logs in with credentials and saves one.
+    Pass `client` to log in on an existing (e.g. already rate-limited) Client.
+    The session is not validated here; an expired session surfaces as LoginRequired
+    on its first real request and is handled by the pool.
+    """
+    cl = client or Client()
+    # No delay_range: pacing is done by the per-session TokenBucket instead.
+
+    if os.path.exists(session_file):
+        cl.load_settings(session_file)
+        logger.info(f"✅ Loaded saved Instagram session from {session_file}.")
+        return cl
+
+    if not (username and password):
+        raise RuntimeError(f"No session file at {session_file} and no credentials to log in with.")
+
+    os.makedirs(os.path.dirname(session_file) or ".", exist_ok=True)
+    cl.login(username, password)
+    cl.dump_settings(session_file)
+    logger.info(f"✅ Logged in as @{username} and saved session to {session_file}.")
+    return cl
+
+
+class InstagramSession:
+    """
+    One Instagram account/session with its own rate limiter and health state.
+    The underlying Client is created lazily on first use.
+    """
+    def __init__(self, name: str, session_file: str, username: Optional[str] = None, password: Optional[str] = None):
+        self.name = name
+        self.session_file = session_file
+        self.username = username
+        self.password = password
+        self.bucket = TokenBucket(
+            rate=Config.INSTA_REQUESTS_PER_MINUTE / 60.0,
+            capacity=Config.INSTA_REQUEST_BURST,
+        )
+        self.client: Optional[RateLimitedClient] = None
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.consecutive_failures = 0
+        self._lock = threading.Lock()
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def get_client(self) -> RateLimitedClient:
+        with self._lock:
+            if self.client is None:
+                raw_client = Client()
+                # Wrap before logging in so the login's own requests are throttled and counted too.
+                client = RateLimitedClient(
+                    raw_client, self.bucket, on_error=self.record_error, on_success=self.record_success
+                )
+                login_to_instagram(self.username, self.password, self.session_file, client=raw_client)
+                # load_settings/login may have replaced the requests sessions wrapped above.
+                client.throttle_http()
+                self.client = client
+            return self.client
+
+    def record_error(self, error: Exception):
+        """Puts the session on cooldown if Instagram is pushing back on it."""
+        if isinstance(error, LoginRequired):
+            logger.warning(f"🔑 Session '{self.name}' is logged out. It will log in again on next use.")
+            with self._lock:
+                self.client = None
+                if os.path.exists(self.session_file) and self.username and self.password:
+                    # Keep the old session around (device ids, cookies) instead of deleting it.
+                    try:
+                        os.replace(self.session_file, self.session_file + ".stale")
+                    except OSError as e:
+                        logger.warning(f"Could not set aside session file {self.session_file}: {e}")
+                self._cool_down(Config.INSTA_SESSION_COOLDOWN_SEC)
+        elif isinstance(error, COOLDOWN_ERRORS):
+            with self._lock:
+                self.consecutive_failures += 1
+                # Exponential backoff for sessions that keep getting challenged.
+                cooldown = min(
+                    Config.INSTA_SESSION_COOLDOWN_SEC * (2 ** (self.consecutive_failures - 1)),
+                    Config.INSTA_SESSION_MAX_COOLDOWN_SEC,
+                )
+                self._cool_down(cooldown)
+            logger.warning(
+                f"🧊 Session '{self.name}' hit {type(error).__name__}. Cooling down for {cooldown:.0f}s."
+            )
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+
+    def _cool_down(self, seconds: float):
+        """Callers hold self._lock."""
+        self.cooldown_until = max(self.cooldown_until, time.time() + seconds)
+
+
+class SessionPool:
+    """
+    A pool of Instagram sessions. An instagrapi Client keeps per-request state
+    and is not thread-safe, so each session is leased to one thread at a time;
+    callers wait for a healthy session to be released.
+    """
+    # How often a waiting caller re-checks for sessions coming off cooldown.
+    WAIT_POLL_SEC = 5.0
+
+    def __init__(self, sessions: List[InstagramSession]):
+        self.sessions = sessions
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+
+    @classmethod
+    def from_config(cls) -> "SessionPool":
+        """
+        Builds sessions from INSTA_USERNAME/INSTA_PASSWORD, INSTA_ACCOUNTS
+        ("user:pass,user2:pass2") and INSTA_SESSION_FILES ("a.json,b.json").
+        """
+        sessions: List[InstagramSession] = []
+        seen = set()
+
+        accounts = []
+        if Config.INSTA_USERNAME:
+            accounts.append((Config.INSTA_USERNAME, Config.INSTA_PASSWORD, Config.SESSION_FILE))
+        for entry in Config.INSTA_ACCOUNTS:
+            username, _, password = entry.partition(":")
+            session_file = os.path.join(Config.SESSION_DIR, f"{username}.json")
+            accounts.append((username, password, session_file))
+
+        for username, password, session_file in accounts:
+            if username in seen:
+                continue
+            seen.add(username)
+            sessions.append(InstagramSession(username, session_file, username, password))
+
+        for session_file in Config.INSTA_SESSION_FILES:
+            sessions.append(InstagramSession(os.path.basename(session_file), session_file))
+
+        logger.info(f"Instagram session pool built with {len(sessions)} session(s).")
+        return cls(sessions)
+
+    def _pick(self) -> Optional[InstagramSession]:
+        """Leases an idle healthy session, waiting while all healthy ones are in use."""
+        with self._lock:
+            while True:
+                now = time.time()
+                available = [s for s in self.sessions if s.is_available(now)]
+                if not available:
+                    return None
+                idle = [s for s in available if s.in_flight == 0]
+                if idle:
+                    session = idle[0]
+                    session.in_flight += 1
+                    return session
+                self._released.wait(self.WAIT_POLL_SEC)
+
+    @contextmanager
+    def session(self) -> Iterator[Optional[RateLimitedClient]]:
+        """
+        Yields a client leased from an idle healthy session, or None if every
+        session is cooling down or fails to log in.
+        """
+        tried = set()
+        while True:
+            session = self._pick()
+            # Keyed by object: session names are file basenames and need not be unique.
+            if session is None or id(session) in tried:
+                if session is not None:
+                    self._release(session)
+                yield None
+                return
+            tried.add(id(session))
+            try:
+                client = session.get_client()
+                break
+            except Exception as e:
+                logger.error(f"❌ Could not log in session '{session.name}': {e}")
+                with session._lock:
+                    session._cool_down(Config.INSTA_SESSION_MAX_COOLDOWN_SEC)
+                self._release(session)
+
+        try:
+            yield client
+        finally:
+            self._release(session)
+
+    def _release(self, session: InstagramSession):
+        with self._lock:
+            session.in_flight -= 1
+            self._released.notify()
+
+    def has_sessions(self) -> bool:
+        return bool(self.sessions)
+
+    def healthy_count(self) -> int:
+        now = time.time()
+        return sum(1 for s in self.sessions if s.is_available(now))
+
+    def reset_stats(self) -> Dict[str, float]:
+        """Sums and resets request counters across all sessions."""
+        totals = {"requests": 0, "throttled_sec": 0.0}
+        for session in self.sessions:
+            if session.client is None:
+                continue
+            stats = session.client.reset_stats()
+            totals["requests"] += stats["requests"]
+            totals["throttled_sec"] = round(totals["throttled_sec"] + stats["throttled_sec"], 2)
+        return totals
@@ -0,0 +1,187 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+# Upper bounds (seconds) of the stage latency histogram buckets.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, float("inf"))
+
+COUNTER_FIELDS = ("bytes_downloaded", "input_tokens", "output_tokens")
+
+
+def _rss_mb() -> float:
+    """Current resident set size. Linux only (0 elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class Histogram:
+    """A cumulative-bucket latency histogram, safe to update from several threads."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cumulative, running = [], 0
+            for bound, count in zip(self.buckets, self.counts):
+                running += count
+                cumulative.append((bound, running))
+            return {"buckets": cumulative, "count": self.count, "sum": self.sum}
+
+
+# Running per-stage latency histograms for the lifetime of the process.
+STAGE_HISTOGRAMS: Dict[str, Histogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def stage_histogram(name: str) -> Histogram:
+    with _histograms_lock:
+        if name not in STAGE_HISTOGRAMS:
+            STAGE_HISTOGRAMS[name] = Histogram()
+        return STAGE_HISTOGRAMS[name]
+
+
+class Span:
+    """One timed stage. Counters (bytes, tokens) can be added while it is open."""
+
+    def __init__(self, name: str, parent: Optional["Span"]):
+        self.name = name
+        self.parent = parent
+        self.counters: Dict[str, float] = {}
+        self.result: Dict[str, Any] = {}
+
+    def add(self, **counters: float):
+        for key, value in counters.items():
+            if value:
+                self.counters[key] = self.counters.get(key, 0) + value
+
+
+class JobRecorder:
+    """Collects the spans and annotations of one job."""
+
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+        self.annotations: Dict[str, Any] = {}
+
+    def stages(self) -> List[Dict[str, Any]]:
+        return list(self.spans)
+
+    def totals(self) -> Dict[str, float]:
+        """Sums counters over top-level spans (nested spans are already included in their parents)."""
+        totals = {field: 0 for field in COUNTER_FIELDS}
+        for span in self.spans:
+            if span["parent"] is None:
+                for field in COUNTER_FIELDS:
+                    totals[field] += span.get(field, 0)
+        return totals
+
+
+_current_job: ContextVar[Optional[JobRecorder]] = ContextVar("current_job", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+@contextmanager
+def job() -> Iterator[JobRecorder]:
+    """Records every span opened inside this block into a fresh JobRecorder."""
+    recorder = JobRecorder()
+    job_token = _current_job.set(recorder)
+    span_token = _current_span.set(None)
+    try:
+        yield recorder
+    finally:
+        _current_span.reset(span_token)
+        _current_job.reset(job_token)
+
+
+@contextmanager
+def span(name: str) -> Iterator[Span]:
+    """
+    Times a stage: wall time, CPU time of the calling thread and the change
+    in current RSS. Stages run on their job's thread, so thread CPU time
+    leaves out the discoverer, prefetcher and other background threads (and
+    also native threads a library spawns, e.g. torch's intra-op pool).
+    Counters added to a nested span also roll up into its parents.
+    """
+    parent = _current_span.get()
+    current = Span(name, parent)
+    token = _current_span.set(current)
+    rss_before = _rss_mb()
+    cpu_before = time.thread_time()
+    wall_before = time.perf_counter()
+    try:
+        yield current
+    finally:
+        wall = time.perf_counter() - wall_before
+        _current_span.reset(token)
+        if parent is not None:
+            parent.add(**current.counters)
+
+        stage_histogram(name).observe(wall)
+        recorder = _current_job.get()
+        if recorder is not None:
+            entry = {
+                "name": name,
+                "parent": parent.name if parent else None,
+                "wall_sec": round(wall, 3),
+                "cpu_sec": round(time.thread_time() - cpu_before, 3),
+                "rss_delta_mb": round(_rss_mb() - rss_before, 1),
+            }
+            entry.update(current.counters)
+            recorder.spans.append(entry)
+
+
+def timed(name: str):
+    """Decorator form of `span`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(**counters: float):
+    """Adds counters (e.g. bytes_downloaded=...) to the innermost open span, if any."""
+    current = _current_span.get()
+    if current is not None:
+        current.add(**counters)
+
+
+def record_gemini_usage(response: Any):
+    """Adds a Gemini response's token counts to the innermost open span."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    record(
+        input_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+        output_tokens=getattr(usage, "candidates_token_count", 0) or 0,
+    )
+
+
+def annotate(**values: Any):
+    """Attaches values (e.g. the model used) to the current job's metadata."""
+    recorder = _current_job.get()
+    if recorder is not None:
+        recorder.annotations.update(values)
@@ -0,0 +1,130 @@
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Set
+
+from src.database.db import Database
+from src.config import Config, logger
+
+# Only entries the pipeline creates are ever swept: "{post_type}_{shortcode}"
+# job folders, and "{folder}__{stem}.wav" audio in FAST_TEMP_DIR.
+JOB_FOLDER = re.compile(r"^(post|reel|video|album|unknown)_[\w-]+$")
+FAST_AUDIO = re.compile(r"^(post|reel|video|album|unknown)_[\w-]+__.+\.wav$")
+
+
+def entry_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class TempJanitor:
+    """
+    Sweeps the temp directories that workers leave behind when they die before
+    run_pipeline's cleanup runs, and keeps total usage under TEMP_QUOTA_MB.
+
+    - Entries that no leased or prefetched job references are deleted once they
+      are older than JANITOR_GRACE_MINUTES (younger ones may be mid-download).
+    - If usage is still over quota, prefetched media is evicted least recently
+      used first. Media of jobs being processed is never touched.
+    """
+    def __init__(self):
+        self.db = Database()
+        self.temp_root = Path(Config.TEMP_DIR)
+        self.prefetch_root = Path(Config.PREFETCH_DIR)
+        self.fast_root = Path(Config.FAST_TEMP_DIR) if Config.FAST_TEMP_DIR else None
+        # Never swept: Instagram sessions and the prefetch root itself.
+        self.protected = {Path(Config.SESSION_FILE), Path(Config.SESSION_DIR), self.prefetch_root}
+        self.protected.update(Path(f) for f in Config.INSTA_SESSION_FILES)
+
+    def _entries(self) -> List[Path]:
+        """
+        Pipeline-created entries only. FAST_TEMP_DIR may be a shared directory
+        such as /tmp or /dev/shm, so anything else there is left alone.
+        """
+        entries = []
+        for root, pattern in ((self.temp_root, JOB_FOLDER), (self.prefetch_root, JOB_FOLDER), (self.fast_root, FAST_AUDIO)):
+            if root is None or not root.is_dir():
+                continue
+            for path in root.iterdir():
+                if path in self.protected or not pattern.match(path.name):
+                    continue
+                if (pattern is JOB_FOLDER) != path.is_dir():
+                    continue
+                entries.append(path)
+        return entries
+
+    def _references(self) -> Dict[str, Set[str]]:
+        """Folder names still needed, split into leased jobs and prefetched pending items."""
+        leased, prefetched = set(), set()
+        for item in self.db.get_active_media_refs():
+            names = {f"{item.get('post_type', 'post')}_{item['_id']}"}
+            if item.get("local_media_path"):
+                names.add(Path(item["local_media_path"]).name)
+            (leased if item.get("status") == "processing" else prefetched).update(names)
+        return {"leased": leased, "prefetched": prefetched}
+
+    @staticmethod
+    def _owner(path: Path) -> str:
+        # Audio in FAST_TEMP_DIR is named "{folder}__{stem}.wav"; everything else is a job folder.
+        return path.name.split("__")[0]
+
+    def run_once(self) -> int:
+        """Sweeps orphans and enforces the quota. Returns the number of bytes reclaimed."""
+        refs = self._references()
+        grace_cutoff = time.time() - Config.JANITOR_GRACE_MINUTES * 60
+        reclaimed = 0
+        removed = 0
+
+        survivors = []
+        for path in self._entries():
+            owner = self._owner(path)
+            size = entry_size(path)
+            referenced = owner in refs["leased"] or owner in refs["prefetched"]
+            if not referenced and path.stat().st_mtime < grace_cutoff:
+                reclaimed += self._remove(path, size)
+                removed += 1
+            else:
+                survivors.append((path, size))
+
+        # Quota: evict prefetched media, least recently used first.
+        quota = Config.TEMP_QUOTA_MB * 1024 * 1024
+        total = sum(size for _, size in survivors)
+        if total > quota:
+            evictable = [
+                (path, size) for path, size in survivors
+                if self._owner(path) in refs["prefetched"] and self._owner(path) not in refs["leased"]
+            ]
+            evictable.sort(key=lambda entry: entry[0].stat().st_atime)
+            for path, size in evictable:
+                if total <= quota:
+                    break
+                self._forget_prefetch(path)
+                reclaimed += self._remove(path, size)
+                total -= size
+                removed += 1
+            if total > quota:
+                logger.warning(
+                    f"🧹 Temp usage {total / 1e6:.0f} MB is still over the {quota / 1e6:.0f} MB quota; "
+                    f"the rest belongs to jobs in progress."
+                )
+
+        logger.info(f"🧹 Janitor removed {removed} temp entries and reclaimed {reclaimed / 1e6:.1f} MB.")
+        return reclaimed
+
+    def _forget_prefetch(self, path: Path):
+        shortcode = path.name.split("_", 1)[-1]
+        self.db.clear_item_media_path(shortcode, str(path))
+
+    def _remove(self, path: Path, size: int) -> int:
+        try:
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+            logger.debug(f"Removed temp entry {path} ({size / 1024:.0f} KB).")
+            return size
+        except Exception as e:
+            logger.warning(f"Janitor failed to remove {path}: {e}")
+            return 0
@@ -0,0 +1,235 @@
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, Optional, Tuple
+
+from src.config import Config, logger
+from src.instrumentation import Histogram, STAGE_HISTOGRAMS
+
+# How far back the rolling latency percentiles and throughput look.
+ROLLING_WINDOW_SEC = 3600
+QUANTILES = (0.5, 0.9, 0.99)
+QUEUE_CACHE_SEC = 15
+
+
+class Counter:
+    """A monotonically increasing counter keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_labels(zip(self.label_names, labels))} {value}")
+        return lines
+
+
+class RollingWindow:
+    """Timestamped observations from the last ROLLING_WINDOW_SEC, for percentiles and rates."""
+
+    def __init__(self):
+        self.samples: Deque[Tuple[float, float]] = deque()
+        self._lock = threading.Lock()
+
+    def add(self, value: float):
+        with self._lock:
+            self.samples.append((time.time(), value))
+            self._trim()
+
+    def _trim(self):
+        cutoff = time.time() - ROLLING_WINDOW_SEC
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+
+    def values(self, since_sec: float = ROLLING_WINDOW_SEC) -> List[float]:
+        cutoff = time.time() - since_sec
+        with self._lock:
+            self._trim()
+            return [v for t, v in self.samples if t >= cutoff]
+
+
+def _labels(pairs) -> str:
+    pairs = [f'{k}="{v}"' for k, v in pairs]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    index = min(int(q * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def _render_histogram(name: str, help_text: str, histograms: Dict[str, Histogram], label: str) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, histogram in sorted(histograms.items()):
+        snap = histogram.snapshot()
+        for bound, count in snap["buckets"]:
+            le = "+Inf" if bound == float("inf") else bound
+            lines.append(f"{name}_bucket{_labels([(label, key), ('le', le)])} {count}")
+        lines.append(f"{name}_sum{_labels([(label, key)])} {snap['sum']}")
+        lines.append(f"{name}_count{_labels([(label, key)])} {snap['count']}")
+    return lines
+
+
+# --- Process-wide metrics ---
+JOBS_FINISHED = Counter("insta_jobs_finished_total", "Jobs finished by this process.", ("status",))
+GEMINI_RATE_LIMITED = Counter("insta_gemini_rate_limited_total", "Gemini calls rejected with 429.", ("component",))
+JOB_LATENCY = RollingWindow()  # Claim-to-complete seconds
+QUEUE_WAIT: Dict[str, RollingWindow] = {}  # Added-to-claimed seconds, by item priority
+DISCOVERY_RUNS: Dict[str, Histogram] = {"discovery": Histogram()}
+DISCOVERY_REQUESTS = Counter("insta_discovery_requests_total", "Instagram API requests made by discovery runs.")
+
+_queue_cache: Dict[str, object] = {"at": 0.0, "counts": []}
+_queue_refresh_lock = threading.Lock()  # One thread refreshes the counts; others read the cached ones
+_wait_lock = threading.Lock()
+_last_rate_limited: Dict[str, float] = {}  # component -> time of its latest 429
+
+
+def record_job(status: str, claim_to_complete_sec: float):
+    JOBS_FINISHED.inc(status)
+    if status == "completed":
+        JOB_LATENCY.add(claim_to_complete_sec)
+
+
+def record_queue_wait(job: Dict):
+    """Records how long a just-claimed item waited in the queue, under its base priority."""
+    added, claimed = job.get("added_at"), job.get("claimed_at")
+    if not added or not claimed:
+        return
+    # Both are UTC; Mongo may hand them back naive.
+    wait = (claimed.replace(tzinfo=None) - added.replace(tzinfo=None)).total_seconds()
+    with _wait_lock:
+        window = QUEUE_WAIT.setdefault(str(job.get("priority", 1)), RollingWindow())
+    window.add(max(wait, 0.0))
+
+
+def record_discovery_run(duration_sec: float, requests: int):
+    DISCOVERY_RUNS["discovery"].observe(duration_sec)
+    DISCOVERY_REQUESTS.inc(amount=requests)
+
+
+def record_gemini_error(component: str, error: Exception):
+    """Counts Gemini rate-limit rejections (HTTP 429 / ResourceExhausted)."""
+    if "429" in str(error) or type(error).__name__ == "ResourceExhausted":
+        GEMINI_RATE_LIMITED.inc(component)
+        _last_rate_limited[component] = time.time()
+
+
+def seconds_since_rate_limited(component: str) -> Optional[float]:
+    """Seconds since `component` last hit a Gemini 429 in this process, or None if it never has."""
+    at = _last_rate_limited.get(component)
+    return time.time() - at if at is not None else None
+
+
+def pending_depth() -> int:
+    """Pending items in the queue (refreshed at most every QUEUE_CACHE_SEC)."""
+    return sum(row["count"] for row in _queue_counts() if row["status"] == "pending")
+
+
+def _queue_counts() -> List[Dict]:
+    """
+    Open-item counts from the database, cached for QUEUE_CACHE_SEC. While one
+    thread refreshes them, others get the previous counts instead of waiting.
+    """
+    if time.time() - _queue_cache["at"] > QUEUE_CACHE_SEC and _queue_refresh_lock.acquire(blocking=False):
+        try:
+            from src.database.db import Database
+            try:
+                _queue_cache["counts"] = Database().queue_counts()
+            except Exception as e:
+                logger.warning(f"Metrics: failed to read queue counts: {e}")
+            _queue_cache["at"] = time.time()
+        finally:
+            _queue_refresh_lock.release()
+    return _queue_cache["counts"]
+
+
+def render() -> str:
+    """Renders every metric in the Prometheus text exposition format."""
+    lines = [
+        "# HELP insta_queue_items Pending, processing and failed content items by priority (completed jobs: insta_jobs_finished_total).",
+        "# TYPE insta_queue_items gauge",
+    ]
+    for row in _queue_counts():
+        lines.append(f"insta_queue_items{_labels([('status', row['status']), ('priority', row['priority'])])} {row['count']}")
+
+    latencies = sorted(JOB_LATENCY.values())
+    lines += [
+        "# HELP insta_job_latency_seconds Claim-to-complete latency over the last hour.",
+        "# TYPE insta_job_latency_seconds summary",
+    ]
+    for q in QUANTILES:
+        if latencies:
+            lines.append(f"insta_job_latency_seconds{_labels([('quantile', q)])} {_quantile(latencies, q):.3f}")
+    lines.append(f"insta_job_latency_seconds_count {len(latencies)}")
+    lines.append(f"insta_job_latency_seconds_sum {sum(latencies):.3f}")
+
+    lines += [
+        "# HELP insta_queue_wait_seconds Time from discovery to claim over the last hour, by item priority.",
+        "# TYPE insta_queue_wait_seconds summary",
+    ]
+    with _wait_lock:
+        waits = dict(QUEUE_WAIT)
+    for priority, window in sorted(waits.items()):
+        values = sorted(window.values())
+        for q in QUANTILES:
+            if values:
+                lines.append(f"insta_queue_wait_seconds{_labels([('priority', priority), ('quantile', q)])} {_quantile(values, q):.3f}")
+        lines.append(f"insta_queue_wait_seconds_count{_labels([('priority', priority)])} {len(values)}")
+        lines.append(f"insta_queue_wait_seconds_sum{_labels([('priority', priority)])} {sum(values):.3f}")
+
+    recent = len(JOB_LATENCY.values(since_sec=600))
+    lines += [
+        "# HELP insta_jobs_per_minute Completed jobs per minute over the last 10 minutes.",
+        "# TYPE insta_jobs_per_minute gauge",
+        f"insta_jobs_per_minute {recent / 10:.2f}",
+    ]
+
+    lines += JOBS_FINISHED.render()
+    lines += GEMINI_RATE_LIMITED.render()
+    lines += DISCOVERY_REQUESTS.render()
+    lines += _render_histogram(
+        "insta_stage_duration_seconds", "Pipeline stage wall time.", dict(STAGE_HISTOGRAMS), "stage"
+    )
+    lines += _render_histogram(
+        "insta_discovery_run_seconds", "Discovery run duration.", DISCOVERY_RUNS, "service"
+    )
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep scrapes out of the application log.
+        pass
+
+
+def start_metrics_server(port: Optional[int] = None, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """Serves /metrics on a daemon thread. Does nothing when no port is configured."""
+    port = port if port is not None else Config.METRICS_PORT
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"📈 Metrics available at http://{host}:{port}/metrics")
+    return server
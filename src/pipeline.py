@@ -1,46 +1,168 @@
 import os
 import shutil
+import threading
 from pathlib import Path
-from typing import Dict, Any
-
-from src.fetchers.instagram import InstagramDownloader
-from src.extractors.audio import extract_audio
-from src.processors.audio import AudioProcessor
-from src.processors.video import VideoProcessor
-from src.processors.evaluator import Evaluator
-from src.processors.image import ImageProcessor
-from src.config import logger
-from src.summarizers.final_summarizer import FinalSummarizer
-
-# --- Module Instantiation ---
-downloader = InstagramDownloader()
-audio_processor = AudioProcessor()
-video_processor = VideoProcessor()
-evaluator = Evaluator()
-image_processor = ImageProcessor()
-summarizer = FinalSummarizer()
-
-
-def run_pipeline(url: str) -> Dict[str, Any]:
+from typing import Dict, Any, Callable, List, Optional
+
+from src.config import logger, Config
+from src.instrumentation import annotate, span
+from src.summarizers.input_budget import TOKENS_PER_IMAGE, estimate_tokens
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+# --- Lazy Module Instantiation ---
+# Components (and their heavy imports: torch, whisper, moviepy, cv2, Gemini)
+# are built on first use, so importing this module is cheap.
+_components: Dict[str, Any] = {}
+_component_locks: Dict[str, threading.Lock] = {}
+_components_lock = threading.Lock()
+_warmup_started = False
+
+
+def _component(name: str, factory: Callable[[], Any]) -> Any:
+    # One lock per component, so building the audio processor (torch import)
+    # on the warmup thread doesn't block the downloader on the job thread.
+    with _components_lock:
+        lock = _component_locks.setdefault(name, threading.Lock())
+    with lock:
+        if name not in _components:
+            _components[name] = factory()
+        return _components[name]
+
+
+def get_downloader():
+    def build():
+        from src.fetchers.instagram import InstagramDownloader
+        return InstagramDownloader()
+    return _component("downloader", build)
+
+
+def get_audio_processor():
+    def build():
+        from src.processors.audio import AudioProcessor
+        return AudioProcessor()
+    return _component("audio_processor", build)
+
+
+def get_video_processor():
+    def build():
+        from src.processors.video import VideoProcessor
+        return VideoProcessor()
+    return _component("video_processor", build)
+
+
+def get_evaluator():
+    def build():
+        from src.processors.evaluator import Evaluator
+        return Evaluator()
+    return _component("evaluator", build)
+
+
+def get_image_processor():
+    def build():
+        from src.processors.image import ImageProcessor
+        return ImageProcessor()
+    return _component("image_processor", build)
+
+
+def get_summarizer():
+    def build():
+        from src.summarizers.final_summarizer import FinalSummarizer
+        return FinalSummarizer()
+    return _component("summarizer", build)
+
+
+def warmup_in_background():
+    """
+    Starts loading the Whisper models on a daemon thread (once per process),
+    so the load overlaps with the first job's download instead of following it.
+    """
+    global _warmup_started
+    with _components_lock:
+        if _warmup_started:
+            return
+        _warmup_started = True
+
+    def warm():
+        try:
+            get_audio_processor().warmup()
+        except Exception as e:
+            logger.warning(f"Background Whisper warmup failed: {e}")
+
+    threading.Thread(target=warm, name="whisper-warmup", daemon=True).start()
+
+
+def choose_fast_path(content_type: str, image_files: List[Path], video_files: List[Path], summary_data: Dict[str, Any]) -> Optional[str]:
+    """
+    Returns "image" or "video" when the post is simple enough (one image, or
+    one video) and small enough (FAST_PATH_MAX_INPUT_TOKENS, estimated) for
+    the final model to analyze its media directly, saving one Gemini round
+    trip. Returns None to use the regular two-step path.
+    """
+    if not Config.FAST_PATH_ENABLED:
+        return None
+    if content_type == "post" and len(image_files) == 1 and not video_files:
+        kind, media_tokens = "image", TOKENS_PER_IMAGE
+    elif content_type != "post" and len(video_files) == 1:
+        kind, media_tokens = "video", Config.FAST_PATH_MAX_FRAMES * TOKENS_PER_IMAGE
+    else:
+        return None
+
+    text = [summary_data.get("caption") or ""] + [t for t in summary_data.get("audio_transcripts", []) if t]
+    estimated = sum(estimate_tokens(t) for t in text) + media_tokens
+    if estimated > Config.FAST_PATH_MAX_INPUT_TOKENS:
+        logger.info(f"Input too large for the fast path (~{estimated} tokens). Using the two-step path.")
+        return None
+    return kind
+
+
+def run_pipeline(job: Dict[str, Any]) -> Any:
+    """
+    Runs the full processing pipeline for a given content item: analysis,
+    then the final summary.
+
+    Returns:
+        The final report string, a {"status": "skipped", ...} dict, or None
+        if the final summarization failed.
     """
-    Runs the full processing pipeline for a given Instagram URL.
+    analysis = run_analysis(job)
+    if analysis.get("status") == "skipped":
+        return analysis
+
+    with span("final_summary"):
+        final_report = get_summarizer().process(analysis["summary_data"], media_parts=analysis["media_parts"])
+    if final_report:
+        logger.info("✅ Pipeline processing complete.")
+        return final_report
+    logger.error("Final summarization failed. No report generated.")
+    return None
+
+
+def run_analysis(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs the analysis stages of the pipeline for a given content item.
 
     This function handles downloading, content analysis (image/video),
-    transcription, evaluation, and summarization, then cleans up all artifacts.
+    transcription and evaluation, then cleans up all artifacts. The final
+    summary is left to the caller, so several items can share one request.
 
     Args:
-        url: The Instagram post or reel URL.
+        job: The claimed content item (its _id, source_url, caption, media_urls, ...).
 
     Returns:
-        A dictionary containing all the generated content for final summarization.
+        {"summary_data": ..., "media_parts": [...]} for the final summarizer,
+        or a {"status": "skipped", ...} dict.
     """
     download_result = None
     temp_audio_paths = []
     
     try:
         # STEP 1: Download content from Instagram
-        logger.info(f"🚀 Starting pipeline for URL: {url}")
-        download_result = downloader.download(url)
+        logger.info(f"🚀 Starting pipeline for URL: {job.get('source_url')}")
+        if Config.WHISPER_WARMUP:
+            warmup_in_background()
+        with span("download"):
+            download_result = get_downloader().download(job)
         if not download_result:
             raise RuntimeError("Download failed, cannot proceed.")
         
@@ -58,45 +180,59 @@ def run_pipeline(url: str) -> Dict[str, Any]:
 
         # STEP 2: Initialize the data object for the final summarizer
         summary_data = {
-            "description": None,
+            "caption": job.get("caption"),
             "image_summary": None,
             "audio_transcripts": [],
             "video_summaries": [],
         }
+        # Images/keyframes sent straight to the final model on the fast path.
+        media_parts = []
 
-        # STEP 3: Extract caption/description from the text file
+        # STEP 3: Fall back to the caption file instaloader writes
         # The main text file usually has the same name as the shortcode.
-        shortcode = folder_path.name.split('_')[-1]
+        shortcode = folder_path.name.split('_', 1)[-1]
         description_file = folder_path / f"{shortcode}.txt"
-        if description_file.exists():
-            summary_data["description"] = description_file.read_text(encoding="utf-8")
+        if not summary_data["caption"] and description_file.exists():
+            summary_data["caption"] = description_file.read_text(encoding="utf-8")
             logger.info("📝 Description extracted successfully.")
 
+        video_files = list(folder_path.glob('*.mp4'))
+        image_files = [p for p in folder_path.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS]
+
         # STEP 4: Process images if the content is a post
         # This will run for image-only posts and mixed-media posts.
         if content_type == "post":
-            logger.info("🖼️ This is a post. Analyzing images...")
-            image_summary_text = image_processor.process(str(folder_path))
-            summary_data["image_summary"] = image_summary_text
-            logger.info("✅ Image analysis complete.")
+            if choose_fast_path(content_type, image_files, video_files, summary_data) == "image":
+                logger.info("⚡ Single-image post. Sending the image straight to the final summarizer.")
+                media_parts = get_image_processor().image_parts(str(folder_path))
+                annotate(fast_path="image")
+            else:
+                logger.info("🖼️ This is a post. Analyzing images...")
+                with span("image_analysis"):
+                    image_summary_text = get_image_processor().process(str(folder_path))
+                summary_data["image_summary"] = image_summary_text
+                logger.info("✅ Image analysis complete.")
 
         # STEP 5: Process all videos found in the folder (works for Reels and Posts)
-        video_files = list(folder_path.glob('*.mp4'))
         if not video_files:
             logger.info("No videos found in this post. Skipping video processing.")
         else:
             logger.info(f"🎥 Found {len(video_files)} video(s). Starting processing loop.")
 
+        from src.extractors.audio import extract_audio  # Lazy: pulls in moviepy
+
         for i, video_path in enumerate(video_files):
             logger.info(f"--- Processing Video {i+1}/{len(video_files)}: {video_path.name} ---")
             
             # 5a. Extract Audio
-            audio_path = extract_audio(str(video_path))
+            with span("audio_extraction"):
+                audio_path = extract_audio(str(video_path))
             temp_audio_paths.append(audio_path) # Mark for cleanup
 
             if audio_path:
                 logger.info(f"🎤 Audio extracted to: {audio_path}")
-                audio_result = audio_processor.process(audio_path)
+                with span("transcription"):
+                    audio_result = get_audio_processor().process(audio_path)
                 
                 # Check if transcription was successful before proceeding
                 if audio_result and audio_result.get("transcript"):
@@ -112,27 +248,29 @@ def run_pipeline(url: str) -> Dict[str, Any]:
                 speech_ratio = 0.0 # No audio means 0% speech
                 
             # 5c. Evaluate if visual summary is needed
-            evaluation = evaluator.decide(str(video_path), speech_ratio)
+            with span("evaluation"):
+                evaluation = get_evaluator().decide(str(video_path), speech_ratio)
             logger.info(f"⚖️ Evaluator decision: {evaluation['decision']}. Reason: {evaluation['reason']}")
 
             # 5d. Generate visual summary if evaluator approves
-            if evaluation['decision']:
-                video_summary = video_processor.process(str(video_path))
+            if evaluation['decision'] and choose_fast_path(content_type, image_files, video_files, summary_data) == "video":
+                logger.info("⚡ Single video. Sending its keyframes straight to the final summarizer.")
+                with span("keyframes"):
+                    media_parts = get_video_processor().keyframe_parts(str(video_path), max_frames=Config.FAST_PATH_MAX_FRAMES)
+                annotate(fast_path="video")
+            elif evaluation['decision']:
+                with span("visual_summary"):
+                    video_summary = get_video_processor().process(str(video_path))
                 summary_data["video_summaries"].append(video_summary)
                 logger.info("✨ Visual summary generated for the video.")
             else:
                 logger.info("Skipping visual summarization based on evaluation.")
         
-        logger.info("✅ Pipeline processing complete.")
-        
-        final_report = summarizer.process(summary_data)
-        if final_report:
-            return final_report
-        else:
-            logger.error("Final summarization failed. No report generated.")
+        logger.info("✅ Analysis complete.")
+        return {"summary_data": summary_data, "media_parts": media_parts}
 
     except Exception as e:
-        logger.error(f"❌ Pipeline failed for URL {url}: {e}", exc_info=True)
+        logger.error(f"❌ Pipeline failed for URL {job.get('source_url')}: {e}", exc_info=True)
         # Re-raise the exception to be handled by the calling script if needed
         raise
 
@@ -1,8 +1,9 @@
 import os
-import whisper
-import torch
+import threading
 from src.config import logger
-from typing import Optional, Dict
+from src.instrumentation import span
+from src.profiling import torch_profile
+from typing import Optional, Dict, Iterable
 from pydub import AudioSegment
 from pydub.silence import detect_nonsilent
 
@@ -16,7 +17,10 @@ class AudioProcessor:
         """
         Initializes the processor. Models are loaded dynamically and cached to be efficient.
         """
+        import torch  # Deferred so importing this module stays cheap
+
         self.models = {}
+        self._models_lock = threading.Lock()
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         logger.info(f"AudioProcessor initialized. Models will be loaded on demand on '{self.device}'.")
 
@@ -25,11 +29,18 @@ class AudioProcessor:
         Private method to load a Whisper model into memory if not already cached.
         This avoids reloading models from disk repeatedly.
         """
-        if model_size not in self.models:
-            logger.info(f"Loading Whisper model '{model_size}'...")
-            self.models[model_size] = whisper.load_model(model_size, device=self.device)
-            logger.info(f"Whisper model '{model_size}' loaded successfully.")
-        return self.models[model_size]
+        with self._models_lock:
+            if model_size not in self.models:
+                import whisper
+                logger.info(f"Loading Whisper model '{model_size}'...")
+                self.models[model_size] = whisper.load_model(model_size, device=self.device)
+                logger.info(f"Whisper model '{model_size}' loaded successfully.")
+            return self.models[model_size]
+
+    def warmup(self, model_sizes: Iterable[str] = ("base", "small")):
+        """Preloads the language-detection and English transcription models."""
+        for model_size in model_sizes:
+            self._get_model(model_size)
     
     def _estimate_speech_ratio(self, audio_path: str, silence_thresh: float = -35.0, min_silence_len: int = 500) -> float:
         try:
@@ -79,6 +90,8 @@ class AudioProcessor:
             logger.info("Low speech ratio detected, skipping transcription.")
             return {"transcript": None, "speech_ratio": speech_ratio}
         
+        import whisper
+
         try:
             # Step 1: Load small/base model for language detection
             detection_model = self._get_model("base")
@@ -89,7 +102,8 @@ class AudioProcessor:
             mel = whisper.log_mel_spectrogram(audio).to(detection_model.device)
 
             # Step 2: Detect language
-            _, lang_probs = detection_model.detect_language(mel)
+            with span("whisper.detect_language"), torch_profile("whisper_detect_language"):
+                _, lang_probs = detection_model.detect_language(mel)
             detected_language = max(lang_probs, key=lang_probs.get)
             logger.info(f"Detected language: {detected_language}")
 
@@ -105,13 +119,14 @@ class AudioProcessor:
             logger.info(f"Using '{model_size}' model for {task_type} task.")
 
             # Step 4: Transcribe
-            result = transcription_model.transcribe(
-                audio_path,
-                task=task_type,
-                temperature=0.0,
-                beam_size=5,
-                verbose=False
-            )
+            with span("whisper.transcribe"), torch_profile("whisper_transcribe"):
+                result = transcription_model.transcribe(
+                    audio_path,
+                    task=task_type,
+                    temperature=0.0,
+                    beam_size=5,
+                    verbose=False
+                )
 
             english_transcript = result.get("text", "").strip()
 
@@ -2,6 +2,7 @@ import cv2
 import pytesseract
 import numpy as np
 from src.config import logger
+from src.instrumentation import timed
 
 class Evaluator:
     """
@@ -26,6 +27,7 @@ class Evaluator:
         self.samples = samples
         logger.info("Evaluator initialized with combined audio/visual thresholds.")
 
+    @timed("evaluation.ocr_and_histograms")
     def _evaluate_visuals(self, video_path: str) -> dict:
         """
         Private method to calculate only the visual metrics.
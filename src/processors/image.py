@@ -5,6 +5,18 @@ from PIL import Image
 from pathlib import Path
 from typing import List, Optional
 from src.config import logger, Config
+from src.prompt_cache import CachedPromptModel
+from src.instrumentation import span, record_gemini_usage
+from src import metrics
+
+IMAGE_PROMPT = """
+You are a tech analyst. The following images are from a single social media post, likely an informational carousel.
+Analyze all images in the sequence they are provided. Your task is to synthesize the information across all of them into one, single, cohesive summary.
+- Transcribe important text, code snippets, or titles from each image.
+- Explain any diagrams, charts, or key visual elements.
+- Capture the main topic and the key takeaways presented across the entire post.
+- Provide a final, well-structured summary.
+"""
 
 class ImageProcessor:
     """
@@ -15,7 +27,7 @@ class ImageProcessor:
         # Configure the Gemini API client
         try:
             genai.configure(api_key=Config.GOOGLE_API_KEY)
-            self.model = genai.GenerativeModel("gemini-2.0-flash-lite")
+            self.model = CachedPromptModel("gemini-2.0-flash-lite", IMAGE_PROMPT)
             logger.info("Initialized image processor with gemini-2.0-flash-lite.")
         except Exception as e:
             logger.error(f"Failed to configure Google Gemini client: {e}")
@@ -40,6 +52,26 @@ class ImageProcessor:
         logger.info(f"Found {len(image_paths)} images in '{folder_path}'.")
         return image_paths
 
+    def _load_images(self, image_paths: List[Path]) -> List[Image.Image]:
+        image_objects = []
+        for path in image_paths:
+            try:
+                # The Gemini API can handle various image formats directly.
+                img = Image.open(path)
+                image_objects.append(img)
+            except Exception as e:
+                logger.warning(f"Could not process image {path}: {e}")
+                continue
+        return image_objects
+
+    def image_parts(self, post_folder_path: str) -> List[Image.Image]:
+        """Loads the post's images without summarizing them, for the single-call fast path."""
+        images = self._load_images(self._find_images(post_folder_path))
+        for img in images:
+            # Read the pixels now: the post folder is deleted before the final summary runs.
+            img.load()
+        return images
+
     def process(self, post_folder_path: str) -> Optional[str]:
         """
         Analyzes all images in a post folder and returns a single summary using Gemini.
@@ -59,38 +91,19 @@ class ImageProcessor:
             logger.warning("No images found to process in the specified folder.")
             return "No images were found in this post."
 
-        # 1. Prepare the prompt and images for the single API call
-        prompt_parts = [
-            """
-            You are a tech analyst. The following images are from a single social media post, likely an informational carousel.
-            Analyze all images in the sequence they are provided. Your task is to synthesize the information across all of them into one, single, cohesive summary.
-            - Transcribe important text, code snippets, or titles from each image.
-            - Explain any diagrams, charts, or key visual elements.
-            - Capture the main topic and the key takeaways presented across the entire post.
-            - Provide a final, well-structured summary.
-            """
-        ]
-
-        image_objects = []
-        for path in image_paths:
-            try:
-                # The Gemini API can handle various image formats directly.
-                img = Image.open(path)
-                image_objects.append(img)
-            except Exception as e:
-                logger.warning(f"Could not process image {path}: {e}")
-                continue
+        image_objects = self._load_images(image_paths)
         
         if not image_objects:
             return "Could not read any of the image files."
-        
-        prompt_parts.extend(image_objects)
 
-        # 2. Make the single, efficient API call
+        # Make the single, efficient API call (the prompt itself is cached context)
         try:
             logger.info(f"Making a single API call to Gemini with {len(image_objects)} images...")
-            response = self.model.generate_content(prompt_parts)
+            with span("image.gemini"):
+                response = self.model.generate_content(image_objects)
+                record_gemini_usage(response)
             return response.text.strip()
         except Exception as e:
             logger.error(f"Image post summary generation failed with Gemini: {e}")
+            metrics.record_gemini_error("image", e)
             return None
\ No newline at end of file
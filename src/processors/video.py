@@ -1,11 +1,21 @@
 import cv2
 import numpy as np
 import google.generativeai as genai
-from typing import List
+from typing import Any, Dict, List
 from src.config import Config, logger
+from src.prompt_cache import CachedPromptModel
+from src.instrumentation import timed, record_gemini_usage
+from src import metrics
 import os
 
-genai.configure(api_key=Config.GOOGLE_API_KEY)
+VIDEO_PROMPT = """
+You are a technical analyst. The following is a sequence of keyframes from an informational video.
+Your task is to create a single, concise summary of the visual content.
+- Analyze the frames in order to understand the flow of information.
+- Transcribe any important text, code snippets, or commands you see clearly.
+- Describe any key diagrams, charts, or user interface elements.
+- Synthesize all of this into one coherent summary of what is being shown.
+"""
 
 class VideoProcessor:
     """
@@ -17,12 +27,13 @@ class VideoProcessor:
         """Initializes the Gemini model client."""
         try:
             genai.configure(api_key=Config.GOOGLE_API_KEY)
-            self.model = genai.GenerativeModel("gemini-2.0-flash-lite")
+            self.model = CachedPromptModel("gemini-2.0-flash-lite", VIDEO_PROMPT)
             logger.info("Initialized video processor with gemini-2.0-flash-lite.")
         except Exception as e:
             logger.error(f"Failed to configure Google Gemini client: {e}")
             self.model = None
 
+    @timed("video.keyframes")
     def _extract_smart_keyframes(self, video_path: str, threshold: float = 5.0, max_frames: int = 10) -> List[np.ndarray]:
         frames = []
         cap = cv2.VideoCapture(video_path)
@@ -58,26 +69,10 @@ class VideoProcessor:
         return frames
 
 
-    def _generate_visual_summary(self, frames: List[np.ndarray]) -> str:
-        """
-        Sends a sequence of keyframes to the Gemini model in a single API call
-        to generate a coherent visual summary.
-        """
-        if not frames:
-            return "No significant visual information was extracted from the video."
-
-        # 1. Define the text part of the prompt
-        prompt_text = """
-                    You are a technical analyst. The following is a sequence of keyframes from an informational video.
-                    Your task is to create a single, concise summary of the visual content.
-                    - Analyze the frames in order to understand the flow of information.
-                    - Transcribe any important text, code snippets, or commands you see clearly.
-                    - Describe any key diagrams, charts, or user interface elements.
-                    - Synthesize all of this into one coherent summary of what is being shown.
-                    """
-
-        # 2. Prepare the prompt parts for the API call (text + images)
-        prompt_parts = [prompt_text]
+    @staticmethod
+    def _encode_frames(frames: List[np.ndarray]) -> List[Dict[str, Any]]:
+        """Encodes frames as JPEG blobs for the Gemini API."""
+        parts = []
         for frame in frames:
             # Encode frame to JPEG bytes and prepare it for the API
             ret, buffer = cv2.imencode(".jpg", frame)
@@ -86,17 +81,43 @@ class VideoProcessor:
                 continue
 
             # The Gemini Python SDK works well with these blob objects
-            prompt_parts.append({"mime_type": "image/jpeg", "data": buffer.tobytes()})
+            parts.append({"mime_type": "image/jpeg", "data": buffer.tobytes()})
+        return parts
+
+    def keyframe_parts(self, video_path: str, max_frames: int = 10) -> List[Dict[str, Any]]:
+        """
+        Extracts and encodes keyframes without summarizing them, so the final
+        summarizer can look at them directly (the single-call fast path).
+        """
+        if not os.path.exists(video_path):
+            logger.error(f"Video file not found at: {video_path}")
+            return []
+        frames = self._extract_smart_keyframes(video_path, threshold=5.0, max_frames=max_frames)
+        return self._encode_frames(frames)
+
+    @timed("video.gemini")
+    def _generate_visual_summary(self, frames: List[np.ndarray]) -> str:
+        """
+        Sends a sequence of keyframes to the Gemini model in a single API call
+        to generate a coherent visual summary.
+        """
+        if not frames:
+            return "No significant visual information was extracted from the video."
+
+        # The analyst prompt is cached context; only the frames are sent per call.
+        prompt_parts = self._encode_frames(frames)
 
-        # 3. Make the single API call to Gemini
+        # Make the single API call to Gemini
         try:
             logger.info(
                 f"Making a single API call to Gemini with {len(frames)} frames..."
             )
             response = self.model.generate_content(prompt_parts)
+            record_gemini_usage(response)
             return response.text.strip()
         except Exception as e:
             logger.error(f"Visual summary generation failed with Gemini API: {e}")
+            metrics.record_gemini_error("video", e)
             return "Failed to generate visual summary due to an API error."
 
     def process(self, video_path: str, max_frames: int = 10) -> str:
@@ -0,0 +1,186 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from src.config import Config, logger
+
+TOP_ALLOCATIONS = 30
+
+
+def should_profile(job: Dict[str, Any]) -> bool:
+    """A job is profiled when PROFILE_JOBS is on, the item is flagged, or it falls in PROFILE_SAMPLE_RATE."""
+    if Config.PROFILE_JOBS or job.get("profile"):
+        return True
+    return Config.PROFILE_SAMPLE_RATE > 0 and random.random() < Config.PROFILE_SAMPLE_RATE
+
+
+class StackSampler:
+    """
+    Samples the stacks of every thread at a fixed interval and counts them in
+    the collapsed ("folded") format used by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval_sec: float):
+        self.interval_sec = interval_sec
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval_sec):
+            names.update({t.ident: t.name for t in threading.enumerate()})
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class JobProfiler:
+    """
+    Profiles one job with cProfile, tracemalloc and a stack sampler, and writes
+    the results to PROFILE_DIR/<post_id>_<timestamp>/:
+
+    - profile.pstats       cProfile output (`python -m pstats` / snakeviz)
+    - profile_top.txt      the 40 most expensive functions by cumulative time
+    - allocations.txt      top allocation sites by size
+    - stacks.collapsed     sampled stacks for flamegraph.pl / speedscope
+    - torch_<name>.json    chrome traces of torch-profiled sections (PROFILE_TORCH)
+    """
+
+    def __init__(self, post_id: str):
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        self.output_dir = Path(Config.PROFILE_DIR) / f"{post_id}_{stamp}"
+        self.artifacts: Dict[str, str] = {}
+        self._profile = cProfile.Profile()
+        self._sampler = StackSampler(Config.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+        self._started_tracemalloc = False
+
+    def start(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(Config.PROFILE_TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        self._sampler.start()
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+        self._sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        pstats_path = self.output_dir / "profile.pstats"
+        self._profile.dump_stats(str(pstats_path))
+        self.artifacts["pstats"] = str(pstats_path)
+
+        summary = io.StringIO()
+        pstats.Stats(self._profile, stream=summary).sort_stats("cumulative").print_stats(40)
+        self._write("profile_top", "profile_top.txt", summary.getvalue())
+
+        lines = [f"Top {TOP_ALLOCATIONS} allocation sites by size (live at the end of the job):"]
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+            lines.append(f"{stat.size / 1024:10.1f} KiB  {stat.count:8d} blocks  {stat.traceback}")
+        self._write("allocations", "allocations.txt", "\n".join(lines) + "\n")
+
+        stacks_path = self.output_dir / "stacks.collapsed"
+        self._sampler.write(stacks_path)
+        self.artifacts["collapsed_stacks"] = str(stacks_path)
+
+    def _write(self, key: str, name: str, content: str):
+        path = self.output_dir / name
+        path.write_text(content, encoding="utf-8")
+        self.artifacts[key] = str(path)
+
+
+_current_profiler: ContextVar[Optional[JobProfiler]] = ContextVar("current_profiler", default=None)
+
+
+@contextmanager
+def _profiling(post_id: str) -> Iterator[JobProfiler]:
+    profiler = JobProfiler(post_id)
+    token = _current_profiler.set(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        _current_profiler.reset(token)
+        try:
+            profiler.stop()
+            logger.info(f"🔬 Profile for job {post_id} written to {profiler.output_dir}")
+        except Exception as e:
+            logger.warning(f"Failed to write profile for job {post_id}: {e}")
+
+
+def profile_job(job: Dict[str, Any]):
+    """
+    Context manager that profiles the job if it was selected (see should_profile),
+    yielding the JobProfiler, or None and no overhead otherwise.
+    """
+    if not should_profile(job):
+        return nullcontext()
+    return _profiling(job["_id"])
+
+
+@contextmanager
+def torch_profile(name: str) -> Iterator[None]:
+    """Runs torch's profiler around a block when the current job is profiled and PROFILE_TORCH is on."""
+    profiler = _current_profiler.get()
+    if profiler is None or not Config.PROFILE_TORCH:
+        yield
+        return
+
+    import torch
+    from torch.profiler import ProfilerActivity, profile
+
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+
+    started = time.perf_counter()
+    with profile(activities=activities, record_shapes=True, profile_memory=True) as prof:
+        yield
+    # A job with several videos runs the same section more than once.
+    key, n = f"torch_{name}", 1
+    while key in profiler.artifacts:
+        n += 1
+        key = f"torch_{name}_{n}"
+    trace_path = profiler.output_dir / f"{key}.json"
+    try:
+        prof.export_chrome_trace(str(trace_path))
+        profiler.artifacts[key] = str(trace_path)
+        logger.info(f"🔬 Torch trace for {name} ({time.perf_counter() - started:.1f}s) written to {trace_path}")
+    except Exception as e:
+        logger.warning(f"Failed to export torch trace for {name}: {e}")
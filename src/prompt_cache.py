@@ -0,0 +1,115 @@
+import threading
+import time
+from datetime import timedelta
+from typing import Any, List, Optional
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+try:
+    from google.generativeai import caching  # Context caching needs google-generativeai >= 0.7
+except ImportError:
+    caching = None
+
+from src.config import Config, logger
+from src.summarizers.input_budget import estimate_tokens
+
+
+class GeminiCacheBackend:
+    """Creates and refreshes Gemini cached contents holding a system prompt."""
+
+    # Gemini rejects cached contents smaller than this many input tokens.
+    MIN_CACHE_TOKENS = 1024
+    # What a call on an evicted or expired cached content raises.
+    evicted_errors = (google_exceptions.NotFound, google_exceptions.PermissionDenied)
+
+    def supports(self, system_prompt: str) -> bool:
+        return caching is not None and estimate_tokens(system_prompt) >= self.MIN_CACHE_TOKENS
+
+    def plain_model(self, model_name: str) -> Any:
+        return genai.GenerativeModel(model_name)
+
+    def create(self, model_name: str, system_prompt: str, ttl_sec: int) -> Any:
+        return caching.CachedContent.create(
+            model=f"models/{model_name}",
+            display_name=f"system-prompt-{model_name}",
+            system_instruction=system_prompt,
+            ttl=timedelta(seconds=ttl_sec),
+        )
+
+    def refresh(self, handle: Any, ttl_sec: int):
+        handle.update(ttl=timedelta(seconds=ttl_sec))
+
+    def cached_model(self, handle: Any) -> Any:
+        return genai.GenerativeModel.from_cached_content(cached_content=handle)
+
+
+class CachedPromptModel:
+    """
+    A Gemini model with a fixed system prompt. The prompt is registered once
+    as cached context (PROMPT_CACHE_TTL_SEC, refreshed before it expires) and
+    calls reference the cached handle, so its tokens are not re-sent every time.
+    When caching is off, unsupported or failing, the prompt is sent in full.
+
+    Gemini only caches contexts of at least MIN_CACHE_TOKENS. Every system
+    prompt in the pipeline today is shorter (the final summary prompt is
+    ~560 tokens, the image and video prompts ~130), so in production all
+    calls currently take the plain path; caching engages on its own once a
+    prompt grows past the minimum.
+
+    `generate_content` takes only the per-call parts (text, images, ...).
+    """
+
+    def __init__(self, model_name: str, system_prompt: str, backend: Optional[Any] = None):
+        self.model_name = model_name
+        self.system_prompt = system_prompt
+        self.backend = backend or GeminiCacheBackend()
+        self._plain = self.backend.plain_model(model_name)
+        self._handle = None
+        self._cached = None
+        self._expires_at = 0.0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self.enabled = Config.PROMPT_CACHE_ENABLED and self.backend.supports(system_prompt)
+        if Config.PROMPT_CACHE_ENABLED and not self.enabled:
+            logger.info(f"Prompt caching not available for {model_name} (prompt ~{estimate_tokens(system_prompt)} tokens). Sending it in full.")
+
+    def _cached_model(self) -> Optional[Any]:
+        """Returns the model bound to a live cache entry, creating or refreshing it as needed."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            now = time.time()
+            if self._handle is not None and now >= self._expires_at - Config.PROMPT_CACHE_REFRESH_SEC:
+                try:
+                    self.backend.refresh(self._handle, Config.PROMPT_CACHE_TTL_SEC)
+                    self._expires_at = now + Config.PROMPT_CACHE_TTL_SEC
+                except Exception as e:
+                    logger.warning(f"Could not refresh the cached prompt for {self.model_name}: {e}")
+                    self._drop()
+            if self._handle is None and now >= self._retry_at:
+                try:
+                    self._handle = self.backend.create(self.model_name, self.system_prompt, Config.PROMPT_CACHE_TTL_SEC)
+                    self._cached = self.backend.cached_model(self._handle)
+                    self._expires_at = now + Config.PROMPT_CACHE_TTL_SEC
+                    logger.info(f"🗄️ Cached the system prompt for {self.model_name} for {Config.PROMPT_CACHE_TTL_SEC}s.")
+                except Exception as e:
+                    logger.warning(f"Could not cache the system prompt for {self.model_name}, sending it in full: {e}")
+                    self._drop()
+                    self._retry_at = now + Config.PROMPT_CACHE_RETRY_SEC
+            return self._cached
+
+    def _drop(self):
+        self._handle, self._cached, self._expires_at = None, None, 0.0
+
+    def generate_content(self, contents: List[Any], **kwargs) -> Any:
+        cached = self._cached_model()
+        if cached is not None:
+            try:
+                return cached.generate_content(contents, **kwargs)
+            except self.backend.evicted_errors as e:
+                # The entry was evicted or expired server-side; retry once with the full prompt.
+                logger.warning(f"Cached prompt for {self.model_name} is gone, sending it in full: {e}")
+                with self._lock:
+                    self._drop()
+        return self._plain.generate_content([self.system_prompt] + list(contents), **kwargs)
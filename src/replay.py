@@ -0,0 +1,411 @@
+import hashlib
+import importlib
+import json
+import shutil
+import threading
+import time
+import zipfile
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from src.config import Config, logger
+
+RECORD, REPLAY = "record", "replay"
+MANIFEST = "manifest.json"
+ARCHIVE_VERSION = 1
+
+
+# --- Serialization ---
+
+def _class_path(obj_type: type) -> str:
+    return f"{obj_type.__module__}.{obj_type.__qualname__}"
+
+
+def _import_class(path: str) -> Optional[type]:
+    module, _, name = path.rpartition(".")
+    try:
+        return getattr(importlib.import_module(module), name)
+    except Exception:
+        return None
+
+
+def _encode(value: Any) -> Any:
+    """Turns a service response into JSON: plain data, pydantic models (instagrapi) or Gemini responses."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _encode(v) for k, v in value.items()}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if hasattr(value, "model_dump"):
+        return {"__model__": _class_path(type(value)), "data": value.model_dump(mode="json")}
+    if hasattr(value, "usage_metadata"):
+        usage = value.usage_metadata
+        return {
+            "__gemini__": {
+                "text": value.text,
+                "prompt_token_count": getattr(usage, "prompt_token_count", 0) or 0,
+                "candidates_token_count": getattr(usage, "candidates_token_count", 0) or 0,
+            }
+        }
+    raise TypeError(f"Cannot record a value of type {type(value).__name__}")
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    if "__model__" in value:
+        model = _import_class(value["__model__"])
+        return model.model_validate(value["data"]) if model else value["data"]
+    if "__gemini__" in value:
+        data = value["__gemini__"]
+        usage = SimpleNamespace(
+            prompt_token_count=data["prompt_token_count"],
+            candidates_token_count=data["candidates_token_count"],
+        )
+        return SimpleNamespace(text=data["text"], usage_metadata=usage)
+    return {k: _decode(v) for k, v in value.items()}
+
+
+def _fingerprint(value: Any) -> Any:
+    """A stable, JSON-able stand-in for a request argument (media is hashed, not stored)."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        return "bytes:" + hashlib.sha1(value).hexdigest()
+    if isinstance(value, (list, tuple)):
+        return [_fingerprint(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _fingerprint(v) for k, v in value.items()}
+    if hasattr(value, "tobytes"):  # PIL images, numpy arrays
+        return "pixels:" + hashlib.sha1(value.tobytes()).hexdigest()
+    return type(value).__name__
+
+
+def _digest(method: str, args: tuple, kwargs: dict) -> str:
+    payload = json.dumps([method, _fingerprint(args), _fingerprint(kwargs)], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _encode_error(error: Exception) -> Dict[str, str]:
+    return {"type": _class_path(type(error)), "message": str(error)}
+
+
+def _decode_error(error: Dict[str, str]) -> Exception:
+    error_type = _import_class(error["type"])
+    try:
+        if error_type and issubclass(error_type, Exception):
+            return error_type(error["message"])
+    except Exception:
+        pass
+    return RuntimeError(f"{error['type']}: {error['message']}")
+
+
+# --- Sessions ---
+
+class ReplaySession:
+    """
+    One archive of recorded calls. In record mode every proxied call is run
+    for real and its response, error and latency are appended; downloaded
+    media is stored alongside. In replay mode calls are answered from the
+    archive, sleeping for the recorded latency times `latency_scale`.
+
+    Calls are matched by (service, method, request digest) first and then
+    in recorded order, so replays still work when a change alters prompts.
+    """
+
+    def __init__(self, path: str, mode: str, job: Optional[Dict] = None, latency_scale: float = 1.0):
+        self.path = Path(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.job = job
+        self.calls: List[Dict[str, Any]] = []
+        self.attributes: Dict[str, Dict[str, Any]] = {}
+        self.mismatches = 0
+        self._lock = threading.Lock()
+
+        if mode == RECORD:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._zip = zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_DEFLATED)
+        else:
+            self._zip = zipfile.ZipFile(self.path, "r")
+            manifest = json.loads(self._zip.read(MANIFEST))
+            self.job = _decode(manifest.get("job"))
+            self.calls = manifest["calls"]
+            self.attributes = manifest.get("attributes", {})
+            for call in self.calls:
+                call["used"] = False
+
+    def close(self):
+        if self.mode == RECORD:
+            manifest = {
+                "version": ARCHIVE_VERSION,
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+                "job": _encode(self.job),
+                "calls": self.calls,
+                "attributes": self.attributes,
+            }
+            self._zip.writestr(MANIFEST, json.dumps(manifest, indent=1))
+            logger.info(f"📼 Recorded {len(self.calls)} calls to {self.path}")
+        elif self.mismatches:
+            logger.info(f"📼 Replayed {self.path.name}: {self.mismatches} call(s) matched by order, not by request.")
+        self._zip.close()
+
+    def call(self, service: str, method: str, func: Optional[Callable], args: tuple, kwargs: dict) -> Any:
+        if self.mode == REPLAY:
+            return self._replay(service, method, _digest(method, args, kwargs))
+
+        digest = _digest(method, args, kwargs)
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self._append(service, method, digest, time.perf_counter() - started, error=_encode_error(e))
+            raise
+        latency = time.perf_counter() - started
+        try:
+            self._append(service, method, digest, latency, response=_encode(result))
+        except Exception as e:
+            # e.g. a blocked Gemini response whose .text raises: the caller will hit the same error.
+            self._append(service, method, digest, latency, error=_encode_error(e))
+        return result
+
+    def _append(self, service: str, method: str, digest: str, latency: float, **outcome):
+        with self._lock:
+            self.calls.append({
+                "service": service, "method": method, "digest": digest,
+                "latency_sec": round(latency, 4), **outcome,
+            })
+
+    def _replay(self, service: str, method: str, digest: str) -> Any:
+        with self._lock:
+            candidates = [c for c in self.calls if not c["used"] and c["service"] == service and c["method"] == method]
+            match = next((c for c in candidates if c["digest"] == digest), None)
+            if match is None and candidates:
+                match = candidates[0]
+                self.mismatches += 1
+            if match is None:
+                raise LookupError(f"No recorded {service}.{method} call left in {self.path.name}")
+            match["used"] = True
+
+        if self.latency_scale:
+            time.sleep(match["latency_sec"] * self.latency_scale)
+        if "error" in match:
+            raise _decode_error(match["error"])
+        return _decode(match.get("response"))
+
+    def attribute(self, service: str, name: str, read: Callable[[], Any]) -> Any:
+        """Records plain attribute reads (e.g. instagrapi's rank_token) so replays can serve them."""
+        if self.mode == REPLAY:
+            try:
+                return self.attributes[service][name]
+            except KeyError:
+                raise AttributeError(f"{service}.{name} was not recorded")
+        value = read()
+        try:
+            json.dumps(value)
+            with self._lock:
+                self.attributes.setdefault(service, {})[name] = value
+        except TypeError:
+            pass
+        return value
+
+    def store_folder(self, key: str, folder: Path):
+        with self._lock:
+            for file in sorted(folder.iterdir()):
+                if file.is_file():
+                    # Media is already compressed; deflating it again only costs time.
+                    compression = zipfile.ZIP_STORED if file.suffix.lower() in {".mp4", ".mov", ".jpg", ".jpeg", ".png", ".webp"} else zipfile.ZIP_DEFLATED
+                    self._zip.write(file, f"media/{key}/{file.name}", compress_type=compression)
+
+    def restore_folder(self, key: str, folder: Path):
+        prefix = f"media/{key}/"
+        folder.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            for name in self._zip.namelist():
+                if name.startswith(prefix):
+                    with self._zip.open(name) as src, open(folder / name[len(prefix):], "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+
+
+_current_session: ContextVar[Optional[ReplaySession]] = ContextVar("replay_session", default=None)
+
+
+@contextmanager
+def session(path: str, mode: str, job: Optional[Dict] = None, latency_scale: float = 1.0) -> Iterator[ReplaySession]:
+    """Activates a record or replay session for the calls made in this context."""
+    current = ReplaySession(path, mode, job=job, latency_scale=latency_scale)
+    token = _current_session.set(current)
+    try:
+        yield current
+    finally:
+        _current_session.reset(token)
+        current.close()
+
+
+def record_job(job: Dict[str, Any]):
+    """Records the job into RECORD_DIR when RECORD_JOBS is on; otherwise a no-op context."""
+    if not Config.RECORD_JOBS:
+        return nullcontext()
+    install_pipeline_proxies()
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    return session(str(Path(Config.RECORD_DIR) / f"{job['_id']}_{stamp}.zip"), RECORD, job=job)
+
+
+# --- Proxies ---
+
+class ReplayProxy:
+    """
+    Wraps a service client (a Gemini model, an instagrapi client). Calls pass
+    straight through unless a session is active, or one is bound to the proxy
+    (for clients used from worker threads, where contextvars don't follow).
+    In replay mode the target may be None.
+    """
+
+    def __init__(self, target: Any, service: str, bound_session: Optional[ReplaySession] = None):
+        self._target = target
+        self._service = service
+        self._bound_session = bound_session
+
+    def __getattr__(self, name: str) -> Any:
+        current = self._bound_session or _current_session.get()
+        if current is None:
+            return getattr(self._target, name)
+        if current.mode == RECORD:
+            attr = getattr(self._target, name)
+            if not callable(attr):
+                return current.attribute(self._service, name, lambda: attr)
+        elif name in current.attributes.get(self._service, {}):
+            return current.attribute(self._service, name, None)
+        elif self._target is not None:
+            # Not recorded (e.g. an archive made before it was read): serve the live object's plain attributes.
+            attr = getattr(self._target, name, None)
+            if attr is not None and not callable(attr):
+                return attr
+
+        def call(*args, **kwargs):
+            func = getattr(self._target, name) if current.mode == RECORD else None
+            return current.call(self._service, name, func, args, kwargs)
+        return call
+
+    def __bool__(self) -> bool:
+        return True
+
+
+class ReplayDownloader:
+    """
+    Stands in for InstagramDownloader: records downloaded folders into the
+    session's archive, or restores them from it without touching Instagram.
+    The real downloader is only built when something actually needs it.
+    """
+
+    def __init__(self, build_inner: Callable[[], Any]):
+        self._build_inner = build_inner
+        self._inner = None
+        self._lock = threading.Lock()
+
+    @property
+    def inner(self):
+        with self._lock:
+            if self._inner is None:
+                self._inner = self._build_inner()
+            return self._inner
+
+    def download(self, job_data: Dict, dest_root: Optional[str] = None, record_path: bool = True) -> Optional[Dict[str, str]]:
+        current = _current_session.get()
+        if current is None:
+            return self.inner.download(job_data, dest_root=dest_root, record_path=record_path)
+
+        key = str(job_data["_id"])
+        if current.mode == REPLAY:
+            result = current.call("instagram:download", "download", None, (key,), {})
+            if result and result.get("folder_path") not in (None, "skip"):
+                folder = Path(dest_root or Config.TEMP_DIR) / Path(result["folder_path"]).name
+                if folder.exists():
+                    shutil.rmtree(folder)
+                current.restore_folder(key, folder)
+                result = {**result, "folder_path": str(folder)}
+            return result
+
+        result = current.call(
+            "instagram:download", "download",
+            lambda *_: self.inner.download(job_data, dest_root=dest_root, record_path=record_path),
+            (key,), {},
+        )
+        if result and result.get("folder_path") not in (None, "skip"):
+            current.store_folder(key, Path(result["folder_path"]))
+        return result
+
+
+class ReplayPool:
+    """Wraps a SessionPool so every client it hands out records into, or replays from, one session."""
+
+    def __init__(self, pool: Any, bound_session: ReplaySession):
+        self._pool = pool
+        self._session = bound_session
+
+    @contextmanager
+    def session(self) -> Iterator[Any]:
+        if self._session.mode == REPLAY:
+            yield ReplayProxy(None, "instagram:client", self._session)
+            return
+        with self._pool.session() as client:
+            yield ReplayProxy(client, "instagram:client", self._session) if client is not None else None
+
+    def has_sessions(self) -> bool:
+        return self._session.mode == REPLAY or self._pool.has_sessions()
+
+    def healthy_count(self) -> int:
+        return 1 if self._session.mode == REPLAY else self._pool.healthy_count()
+
+    def reset_stats(self) -> Dict[str, float]:
+        if self._session.mode == REPLAY:
+            return {"requests": 0, "throttled_sec": 0.0}
+        return self._pool.reset_stats()
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install_pipeline_proxies():
+    """
+    Routes the pipeline's downloader and Gemini models through the replay
+    layer (once per process). With no active session they behave as before.
+    """
+    global _installed
+    from src import pipeline
+
+    with _install_lock:
+        if _installed:
+            return
+        _installed = True
+
+    def build_downloader():
+        from src.fetchers.instagram import InstagramDownloader
+        return InstagramDownloader()
+
+    with pipeline._components_lock:
+        pipeline._components["downloader"] = ReplayDownloader(build_downloader)
+
+    for service, getter in (
+        ("gemini:video", pipeline.get_video_processor),
+        ("gemini:image", pipeline.get_image_processor),
+        ("gemini:final_summary", pipeline.get_summarizer),
+    ):
+        component = getter()
+        if not isinstance(component.model, ReplayProxy):
+            component.model = ReplayProxy(component.model, service)
+    summarizer = pipeline.get_summarizer()
+    if not isinstance(summarizer.lite_model, ReplayProxy):
+        summarizer.lite_model = ReplayProxy(summarizer.lite_model, "gemini:final_summary_lite")
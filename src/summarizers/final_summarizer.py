@@ -1,6 +1,14 @@
+import json
+import re
 import google.generativeai as genai
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from src.config import logger, Config
+from src.extractors.report_parser import REPORT_SCHEMA, MalformedReport, structure_report
+from src.prompt_cache import CachedPromptModel
+from src.instrumentation import annotate, record_gemini_usage
+from src.summarizers.input_budget import Section, estimate_tokens, fit_to_budget, split_sentences
+from src.summarizers.model_router import LITE, choose_route
+from src import metrics
 
 # --- Merged and Refined System Prompt ---
 # This combines the best elements of both your prompts into a single, effective instruction.
@@ -38,6 +46,68 @@ Your final output must be structured exactly as follows, using Markdown for form
 (A brief 1-2 sentence analysis on why this matters for the tech industry or the future.)
 """
 
+MEDIA_NOTE = (
+    "The attached images are the post's own media (or keyframes of its video, in order). "
+    "Read any text, code or diagrams in them directly and treat them as part of the data above."
+)
+
+BATCH_INSTRUCTIONS = """
+You will receive the data of {count} separate posts. Each post starts with a line of the form `=== ITEM <id> ===`.
+Analyze every post on its own; never mix information between posts.
+Write one report per post, in the same order. Start each report with a line of the form `=== REPORT <id> ===`, using the post's id, followed by the report in the exact structure above. Write nothing else.
+"""
+
+# Structured-output mode: the same four sections, as JSON validated against REPORT_SCHEMA.
+JSON_NOTE = (
+    "Return the report as JSON: core_summary and broader_impact as strings, "
+    "technical_insights and developer_perspective as lists of bullet strings (no Markdown bullets)."
+)
+BATCH_JSON_INSTRUCTIONS = """
+You will receive the data of {count} separate posts. Each post starts with a line of the form `=== ITEM <id> ===`.
+Analyze every post on its own; never mix information between posts.
+Return a JSON array with one report object per post, in the same order, each with the post's `id` and the report's fields.
+"""
+BATCH_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"id": {"type": "string"}, **REPORT_SCHEMA["properties"]},
+        "required": ["id"] + REPORT_SCHEMA["required"],
+    },
+}
+
+IMAGE_HEADER = "--- IMAGE ANALYSIS ---"
+TRANSCRIPT_HEADER = "--- AUDIO TRANSCRIPT ---"
+VIDEO_HEADER = "--- VIDEO FRAME SUMMARIES ---"
+
+_REPORT_DELIMITER = re.compile(r"^=== REPORT (.+?) ===[ \t]*$", re.MULTILINE)
+# A report missing any of these is treated as unusable and the post is summarized on its own.
+REQUIRED_SECTIONS = ("core_summary", "technical_insights", "developer_perspective", "broader_impact")
+
+
+def split_batch_response(text: str, structured: bool = False) -> Dict[str, str]:
+    """
+    Splits a batched response into {id: report}: on its `=== REPORT <id> ===`
+    lines, or, in structured mode, into one JSON report per array element.
+    """
+    if structured:
+        try:
+            items = json.loads(text or "")
+            return {str(item.pop("id")): json.dumps(item) for item in items if isinstance(item, dict) and "id" in item}
+        except (ValueError, TypeError):
+            return {}
+    parts = _REPORT_DELIMITER.split(text or "")
+    return {parts[i].strip(): parts[i + 1].strip() for i in range(1, len(parts), 2)}
+
+
+def is_complete_report(report: Optional[str]) -> bool:
+    """True when the report (JSON or Markdown) has all four sections, non-empty."""
+    try:
+        _, parsed = structure_report(report or "")
+    except MalformedReport:
+        return False
+    return all(parsed.get(key) for key in REQUIRED_SECTIONS)
+
 
 class FinalSummarizer:
     """
@@ -49,44 +119,63 @@ class FinalSummarizer:
             if not api_key:
                 raise ValueError("GOOGLE_API_KEY environment variable not set.")
             genai.configure(api_key=api_key)
-            # Use a more powerful model for the final, complex reasoning step.
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
-            logger.info("Final Summarizer initialized with Gemini 2.5 Flash.")
+            # The full model handles the complex reasoning; the router sends simple posts to the lite one.
+            self.model = CachedPromptModel(Config.SUMMARY_FULL_MODEL, SYSTEM_PROMPT)
+            self.lite_model = CachedPromptModel(Config.SUMMARY_LITE_MODEL, SYSTEM_PROMPT)
+            logger.info(f"Final Summarizer initialized with {Config.SUMMARY_FULL_MODEL} (lite: {Config.SUMMARY_LITE_MODEL}).")
         except Exception as e:
             logger.error(f"Failed to configure Google Gemini client for FinalSummarizer: {e}")
             self.model = None
+            self.lite_model = None
 
-    def _prepare_input_text(self, summary_data: Dict[str, Any]) -> str:
-        """Formats the summary dictionary into a clean string for the AI model."""
-        content_blocks = []
+    def prepare_input(self, summary_data: Dict[str, Any]) -> str:
+        """
+        Formats the summary dictionary into a clean string for the AI model,
+        deduplicated and trimmed to SUMMARY_INPUT_TOKEN_BUDGET (estimated tokens).
+        """
+        sections: List[Section] = []
 
         if summary_data.get("caption"):
-            content_blocks.append("--- CAPTION ---\n" + summary_data["caption"])
+            sections.append(Section("caption", "--- CAPTION ---", split_sentences(summary_data["caption"])))
 
         if summary_data.get("image_summary"):
-            content_blocks.append("--- IMAGE ANALYSIS ---\n" + summary_data["image_summary"])
+            sections.append(Section("image_analysis", IMAGE_HEADER, split_sentences(summary_data["image_summary"])))
+
+        transcripts = [t for t in summary_data.get("audio_transcripts") or [] if t]
+        if transcripts:
+            sections.append(Section("audio_transcript", TRANSCRIPT_HEADER, split_sentences("\n".join(transcripts))))
+
+        for i, summary in enumerate(summary_data.get("video_summaries") or []):
+            sections.append(Section(f"video_{i+1}", f"Frame Group {i+1}:", split_sentences(summary)))
 
-        if summary_data.get("audio_transcripts"):
-            # This part can be enhanced if audio transcripts are added later
-            pass 
+        report = fit_to_budget(sections, Config.SUMMARY_INPUT_TOKEN_BUDGET, Config.SUMMARY_CAPTION_SHARE)
+        if report.tokens_after < report.tokens_before:
+            trimmed = ", ".join(f"{name} -{tokens}" for name, tokens in report.trimmed.items()) or "none"
+            logger.info(
+                f"✂️ Summarizer input trimmed from ~{report.tokens_before} to ~{report.tokens_after} tokens "
+                f"({report.duplicates_dropped} duplicate sentences dropped; truncated: {trimmed})."
+            )
+        annotate(summary_input_tokens_est=report.tokens_after, summary_input_trimmed_tokens=report.tokens_before - report.tokens_after)
 
-        if summary_data.get("video_summaries"):
-            video_section = ["--- VIDEO FRAME SUMMARIES ---"]
-            for i, summary in enumerate(summary_data["video_summaries"]):
-                video_section.append(f"Frame Group {i+1}:\n{summary}")
-            content_blocks.append("\n".join(video_section))
+        content_blocks = [s.render() for s in sections if not s.name.startswith("video_") and s.sentences]
+        video_blocks = [s.render() for s in sections if s.name.startswith("video_") and s.sentences]
+        if video_blocks:
+            content_blocks.append("\n".join([VIDEO_HEADER] + video_blocks))
         
         return "\n\n".join(content_blocks)
 
-    def process(self, summary_data: Dict[str, Any]) -> Optional[str]:
+    def process(self, summary_data: Dict[str, Any], media_parts: Optional[List[Any]] = None) -> Optional[str]:
         """
         Generates the final, structured summary from the aggregated data.
 
         Args:
             summary_data: A dictionary containing caption, image_summary, etc.
+            media_parts: Images or encoded video keyframes to send along with the
+                text (the single-call fast path), instead of summaries of them.
         
         Returns:
-            A string containing the formatted analytical report, or None if an error occurs.
+            The report (JSON in structured-output mode, otherwise Markdown; see
+            `structure_report`), or None if an error occurs.
         """
         if not self.model:
             logger.error("FinalSummarizer model not initialized. Cannot process.")
@@ -95,23 +184,108 @@ class FinalSummarizer:
         logger.info("Starting final synthesis of all collected data...")
 
         # 1. Format the input dictionary into a single text block
-        user_content = self._prepare_input_text(summary_data)
-        if not user_content.strip():
+        user_content = self.prepare_input(summary_data)
+        if not user_content.strip() and not media_parts:
             logger.warning("No content to summarize. The input data was empty.")
             return "No content was provided to summarize."
 
-        # 2. Construct the prompt for the API call
+        report, model_used = self._generate(user_content, media_parts)
+        annotate(model_used=model_used)
+        return report
+
+    def _call(self, model: Any, user_content: str, media_parts: Optional[List[Any]] = None) -> Optional[str]:
+        # Construct the prompt for the API call (SYSTEM_PROMPT is cached context)
         prompt = [
-            SYSTEM_PROMPT,
             "Here is the data you need to analyze:",
             user_content
         ]
+        if media_parts:
+            # Fast path: the model sees the images/keyframes itself instead of a prior summary of them.
+            prompt.append(MEDIA_NOTE)
+            prompt.extend(media_parts)
+
+        kwargs = {}
+        if Config.SUMMARY_STRUCTURED_OUTPUT:
+            prompt.append(JSON_NOTE)
+            kwargs["generation_config"] = {"response_mime_type": "application/json", "response_schema": REPORT_SCHEMA}
 
-        # 3. Make the API call
         try:
-            response = self.model.generate_content(prompt)
-            logger.info("✅ Final analytical report generated successfully.")
+            response = model.generate_content(prompt, **kwargs)
+            record_gemini_usage(response)
             return response.text.strip()
         except Exception as e:
-            logger.error(f"Final summary generation failed: {e}")
+            logger.error(f"Final summary generation failed with {model.model_name}: {e}")
+            metrics.record_gemini_error("final_summary" if model is self.model else "final_summary_lite", e)
             return None
+
+    def _generate(self, user_content: str, media_parts: Optional[List[Any]] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Routes the input to the lite or full model and escalates a lite report
+        that is missing or lacks any of the four sections.
+
+        Returns:
+            (report or None, name of the model that produced it)
+        """
+        modalities = sum(header in user_content for header in (IMAGE_HEADER, TRANSCRIPT_HEADER, VIDEO_HEADER))
+        route = choose_route(estimate_tokens(user_content), modalities, bool(media_parts))
+        annotate(summary_route=route.reason)
+
+        if route.tier == LITE and self.lite_model:
+            report = self._call(self.lite_model, user_content, media_parts)
+            if is_complete_report(report):
+                logger.info(f"✅ Final analytical report generated with {self.lite_model.model_name} ({route.reason}).")
+                return report, self.lite_model.model_name
+            logger.warning(f"Lite model report failed validation; escalating to {self.model.model_name}.")
+            annotate(summary_escalated=True)
+
+        report = self._call(self.model, user_content, media_parts)
+        if report:
+            logger.info(f"✅ Final analytical report generated with {self.model.model_name}.")
+        return report, self.model.model_name
+
+    def process_batch(self, inputs: Dict[str, str]) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """
+        Summarizes several posts in one request to the full model, sharing the
+        system prompt.
+
+        Args:
+            inputs: {post_id: prepared input text} (see `prepare_input`).
+
+        Returns:
+            {post_id: (report or None, model used)}. Posts whose report is missing
+            or does not parse into all four sections are retried individually.
+        """
+        if not self.model:
+            logger.error("FinalSummarizer model not initialized. Cannot process.")
+            return {post_id: (None, None) for post_id in inputs}
+
+        reports: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        for post_id, user_content in inputs.items():
+            if not user_content.strip():
+                reports[post_id] = ("No content was provided to summarize.", None)
+        batch = {post_id: text for post_id, text in inputs.items() if post_id not in reports}
+
+        if len(batch) > 1:
+            logger.info(f"Starting batched final synthesis of {len(batch)} posts...")
+            structured = Config.SUMMARY_STRUCTURED_OUTPUT
+            prompt = [(BATCH_JSON_INSTRUCTIONS if structured else BATCH_INSTRUCTIONS).format(count=len(batch))]
+            prompt.extend(f"=== ITEM {post_id} ===\n{text}" for post_id, text in batch.items())
+            kwargs = {"generation_config": {"response_mime_type": "application/json", "response_schema": BATCH_SCHEMA}} if structured else {}
+            try:
+                response = self.model.generate_content(prompt, **kwargs)
+                record_gemini_usage(response)
+                split = split_batch_response(response.text, structured)
+                for post_id in batch:
+                    if is_complete_report(split.get(post_id)):
+                        reports[post_id] = (split[post_id], self.model.model_name)
+                logger.info(f"✅ Batched final summary returned {len(reports)}/{len(inputs)} usable reports.")
+            except Exception as e:
+                logger.error(f"Batched final summary generation failed: {e}")
+                metrics.record_gemini_error("final_summary_batch", e)
+
+        for post_id, text in batch.items():
+            if post_id not in reports:
+                if len(batch) > 1:
+                    logger.warning(f"No usable batched report for {post_id}; summarizing it on its own.")
+                reports[post_id] = self._generate(text)
+        return reports
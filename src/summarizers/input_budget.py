@@ -0,0 +1,145 @@
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+
+# Rough Gemini tokenization for English prose: ~4 characters per token.
+CHARS_PER_TOKEN = 4
+# Gemini bills each image (or video keyframe) as a fixed number of input tokens.
+TOKENS_PER_IMAGE = 258
+# Sentences with fewer words are never treated as duplicates ("Yes.", "Step 1.").
+MIN_DEDUPE_WORDS = 4
+DUPLICATE_OVERLAP = 0.8
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])[ \t]+|\n+")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def split_sentences(text: str) -> List[str]:
+    """Splits into sentences, each keeping its trailing separator so line breaks (bullet lists) survive."""
+    sentences, start = [], 0
+    text = (text or "").strip()
+    for match in _SENTENCE_END.finditer(text):
+        sentences.append(text[start:match.start()] + ("\n" if "\n" in match.group() else " "))
+        start = match.end()
+    if text[start:]:
+        sentences.append(text[start:])
+    return [s for s in sentences if s.strip()]
+
+
+@dataclass
+class Section:
+    """One block of the summarizer input, e.g. the caption or one video's summary."""
+    name: str
+    header: str
+    sentences: List[str]
+    dropped_duplicates: int = 0
+    trimmed_tokens: int = 0
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.render())
+
+    def render(self) -> str:
+        return self.header + "\n" + "".join(self.sentences).rstrip() if self.sentences else ""
+
+
+@dataclass
+class BudgetReport:
+    tokens_before: int = 0
+    tokens_after: int = 0
+    duplicates_dropped: int = 0
+    trimmed: Dict[str, int] = field(default_factory=dict)
+
+
+def _dedupe_words(sentence: str) -> Set[str]:
+    return set(_WORD.findall(sentence.lower()))
+
+
+def dedupe_sections(sections: List[Section]):
+    """
+    Drops video-summary sentences that repeat (or nearly repeat) a sentence
+    of the image analysis: image and video summaries of the same post often
+    describe the same slide or frame in almost the same words. Nothing else
+    is compared. The caption and transcript are never touched, and sentences
+    within one section are not checked against each other, because numbered
+    steps or version lists can differ by a single word.
+    """
+    image_sentences = [
+        words
+        for section in sections if section.name == "image_analysis"
+        for words in map(_dedupe_words, section.sentences)
+        if len(words) >= MIN_DEDUPE_WORDS
+    ]
+    if not image_sentences:
+        return
+    for section in sections:
+        if not section.name.startswith("video_"):
+            continue
+        kept = []
+        for sentence in section.sentences:
+            words = _dedupe_words(sentence)
+            if len(words) >= MIN_DEDUPE_WORDS and any(
+                len(words & other) / len(words | other) >= DUPLICATE_OVERLAP for other in image_sentences
+            ):
+                section.dropped_duplicates += 1
+                continue
+            kept.append(sentence)
+        section.sentences = kept
+
+
+def fair_shares(sizes: List[int], budget: int) -> List[int]:
+    """
+    Water-filling: sections smaller than an equal share keep everything and
+    the leftover is split among the larger ones.
+    """
+    shares = [0] * len(sizes)
+    pending = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    remaining = budget
+    while pending:
+        equal = remaining // len(pending)
+        i = pending.pop(0)
+        shares[i] = min(sizes[i], equal)
+        remaining -= shares[i]
+    return shares
+
+
+def truncate(section: Section, max_tokens: int):
+    """Keeps the leading sentences that fit: summaries state the main point first."""
+    before = section.tokens
+    while len(section.sentences) > 1 and section.tokens > max_tokens:
+        section.sentences.pop()
+    if section.sentences and section.tokens > max_tokens:
+        # A single run-on "sentence" (no punctuation): cut it by characters instead.
+        room = (max_tokens - estimate_tokens(section.header + "\n")) * CHARS_PER_TOKEN
+        section.sentences = [section.sentences[0][:room].rstrip() + "…"] if room > 0 else []
+    section.trimmed_tokens += before - section.tokens
+
+
+def fit_to_budget(sections: List[Section], budget: int, caption_share: float) -> BudgetReport:
+    """
+    Deduplicates, then truncates sections until the total fits `budget` tokens.
+    Sections are given in priority order. The caption may use at most
+    `caption_share` of the budget; the rest is shared fairly among the others.
+    A budget of 0 disables truncation.
+    """
+    report = BudgetReport(tokens_before=sum(s.tokens for s in sections))
+    dedupe_sections(sections)
+
+    if budget and sum(s.tokens for s in sections) > budget:
+        rest = [s for s in sections if s.name != "caption"]
+        remaining = budget
+        for caption in (s for s in sections if s.name == "caption"):
+            truncate(caption, int(budget * caption_share) if rest else budget)
+            remaining -= caption.tokens
+        for section, share in zip(rest, fair_shares([s.tokens for s in rest], remaining)):
+            truncate(section, share)
+
+    report.tokens_after = sum(s.tokens for s in sections)
+    report.duplicates_dropped = sum(s.dropped_duplicates for s in sections)
+    report.trimmed = {s.name: s.trimmed_tokens for s in sections if s.trimmed_tokens}
+    return report
@@ -0,0 +1,51 @@
+from dataclasses import dataclass
+
+from src.config import Config
+from src import metrics
+
+LITE, FULL = "lite", "full"
+
+
+@dataclass
+class Route:
+    tier: str  # LITE or FULL
+    reason: str
+
+
+def choose_route(input_tokens: int, modalities: int, has_media: bool) -> Route:
+    """
+    Picks the final-summary model for one post.
+
+    Posts with attached media always go to the full model. Of the rest, the
+    lite model takes short, single-source inputs (e.g. a caption with one
+    image summary), and anything when the queue is backed up or the full
+    model was rate-limited recently; larger multi-source inputs go to the
+    full model. A lite report that fails
+    validation is escalated to the full model by the caller.
+
+    Args:
+        input_tokens: Estimated tokens of the prepared input text.
+        modalities: How many of image analysis, transcript and video summaries are present.
+        has_media: True when images or keyframes are attached (the fast path).
+    """
+    if not Config.SUMMARY_ROUTING_ENABLED:
+        return Route(FULL, "routing disabled")
+
+    # Media posts always go to the full model, even while it is rate-limited.
+    if has_media:
+        return Route(FULL, "media attached")
+
+    since_429 = metrics.seconds_since_rate_limited("final_summary")
+    if since_429 is not None and since_429 < Config.SUMMARY_RATE_LIMIT_COOLDOWN_SEC:
+        return Route(LITE, f"full model rate-limited {since_429:.0f}s ago")
+
+    if input_tokens <= Config.SUMMARY_LITE_MAX_TOKENS and modalities <= 1:
+        return Route(LITE, f"short input (~{input_tokens} tokens)")
+
+    # Only consulted when the input alone would not pick the lite model: it may query the database.
+    if Config.SUMMARY_LITE_QUEUE_DEPTH:
+        depth = metrics.pending_depth()
+        if depth >= Config.SUMMARY_LITE_QUEUE_DEPTH:
+            return Route(LITE, f"queue backlog ({depth} pending)")
+
+    return Route(FULL, f"~{input_tokens} input tokens from {modalities} sources")
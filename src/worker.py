@@ -1,22 +1,37 @@
 import time
 import os
+from typing import Any, Dict, Optional, Tuple
 from src.database.db import Database
-from src.pipeline import run_pipeline  
-from src.extractors.report_parser import parse_report
-from src.config import logger
+from src.pipeline import get_summarizer, run_analysis, run_pipeline
+from src.extractors.report_parser import structure_report
+from src.janitor import TempJanitor
+from src import instrumentation, metrics, profiling, replay
+from src.instrumentation import span
+from src.config import Config, logger
 
 class WorkerService:
     """
-    The "Factory Worker" service. Processes one 'pending' job at a time.
+    The "Factory Worker" service. Processes one 'pending' job at a time, or a
+    batch of them when SUMMARY_BATCH_SIZE > 1.
     """
     def __init__(self):
         self.db = Database()
         self.worker_id = f"worker_{os.getpid()}"
+        # Sweep anything a previous, crashed worker left in the temp dirs.
+        self.janitor = TempJanitor()
+        try:
+            self.janitor.run_once()
+        except Exception as e:
+            logger.warning(f"Startup temp sweep failed: {e}")
         logger.info(f"Worker {self.worker_id} initialized.")
 
     def run_once(self):
-        """Claims and processes a single pending item from the database queue."""
-        job = self.db.claim_pending_item()
+        """Claims and processes pending items from the database queue: one, or a batch of SUMMARY_BATCH_SIZE."""
+        # Recordings hold exactly one job's calls, so recording always takes the single-job path.
+        if Config.SUMMARY_BATCH_SIZE > 1 and not Config.RECORD_JOBS:
+            return self.run_batch()
+
+        job = self._claim()
         if not job:
             logger.info(f"[{self.worker_id}] No pending jobs found. Resting.")
             return
@@ -24,37 +39,153 @@ class WorkerService:
         post_id = job["_id"]
         url = job["source_url"]
         start_time = time.time()
-        
+        profiler = recorder = None
+
         try:
             logger.info(f"⚙️ [{self.worker_id}] Processing job {post_id} for URL: {url}")
 
-            # Step 1: Run the full pipeline (THE HEAVY WORK)
-            final_report = run_pipeline(job) 
-            
-            # This is great handling for skipping!
-            if isinstance(final_report, dict) and final_report.get("status") == "skipped":
-                logger.info(f"⏩ Job {post_id} was skipped. Marking as complete.")
-                metadata = {"worker_id": self.worker_id, "note": "Skipped, already processed."}
-                self.db.complete_item(post_id, "Skipped", final_report, metadata)
-                return
-
-            if not final_report or not isinstance(final_report, str):
-                raise RuntimeError("Pipeline failed to return a valid summary report string.")
-            
-            # Step 2: Parse the report
-            structured_data = parse_report(final_report)
-
-            # Step 3: Record metadata and complete
-            end_time = time.time()
-            metadata = {
-                "worker_id": self.worker_id,
-                "processing_time_sec": round(end_time - start_time, 2)
-            }
-            
-            self.db.complete_item(post_id, final_report, structured_data, metadata)
-            logger.info(f"✅ [{self.worker_id}] Job {post_id} completed in {metadata['processing_time_sec']}s.")
+            # Step 1: Run the full pipeline (THE HEAVY WORK), timing each stage
+            with profiling.profile_job(job) as profiler, replay.record_job(job), instrumentation.job() as recorder:
+                final_report = run_pipeline(job)
 
+            self._finish(job, final_report, start_time, recorder, profiler)
+
+        except Exception as e:
+            self._fail(post_id, e, start_time, profiler, recorder)
+
+    def run_batch(self):
+        """
+        Claims and analyzes up to SUMMARY_BATCH_SIZE jobs one at a time, then
+        writes the final summaries of the text-only ones in a single request.
+        Fast-path (media) and profiled jobs keep their own final call. No new
+        job is claimed once the first analyzed job has waited
+        SUMMARY_BATCH_MAX_WAIT_SEC, so a batch can't hold jobs for long.
+        """
+        summarizer = get_summarizer()
+        # post_id -> (job, start_time, recorder, prepared summarizer input)
+        pending: Dict[str, Tuple[Dict, float, instrumentation.JobRecorder, str]] = {}
+        held_since = None
+        claimed = 0
+        while claimed < Config.SUMMARY_BATCH_SIZE:
+            if held_since is not None and time.time() - held_since >= Config.SUMMARY_BATCH_MAX_WAIT_SEC:
+                break
+            job = self._claim()
+            if not job:
+                break
+            claimed += 1
+            post_id = job["_id"]
+            start_time = time.time()
+            profiler = recorder = None
+            try:
+                logger.info(f"⚙️ [{self.worker_id}] Analyzing job {post_id} for URL: {job['source_url']}")
+                with profiling.profile_job(job) as profiler, instrumentation.job() as recorder:
+                    analysis = run_analysis(job)
+                    if analysis.get("status") == "skipped":
+                        final_report = analysis
+                    elif analysis["media_parts"] or profiler:
+                        with span("final_summary"):
+                            final_report = summarizer.process(analysis["summary_data"], media_parts=analysis["media_parts"])
+                    else:
+                        pending[post_id] = (job, start_time, recorder, summarizer.prepare_input(analysis["summary_data"]))
+                        held_since = held_since or time.time()
+                        continue
+                self._finish(job, final_report, start_time, recorder, profiler)
+            except Exception as e:
+                self._fail(post_id, e, start_time, profiler, recorder)
+
+        if not claimed:
+            logger.info(f"[{self.worker_id}] No pending jobs found. Resting.")
+            return
+        if not pending:
+            return
+        logger.info(f"⚙️ [{self.worker_id}] Summarizing a batch of {len(pending)} jobs.")
+
+        try:
+            with instrumentation.job() as batch_recorder:
+                with span("final_summary_batch"):
+                    reports = summarizer.process_batch({post_id: entry[3] for post_id, entry in pending.items()})
+            batch_stage = batch_recorder.stages()[-1]
         except Exception as e:
-            error_msg = f"Job {post_id} failed: {e}"
-            logger.error(f"❌ [{self.worker_id}] {error_msg}", exc_info=True)
-            self.db.fail_item(post_id, str(e))
\ No newline at end of file
+            # Don't leave the held jobs in 'processing'.
+            for post_id, (job, start_time, recorder, _) in pending.items():
+                self._fail(post_id, e, start_time, None, recorder)
+            return
+
+        for post_id, (job, start_time, recorder, _) in pending.items():
+            try:
+                # Each job is charged an equal share of the shared request.
+                share = {key: round(value / len(pending), 3) for key, value in batch_stage.items() if isinstance(value, (int, float))}
+                recorder.spans.append({**share, "name": "final_summary", "parent": None})
+                report, model_used = reports.get(post_id, (None, None))
+                recorder.annotations.update(summary_batch_size=len(pending), model_used=model_used)
+                self._finish(job, report, start_time, recorder, None)
+            except Exception as e:
+                self._fail(post_id, e, start_time, None, recorder)
+
+    def _claim(self) -> Optional[Dict]:
+        job = self.db.claim_pending_item()
+        if job:
+            metrics.record_queue_wait(job)
+        return job
+
+    def _finish(self, job: Dict, final_report: Any, start_time: float, recorder: instrumentation.JobRecorder, profiler):
+        """Parses the pipeline's report and marks the job complete (or skipped)."""
+        post_id = job["_id"]
+
+        # This is great handling for skipping!
+        if isinstance(final_report, dict) and final_report.get("status") == "skipped":
+            logger.info(f"⏩ Job {post_id} was skipped. Marking as complete.")
+            metadata = {"worker_id": self.worker_id, "note": "Skipped, already processed."}
+            self.db.complete_item(post_id, "Skipped", final_report, metadata)
+            metrics.record_job("skipped", time.time() - start_time)
+            return
+
+        if not final_report or not isinstance(final_report, str):
+            raise RuntimeError("Pipeline failed to return a valid summary report string.")
+        
+        # Step 2: Validate the JSON report and render its Markdown (or parse a Markdown one).
+        # Invalid JSON raises MalformedReport, so the job fails instead of storing empty sections.
+        final_report, structured_data = structure_report(final_report)
+
+        # Step 3: Record metadata and complete
+        end_time = time.time()
+        metadata = {
+            "worker_id": self.worker_id,
+            "processing_time_sec": round(end_time - start_time, 2),
+            "stages": recorder.stages(),
+            **recorder.totals(),
+            **recorder.annotations,
+        }
+        if profiler:
+            metadata["profile"] = profiler.artifacts
+        
+        self.db.complete_item(post_id, final_report, structured_data, metadata)
+        metrics.record_job("completed", end_time - start_time)
+        self._charge_budget(recorder)
+        logger.info(f"✅ [{self.worker_id}] Job {post_id} completed in {metadata['processing_time_sec']}s.")
+
+    def _fail(
+        self, post_id: str, error: Exception, start_time: float, profiler,
+        recorder: Optional[instrumentation.JobRecorder] = None,
+    ):
+        error_msg = f"Job {post_id} failed: {error}"
+        logger.error(f"❌ [{self.worker_id}] {error_msg}", exc_info=True)
+        # Keep the profile of a failed job reachable from the item, too.
+        metadata = {"worker_id": self.worker_id, "profile": profiler.artifacts} if profiler else None
+        self.db.fail_item(post_id, str(error), metadata)
+        metrics.record_job("failed", time.time() - start_time)
+        # Work done before the failure still spent CPU and tokens.
+        if recorder is not None:
+            try:
+                self._charge_budget(recorder)
+            except Exception as e:
+                logger.warning(f"Could not record budget usage for failed job {post_id}: {e}")
+
+    def _charge_budget(self, recorder: instrumentation.JobRecorder):
+        """
+        Counts a job's top-level stage CPU and all its Gemini tokens (including
+        lite attempts that were escalated) against the daily budgets.
+        """
+        cpu_sec = sum(stage.get("cpu_sec", 0) for stage in recorder.stages() if stage.get("parent") is None)
+        totals = recorder.totals()
+        self.db.record_budget_usage(cpu_sec, totals["input_tokens"] + totals["output_tokens"])
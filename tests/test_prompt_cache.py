@@ -0,0 +1,155 @@
+"""
+CachedPromptModel against the in-memory FakeCacheBackend: entry creation and
+reuse, TTL refresh, eviction fallback and the retry window after a failed
+creation.
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from benchmarks.fakes import FakeCacheBackend
+from src.config import Config
+from src.prompt_cache import CachedPromptModel
+
+# Long enough for Gemini's minimum cache size (~1100 estimated tokens).
+SYSTEM_PROMPT = "You are a test prompt. " * 200
+TTL_SEC, REFRESH_SEC, RETRY_SEC = 3600, 300, 600
+
+
+class FlakyCreateBackend(FakeCacheBackend):
+    """Fails cache creation until `fail_creates` is cleared."""
+
+    def __init__(self):
+        super().__init__()
+        self.fail_creates = True
+        self.create_attempts = 0
+
+    def create(self, model_name, system_prompt, ttl_sec):
+        self.create_attempts += 1
+        if self.fail_creates:
+            raise RuntimeError("cache creation rejected")
+        return super().create(model_name, system_prompt, ttl_sec)
+
+
+class BrokenCachedModelBackend(FakeCacheBackend):
+    """A cached model whose calls fail for reasons other than eviction."""
+
+    def cached_model(self, handle):
+        model = super().cached_model(handle)
+        model.generate_content = mock.Mock(side_effect=ValueError("bad request"))
+        return model
+
+
+class CachedPromptModelTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1_000_000.0
+        patches = [
+            mock.patch("time.time", lambda: self.now),
+            mock.patch.object(Config, "PROMPT_CACHE_ENABLED", True),
+            mock.patch.object(Config, "PROMPT_CACHE_TTL_SEC", TTL_SEC),
+            mock.patch.object(Config, "PROMPT_CACHE_REFRESH_SEC", REFRESH_SEC),
+            mock.patch.object(Config, "PROMPT_CACHE_RETRY_SEC", RETRY_SEC),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def model(self, backend):
+        return CachedPromptModel("fake-gemini", SYSTEM_PROMPT, backend=backend)
+
+    def test_creates_entry_once_and_reuses_it(self):
+        backend = FakeCacheBackend()
+        model = self.model(backend)
+        first = model.generate_content(["part"])
+        model.generate_content(["part"])
+        self.assertEqual(backend.stats["created"], 1)
+        self.assertEqual(backend.stats["refreshed"], 0)
+        # The prompt is billed as cached tokens, not sent with the call.
+        self.assertGreater(first.usage_metadata.cached_content_token_count, 0)
+
+    def test_refreshes_ttl_shortly_before_expiry(self):
+        backend = FakeCacheBackend()
+        model = self.model(backend)
+        model.generate_content(["part"])
+
+        self.now += TTL_SEC - REFRESH_SEC - 1
+        model.generate_content(["part"])
+        self.assertEqual(backend.stats["refreshed"], 0)
+
+        self.now += 2
+        model.generate_content(["part"])
+        self.assertEqual(backend.stats["refreshed"], 1)
+        self.assertEqual(backend.stats["created"], 1)
+
+        # The refreshed entry outlives the original TTL.
+        self.now += REFRESH_SEC + 10
+        response = model.generate_content(["part"])
+        self.assertGreater(response.usage_metadata.cached_content_token_count, 0)
+        self.assertEqual(backend.stats["created"], 1)
+
+    def test_recreates_entry_when_refresh_finds_it_expired(self):
+        backend = FakeCacheBackend()
+        model = self.model(backend)
+        model.generate_content(["part"])
+        backend.evict()
+
+        self.now += TTL_SEC - REFRESH_SEC + 1
+        response = model.generate_content(["part"])
+        self.assertEqual(backend.stats["created"], 2)
+        self.assertGreater(response.usage_metadata.cached_content_token_count, 0)
+
+    def test_eviction_falls_back_to_full_prompt_then_recreates(self):
+        backend = FakeCacheBackend()
+        model = self.model(backend)
+        model.generate_content(["part"])
+        backend.evict()
+
+        fallback = model.generate_content(["part"])
+        self.assertEqual(fallback.usage_metadata.cached_content_token_count, 0)
+        self.assertGreaterEqual(fallback.usage_metadata.prompt_token_count, len(SYSTEM_PROMPT) // 4)
+
+        model.generate_content(["part"])
+        self.assertEqual(backend.stats["created"], 2)
+
+    def test_other_errors_are_not_treated_as_eviction(self):
+        model = self.model(BrokenCachedModelBackend())
+        with self.assertRaises(ValueError):
+            model.generate_content(["part"])
+
+    def test_failed_creation_waits_for_retry_window(self):
+        backend = FlakyCreateBackend()
+        model = self.model(backend)
+
+        response = model.generate_content(["part"])
+        self.assertEqual(response.usage_metadata.cached_content_token_count, 0)
+        self.assertEqual(backend.create_attempts, 1)
+
+        backend.fail_creates = False
+        self.now += RETRY_SEC - 1
+        model.generate_content(["part"])
+        self.assertEqual(backend.create_attempts, 1)
+
+        self.now += 2
+        response = model.generate_content(["part"])
+        self.assertEqual(backend.create_attempts, 2)
+        self.assertGreater(response.usage_metadata.cached_content_token_count, 0)
+
+    def test_prompt_below_minimum_size_is_sent_in_full(self):
+        backend = FakeCacheBackend()
+        model = CachedPromptModel("fake-gemini", "You are a short prompt.", backend=backend)
+        self.assertFalse(model.enabled)
+
+        response = model.generate_content(["part"])
+        self.assertEqual(response.usage_metadata.cached_content_token_count, 0)
+        self.assertEqual(backend.stats["created"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
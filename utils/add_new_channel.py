@@ -6,7 +6,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.database.db import Database
 from src.database.schemas import ChannelSchema
-from src.config import logger
+from src.config import logger, setup_logging
 
 def add_channels(usernames: list[str]):
     """
@@ -37,6 +37,7 @@ def add_channels(usernames: list[str]):
     logger.info("The main scheduler will automatically bootstrap them on its next discoverer run.")
 
 if __name__ == "__main__":
+    setup_logging()
     # Get all arguments after the script name (e.g., "python utils/add_new_channel.py user1 user2")
     channel_names_from_args = sys.argv[1:]
     add_channels(channel_names_from_args)
\ No newline at end of file
@@ -0,0 +1,21 @@
+import sys
+import os
+
+# This line allows the script to find your 'src' folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.db import Database
+from src.config import logger, setup_logging
+
+def migrate():
+    """
+    Backfills next_check_at on existing channels so the indexed due-channel query finds them.
+    Safe to run more than once: only channels without next_check_at are touched.
+    """
+    db = Database()
+    updated = db.backfill_next_check_at()
+    logger.info(f"--- Done. Set next_check_at on {updated} channel(s). ---")
+
+if __name__ == "__main__":
+    setup_logging()
+    migrate()
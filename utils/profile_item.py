@@ -0,0 +1,30 @@
+import sys
+import os
+
+# This line allows the script to find your 'src' folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.db import Database
+from src.config import logger, setup_logging
+
+def flag_items(shortcodes: list[str]):
+    """
+    Flags content items so the worker that processes them records a profile
+    (cProfile, allocations and sampled stacks) under PROFILE_DIR.
+    To profile an item again, reset its status to 'pending' as well.
+    """
+    if not shortcodes:
+        print("Error: No shortcodes provided.")
+        print("Usage: python utils/profile_item.py <shortcode1> [shortcode2] ...")
+        return
+
+    db = Database()
+    for shortcode in shortcodes:
+        if db.set_item_profile_flag(shortcode):
+            logger.info(f"🔬 Item {shortcode} will be profiled when it is processed.")
+        else:
+            logger.error(f"❌ No content item found with shortcode {shortcode}.")
+
+if __name__ == "__main__":
+    setup_logging()
+    flag_items(sys.argv[1:])
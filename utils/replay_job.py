@@ -0,0 +1,142 @@
+import argparse
+import json
+import sys
+import os
+import time
+from datetime import datetime, timezone
+
+# This line allows the script to find your 'src' folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import instrumentation, replay
+from src.config import Config, logger, setup_logging
+
+def record(shortcode: str, out_dir: str):
+    """
+    Runs the pipeline for one content item against the live services and
+    archives every Instagram download and Gemini call it makes.
+    The item's status in the database is not changed.
+    """
+    from src.database.db import Database
+    from src.pipeline import run_pipeline
+
+    # The full document: the pipeline needs source_url, post_type, caption and media_urls.
+    job = Database().get_item(shortcode)
+    if not job:
+        logger.error(f"❌ No content item found with shortcode {shortcode}.")
+        return
+
+    replay.install_pipeline_proxies()
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(out_dir, f"{shortcode}_{stamp}.zip")
+    with replay.session(path, replay.RECORD, job=job):
+        try:
+            run_pipeline(job)
+        except Exception as e:
+            # Failures are part of the recording too.
+            logger.warning(f"Pipeline failed while recording {shortcode}: {e}")
+    logger.info(f"📼 Archive written to {path}")
+
+def replay_archive(path: str, latency_scale: float, repeat: int, json_path: str = None):
+    """Re-runs a recorded job offline and reports stage timings for each run."""
+    from src.pipeline import run_pipeline
+
+    replay.install_pipeline_proxies()
+    runs = []
+    for i in range(repeat):
+        with replay.session(path, replay.REPLAY, latency_scale=latency_scale) as current:
+            started = time.perf_counter()
+            error = None
+            with instrumentation.job() as recorder:
+                try:
+                    run_pipeline(current.job)
+                except Exception as e:
+                    error = str(e)
+            elapsed = time.perf_counter() - started
+        runs.append({"run": i + 1, "seconds": round(elapsed, 3), "error": error, "stages": recorder.stages(), **recorder.totals()})
+        logger.info(f"🔁 Replay {i + 1}/{repeat} of {os.path.basename(path)}: {elapsed:.2f}s{' (failed: ' + error + ')' if error else ''}")
+
+    print(f"\n{'stage':<40} " + " ".join(f"{'run ' + str(r['run']):>8}" for r in runs))
+    names = []
+    for r in runs:
+        for stage in r["stages"]:
+            name = stage["name"] if stage["parent"] is None else f"  {stage['parent']}/{stage['name']}"
+            if name not in names:
+                names.append(name)
+    for name in names:
+        cells = []
+        for r in runs:
+            total = sum(s["wall_sec"] for s in r["stages"] if (s["name"] if s["parent"] is None else f"  {s['parent']}/{s['name']}") == name)
+            cells.append(f"{total:>8.2f}")
+        print(f"{name:<40} " + " ".join(cells))
+    print(f"{'total':<40} " + " ".join(f"{r['seconds']:>8.2f}" for r in runs))
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"archive": path, "latency_scale": latency_scale, "runs": runs}, f, indent=2)
+        print(f"Results written to {json_path}")
+
+def record_discovery(out_dir: str):
+    """Runs one discoverer pass against Instagram and archives every client call."""
+    from src.fetchers.discoverer import DiscovererService
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(out_dir, f"discovery_{stamp}.zip")
+    service = DiscovererService()
+    current = replay.ReplaySession(path, replay.RECORD)
+    service.pool = replay.ReplayPool(service.pool, current)
+    try:
+        service.run_once()
+    finally:
+        current.close()
+    logger.info(f"📼 Archive written to {path}")
+
+def replay_discovery(path: str, latency_scale: float):
+    """
+    Re-runs a recorded discoverer pass without Instagram. It still reads and
+    writes channels and items, so point MONGO_URI at a scratch database.
+    """
+    from src.fetchers.discoverer import DiscovererService
+
+    service = DiscovererService()
+    current = replay.ReplaySession(path, replay.REPLAY, latency_scale=latency_scale)
+    service.pool = replay.ReplayPool(service.pool, current)
+    started = time.perf_counter()
+    try:
+        service.run_once()
+    finally:
+        current.close()
+    logger.info(f"🔁 Discovery replay finished in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Record jobs against live services and replay them offline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("record", help="Record one content item's pipeline run.")
+    p.add_argument("shortcode")
+    p.add_argument("--out", default=Config.RECORD_DIR)
+
+    p = commands.add_parser("replay", help="Replay a recorded job.")
+    p.add_argument("archive")
+    p.add_argument("--latency-scale", type=float, default=1.0, help="1 = recorded latencies, 0 = no latency.")
+    p.add_argument("--repeat", type=int, default=1)
+    p.add_argument("--json", dest="json_path")
+
+    p = commands.add_parser("record-discovery", help="Record one discoverer pass.")
+    p.add_argument("--out", default=Config.RECORD_DIR)
+
+    p = commands.add_parser("replay-discovery", help="Replay a recorded discoverer pass.")
+    p.add_argument("archive")
+    p.add_argument("--latency-scale", type=float, default=1.0)
+
+    args = parser.parse_args()
+    Config.ensure_dirs()
+    if args.command == "record":
+        record(args.shortcode, args.out)
+    elif args.command == "replay":
+        replay_archive(args.archive, args.latency_scale, args.repeat, args.json_path)
+    elif args.command == "record-discovery":
+        record_discovery(args.out)
+    else:
+        replay_discovery(args.archive, args.latency_scale)